@@ -1,4 +1,5 @@
+from .processor import StripeSankeyDataProcessor
 from .widget import StripeSankeyInline
 
 __version__ = "0.1.0"
-__all__ = ["StripeSankeyInline"]
\ No newline at end of file
+__all__ = ["StripeSankeyInline", "StripeSankeyDataProcessor"]
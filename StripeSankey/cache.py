@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Bump when the layout or the meaning of cached arrays changes
+CACHE_VERSION = 1
+
+
+def sweep_cache_key(paths, **params):
+    """
+    Hash of the source files (path, size, mtime) and the processing parameters
+
+    Any edited, added or removed source file, or a changed parameter such as a
+    threshold, gives a new key, so stale entries are never read.
+    """
+    digest = hashlib.sha256(f"v{CACHE_VERSION}\n".encode())
+    for path in sorted(os.path.abspath(path) for path in paths):
+        stat = os.stat(path)
+        digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:20]
+
+
+class SweepCache:
+    """
+    On-disk cache of processed sweeps as one .npy file per column
+
+    Each entry is a directory <directory>/<key>/ holding named tables
+    ({column: 1-D or 2-D array}) plus a manifest.json. Arrays are loaded
+    memory-mapped, so reopening an unchanged sweep only reads what is used.
+    Strings are stored as fixed-width unicode arrays (no pickling).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key, mmap_mode="r"):
+        """
+        Returns:
+            tuple: ({table: {column: array}}, meta dict), or None when key is
+                   not cached
+        """
+        path = self.entry_path(key)
+        manifest_path = os.path.join(path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != CACHE_VERSION:
+            return None
+
+        tables = {
+            name: {
+                column: np.load(
+                    os.path.join(path, name, f"{column}.npy"),
+                    mmap_mode=mmap_mode,
+                    allow_pickle=False,
+                )
+                for column in columns
+            }
+            for name, columns in manifest["tables"].items()
+        }
+        return tables, manifest.get("meta", {})
+
+    def save(self, key, tables, meta=None):
+        """
+        Write tables ({table: {column: array}}) and JSON-serializable meta under key
+
+        The entry is written to a temporary directory and renamed into place,
+        so an interrupted save never leaves a partial entry. Entries are never
+        replaced: equal keys mean equal sources and parameters, so if another
+        save of the key finished first its entry is kept and this one dropped.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{key}-", dir=self.directory)
+
+        try:
+            for name, columns in tables.items():
+                os.makedirs(os.path.join(staging, name))
+                for column, values in columns.items():
+                    values = np.asarray(values)
+                    if values.dtype.kind == "O":
+                        values = values.astype(str)
+                    path = os.path.join(staging, name, f"{column}.npy")
+                    np.save(path, values, allow_pickle=False)
+
+            manifest = {
+                "version": CACHE_VERSION,
+                "tables": {name: list(columns) for name, columns in tables.items()},
+                "meta": meta or {},
+            }
+            with open(os.path.join(staging, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+
+            # rename() refuses to overwrite a non-empty directory
+            os.rename(staging, self.entry_path(key))
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(self.entry_path(key)):
+                raise
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        return self.entry_path(key)
+
+    def clear(self):
+        """Remove every cached entry"""
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
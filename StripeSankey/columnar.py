@@ -0,0 +1,290 @@
+import numpy as np
+
+from .schema import flow_members, is_indexed, node_members
+from .segments import LEVELS, UNASSIGNED
+from .trajectories import _buffer, build_trajectory_table, trajectory_table_to_json
+
+# Node fields that hold sample membership (either schema); these travel as
+# index arrays instead of JSON
+NODE_SAMPLE_FIELDS = tuple(
+    f"{level}_{field}" for level in LEVELS for field in ("samples", "probs")
+)
+
+
+def select_flows(flows, min_flow_samples=10, top_n_flows=None):
+    """
+    Keep the flows worth drawing, in their original order
+
+    Args:
+        flows (list): Flow dicts with 'sample_count', 'source_k' and 'target_k'
+        min_flow_samples (int): Drop flows with fewer samples
+        top_n_flows (int, optional): Keep only the N largest flows per
+            (source_k, target_k)
+
+    Returns:
+        list: The selected flows
+    """
+    selected = [
+        flow for flow in flows if (flow.get("sample_count") or 0) >= min_flow_samples
+    ]
+    if top_n_flows is None:
+        return selected
+
+    # Rank within each K pair by sample count; ties keep the earlier flow
+    by_pair = {}
+    for position, flow in enumerate(selected):
+        by_pair.setdefault((flow["source_k"], flow["target_k"]), []).append(position)
+
+    keep = set()
+    for positions in by_pair.values():
+        positions.sort(key=lambda p: -(selected[p].get("sample_count") or 0))
+        keep.update(positions[:top_n_flows])
+
+    return [flow for position, flow in enumerate(selected) if position in keep]
+
+
+def encode_sankey_data(
+    sankey_data, min_flow_samples=10, include_samples=True, top_n_flows=None
+):
+    """
+    Encode sankey data into the columnar form synced to the frontend
+
+    Sample names are interned once into 'sample_names'; node and flow sample
+    membership becomes int32 indices into it, probabilities become float32,
+    and every array is a binary buffer so the widget can view it as a typed
+    array without parsing JSON.
+
+    Only the flows kept by select_flows are encoded, so insignificant flows
+    never reach the frontend.
+
+    Both the name-based and the indexed schema (see schema.index_sankey_data)
+    are accepted; indexed data keeps its own 'sample_names' order.
+
+    With include_samples=False only counts and aggregates are encoded (format
+    'columnar' with 'lazy': True); the frontend requests a flow's samples when
+    it is selected, see encode_flow_samples.
+
+    Args:
+        sankey_data (dict): Processed data with 'nodes', 'flows' and 'k_range',
+            in either schema
+        min_flow_samples (int): Minimum samples for a flow to be sent
+        include_samples (bool): Encode node/flow sample membership and trajectories
+        top_n_flows (int, optional): Keep only the N largest flows per K pair
+
+    Returns:
+        dict: Widget state with format 'columnar'
+    """
+    nodes = sankey_data.get("nodes") or {}
+    flows = select_flows(sankey_data.get("flows") or [], min_flow_samples, top_n_flows)
+    flow_filter = {"min_samples": min_flow_samples, "top_n": top_n_flows}
+
+    if not include_samples:
+        return _encode_aggregates(sankey_data, nodes, flows, flow_filter)
+
+    indexed = is_indexed(sankey_data)
+    sample_index = {}
+    segment_index = {}
+
+    def intern(index, key):
+        return index.setdefault(key, len(index))
+
+    def sample_rows(samples):
+        # Indexed data already refers to rows of its own sample dictionary
+        if indexed:
+            return samples
+        return [intern(sample_index, sample) for sample in samples]
+
+    # Flows: scalar columns plus CSR sample membership (offsets into the sample arrays)
+    flow_count = len(flows)
+    source_segment = np.empty(flow_count, dtype=np.int32)
+    target_segment = np.empty(flow_count, dtype=np.int32)
+    source_k = np.empty(flow_count, dtype=np.int32)
+    target_k = np.empty(flow_count, dtype=np.int32)
+    sample_count = np.empty(flow_count, dtype=np.int32)
+    average_probability = np.empty(flow_count, dtype=np.float32)
+    sample_offsets = np.zeros(flow_count + 1, dtype=np.int32)
+    flow_samples, source_probs, target_probs = [], [], []
+
+    for i, flow in enumerate(flows):
+        source_segment[i] = intern(segment_index, flow["source_segment"])
+        target_segment[i] = intern(segment_index, flow["target_segment"])
+        source_k[i] = flow["source_k"]
+        target_k[i] = flow["target_k"]
+        sample_count[i] = flow.get("sample_count") or 0
+        average_probability[i] = flow.get("average_probability") or 0
+
+        samples, flow_source_probs, flow_target_probs = flow_members(flow)
+        flow_samples.extend(sample_rows(samples))
+        source_probs.extend(flow_source_probs)
+        target_probs.extend(flow_target_probs)
+        sample_offsets[i + 1] = len(flow_samples)
+
+    # Nodes: metadata stays JSON, high/medium membership becomes CSR index arrays
+    node_meta = {}
+    node_samples = {}
+    members = {level: ([], [], [0]) for level in LEVELS}
+
+    for node_id, node_data in nodes.items():
+        node_meta[node_id] = {
+            k: v for k, v in node_data.items() if k not in NODE_SAMPLE_FIELDS
+        }
+        for level, (index, probs, offsets) in members.items():
+            samples, level_probs = node_members(node_data, level)
+            index.extend(sample_rows(samples))
+            probs.extend(level_probs)
+            offsets.append(len(index))
+
+    for level, (index, probs, offsets) in members.items():
+        node_samples[f"{level}_offsets"] = _buffer(offsets, "<i4")
+        node_samples[f"{level}_index"] = _buffer(index, "<i4")
+        node_samples[f"{level}_prob"] = _buffer(probs, "<f4")
+
+    sample_names = list(sankey_data["sample_names"]) if indexed else list(sample_index)
+    trajectories = trajectory_table_to_json(
+        build_trajectory_table({**sankey_data, "flows": flows}, min_flow_samples,
+                               sample_names=sample_names, node_ids=list(nodes))
+    )
+    # Rows follow the shared dictionary above
+    del trajectories["sample_names"]
+
+    wire = {k: v for k, v in sankey_data.items() if k not in ("nodes", "flows")}
+    wire.update({
+        "format": "columnar",
+        "flow_filter": flow_filter,
+        "sample_names": sample_names,
+        "segments": list(segment_index),
+        "node_ids": list(nodes),
+        "nodes": node_meta,
+        "node_samples": node_samples,
+        "flows": {
+            "count": flow_count,
+            "source_segment": _buffer(source_segment, "<i4"),
+            "target_segment": _buffer(target_segment, "<i4"),
+            "source_k": _buffer(source_k, "<i4"),
+            "target_k": _buffer(target_k, "<i4"),
+            "sample_count": _buffer(sample_count, "<i4"),
+            "average_probability": _buffer(average_probability, "<f4"),
+            "sample_offsets": _buffer(sample_offsets, "<i4"),
+            "sample_index": _buffer(flow_samples, "<i4"),
+            "source_prob": _buffer(source_probs, "<f4"),
+            "target_prob": _buffer(target_probs, "<f4"),
+        },
+        "trajectories": trajectories,
+    })
+    return wire
+
+
+def _encode_aggregates(sankey_data, nodes, flows, flow_filter):
+    """Columnar encoding without any per-sample payload"""
+    segment_index = {}
+    columns = {
+        name: []
+        for name in ("source_segment", "target_segment", "source_k", "target_k",
+                     "sample_count", "average_probability")
+    }
+
+    def intern(segment):
+        return segment_index.setdefault(segment, len(segment_index))
+
+    for flow in flows:
+        columns["source_segment"].append(intern(flow["source_segment"]))
+        columns["target_segment"].append(intern(flow["target_segment"]))
+        columns["source_k"].append(flow["source_k"])
+        columns["target_k"].append(flow["target_k"])
+        columns["sample_count"].append(flow.get("sample_count") or 0)
+        columns["average_probability"].append(flow.get("average_probability") or 0)
+
+    wire = {k: v for k, v in sankey_data.items() if k not in ("nodes", "flows")}
+    wire.update({
+        "format": "columnar",
+        "lazy": True,
+        "flow_filter": flow_filter,
+        "sample_names": [],
+        "segments": list(segment_index),
+        "node_ids": list(nodes),
+        "nodes": {
+            node_id: {k: v for k, v in node_data.items() if k not in NODE_SAMPLE_FIELDS}
+            for node_id, node_data in nodes.items()
+        },
+        "flows": {
+            "count": len(flows),
+            **{
+                name: _buffer(values, "<f4" if name == "average_probability" else "<i4")
+                for name, values in columns.items()
+            },
+        },
+    })
+    return wire
+
+
+def find_flow(
+    flows, index=None, source=None, target=None, source_k=None, target_k=None
+):
+    """
+    Find a flow by its position, checked against its key, or by key alone
+
+    Returns:
+        dict or None: The flow, or None if nothing matches the key
+    """
+    def matches(flow):
+        return (flow["source_segment"] == source
+                and flow["target_segment"] == target
+                and flow["source_k"] == source_k
+                and flow["target_k"] == target_k)
+
+    if isinstance(index, int) and 0 <= index < len(flows) and matches(flows[index]):
+        return flows[index]
+    return next((flow for flow in flows if matches(flow)), None)
+
+
+def encode_flow_samples(flow, trajectory_table, sample_rows):
+    """
+    Encode one flow's samples for an on-demand request from the frontend
+
+    Args:
+        flow (dict): Flow with a 'samples' list, in either schema
+        trajectory_table (dict): Table from build_trajectory_table (of the same
+            sankey data)
+        sample_rows (dict): Sample name -> row in trajectory_table
+
+    Returns:
+        tuple: (message content, binary buffers). Buffers are, in order,
+               source_prob, target_prob (float32 per sample) and the samples'
+               trajectory rows topic (int32), level (int8), probability (float32)
+    """
+    samples, source_probs, target_probs = flow_members(flow)
+    if "source_probs" in flow:
+        # Indexed flows refer to rows of the data's sample dictionary, which the
+        # table shares
+        names = [trajectory_table["sample_names"][row] for row in samples]
+    else:
+        names = samples
+
+    # Samples missing from the table (flows below min_flow_samples) get an empty
+    # trajectory
+    rows = np.fromiter(
+        (sample_rows.get(name, -1) for name in names), dtype=np.int64, count=len(names)
+    )
+    found = rows >= 0
+    k_count = len(trajectory_table["k_values"])
+
+    topic = np.full((len(names), k_count), UNASSIGNED, dtype=np.int32)
+    level = np.full((len(names), k_count), UNASSIGNED, dtype=np.int8)
+    probability = np.zeros((len(names), k_count), dtype=np.float32)
+    topic[found] = trajectory_table["topic"][rows[found]]
+    level[found] = trajectory_table["level"][rows[found]]
+    probability[found] = trajectory_table["probability"][rows[found]]
+
+    content = {
+        "sample_names": names,
+        "node_ids": trajectory_table["node_ids"],
+        "k_values": trajectory_table["k_values"],
+    }
+    buffers = [
+        _buffer(source_probs, "<f4"),
+        _buffer(target_probs, "<f4"),
+        _buffer(topic, "<i4"),
+        _buffer(level, "i1"),
+        _buffer(probability, "<f4"),
+    ]
+    return content, buffers
@@ -0,0 +1,137 @@
+import gzip
+import json
+from collections.abc import Mapping
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional: pip install StripeSankey[fast]
+    orjson = None
+
+# Flush the streaming writer's buffer once it holds this many bytes
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _to_builtin(obj):
+    """JSON fallback for numpy values and mapping views"""
+    if isinstance(obj, (np.generic, np.ndarray)):
+        if obj.dtype.kind == 'f' and obj.dtype.itemsize < 8:
+            # Shortest decimal at the value's own precision, as orjson writes it
+            obj = obj.astype(str).astype(np.float64)
+        return obj.tolist()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def encode_json(obj):
+        """Compact JSON bytes for obj (orjson, numpy arrays and scalars supported)"""
+        return orjson.dumps(obj, default=_to_builtin, option=_ORJSON_OPTIONS)
+
+    def decode_json(data):
+        return orjson.loads(data)
+else:
+    _ENCODER = json.JSONEncoder(separators=(',', ':'), default=_to_builtin)
+
+    def encode_json(obj):
+        """Compact JSON bytes for obj (numpy arrays and scalars supported)"""
+        return _ENCODER.encode(obj).encode()
+
+    def decode_json(data):
+        return json.loads(data)
+
+
+def _open(path, mode, compression):
+    if compression is None:
+        return open(path, mode)
+    if compression == 'gzip':
+        return gzip.open(path, mode, compresslevel=6)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd compression needs the 'zstandard' package") from e
+        return zstandard.open(path, mode)
+    raise ValueError(
+        f"Unknown compression {compression!r}, expected None, 'gzip' or 'zstd'"
+    )
+
+
+def infer_compression(path):
+    """'gzip' for .gz, 'zstd' for .zst/.zstd, otherwise None"""
+    path = str(path)
+    if path.endswith('.gz'):
+        return 'gzip'
+    if path.endswith(('.zst', '.zstd')):
+        return 'zstd'
+    return None
+
+
+def iter_json_chunks(obj, depth=2):
+    """
+    Encode obj as JSON piece by piece
+
+    Dicts and lists down to depth are opened here and their items encoded
+    one at a time, so e.g. sankey_data's 'flows' list is written flow by
+    flow and never exists as one big string.
+    """
+    if depth > 0 and isinstance(obj, Mapping):
+        yield b'{'
+        for i, (key, value) in enumerate(obj.items()):
+            yield (b',' if i else b'') + encode_json(str(key)) + b':'
+            yield from iter_json_chunks(value, depth - 1)
+        yield b'}'
+    elif depth > 0 and isinstance(obj, (list, tuple)):
+        yield b'['
+        for i, value in enumerate(obj):
+            if i:
+                yield b','
+            yield from iter_json_chunks(value, depth - 1)
+        yield b']'
+    else:
+        yield encode_json(obj)
+
+
+def dump_sankey_data(sankey_data, output_path, compression='infer'):
+    """
+    Write sankey data as compact JSON, streamed and optionally compressed
+
+    Args:
+        sankey_data (dict): Processed data, may hold numpy arrays and scalars
+        output_path (str): Destination file
+        compression (str, optional): None, 'gzip', 'zstd' or 'infer' (from the
+            file suffix)
+    Returns:
+        int: Uncompressed size in bytes
+    """
+    if compression == 'infer':
+        compression = infer_compression(output_path)
+
+    size = 0
+    buffered = []
+    buffered_size = 0
+
+    with _open(output_path, 'wb', compression) as f:
+        for chunk in iter_json_chunks(sankey_data):
+            buffered.append(chunk)
+            buffered_size += len(chunk)
+            if buffered_size >= WRITE_BUFFER_SIZE:
+                f.write(b''.join(buffered))
+                size += buffered_size
+                buffered, buffered_size = [], 0
+        f.write(b''.join(buffered))
+        size += buffered_size
+
+    return size
+
+
+def load_sankey_data(input_path, compression='infer'):
+    """Read sankey data written by dump_sankey_data (or any JSON file)"""
+    if compression == 'infer':
+        compression = infer_compression(input_path)
+    with _open(input_path, 'rb', compression) as f:
+        return decode_json(f.read())
@@ -0,0 +1,61 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def read_probability_csv(path, dtype=np.float64):
+    """
+    Read a probability matrix CSV whose first column holds the row names
+
+    Args:
+        path (str): CSV file, e.g. DirichletComponentProbabilities_5.csv
+        dtype: dtype of the value columns (float32 halves memory)
+
+    Returns:
+        pd.DataFrame: Rows as in the file, value columns as dtype
+    """
+    # The files are wide (one column per sample or feature): per-column dtype dicts
+    # and the pyarrow engine both scale badly with column count, so parse plainly
+    # and cast once
+    frame = pd.read_csv(path, index_col=0)
+    values = frame.to_numpy(dtype=dtype, copy=False)
+    return pd.DataFrame(values, index=frame.index, columns=frame.columns)
+
+
+def k_file_paths(folder, pattern, k_values):
+    """{k: path} for the files of pattern (with {} for K) that exist in folder"""
+    paths = {}
+    for k in k_values:
+        path = os.path.join(folder, pattern.format(k))
+        if os.path.exists(path):
+            paths[k] = path
+    return paths
+
+
+def read_csv_files(paths, dtype=np.float64, max_workers=None):
+    """
+    Read several probability CSVs concurrently, in a thread pool
+
+    Args:
+        paths (dict): key -> CSV path
+        dtype: Passed to read_probability_csv; a dict gives one per key
+        max_workers (int, optional): Pool size, defaults to one worker per
+            file (capped by CPU count)
+
+    Returns:
+        dict: key -> DataFrame, in the order of paths
+    """
+    if not paths:
+        return {}
+
+    dtypes = dtype if isinstance(dtype, dict) else dict.fromkeys(paths, dtype)
+    workers = max_workers or min(len(paths), os.cpu_count() or 1)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            key: executor.submit(read_probability_csv, path, dtypes[key])
+            for key, path in paths.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
@@ -0,0 +1,200 @@
+import os
+import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from xml.parsers import expat
+
+import numpy as np
+import pandas as pd
+
+MALLET_FILE_PATTERN = re.compile(r'mallet\.diagnostics\.(\d+)\.xml')
+
+# Per-topic diagnostics kept from mallet.diagnostics.{k}.xml:
+# (field name, <topic> attribute)
+DIAGNOSTIC_FIELDS = (
+    ('tokens', 'tokens'),
+    ('document_entropy', 'document_entropy'),
+    ('word_length', 'word-length'),
+    ('coherence', 'coherence'),
+    ('uniform_dist', 'uniform_dist'),
+    ('corpus_dist', 'corpus_dist'),
+    ('eff_num_words', 'eff_num_words'),
+    ('token_doc_diff', 'token-doc-diff'),
+    ('rank_1_docs', 'rank_1_docs'),
+    ('allocation_ratio', 'allocation_ratio'),
+    ('allocation_count', 'allocation_count'),
+    ('exclusivity', 'exclusivity'),
+)
+
+DIAGNOSTICS_DTYPE = np.dtype(
+    [('topic_id', '<i4')] + [(name, '<f8') for name, _ in DIAGNOSTIC_FIELDS]
+)
+
+# With top words: an extra object field holding each topic's
+# [(word, prob), ...] in rank order
+TOP_WORDS_DTYPE = np.dtype(DIAGNOSTICS_DTYPE.descr + [('top_words', 'O')])
+
+
+def _float_attribute(attributes, name):
+    value = attributes.get(name)
+    return float(value) if value else 0.0
+
+
+def parse_mallet_diagnostics(xml_file_path, top_words=0):
+    """
+    Stream the <topic> attributes of one MALLET diagnostics file into a record array
+
+    The file goes through expat with a start-element handler only: no element
+    tree is built, so the thousands of <word> entries per topic cost one
+    callback each and memory stays flat whatever the K. Missing attributes
+    read as 0.0; topics with an unparseable id and words with an unparseable
+    rank are skipped with a warning.
+
+    With top_words=N the same pass also keeps the N best-ranked <word>
+    entries of every topic. Text and end-element handlers are attached only
+    while such a word is open, so the remaining words cost nothing extra.
+
+    Args:
+        xml_file_path (str): e.g. 'mallet.diagnostics.10.xml'
+        top_words (int): Words to keep per topic (by their 'rank' attribute),
+            0 for none
+
+    Returns:
+        np.ndarray: Structured array of DIAGNOSTICS_DTYPE (TOP_WORDS_DTYPE with
+                    top_words), one row per topic in file order
+
+    Raises:
+        xml.parsers.expat.ExpatError: If the file is not well-formed XML
+    """
+    rows = []
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+
+    # Top words of the current topic, and the text chunks of the word being captured
+    words = []
+    word = {}
+
+    def word_text(data):
+        word['text'].append(data)
+
+    def end_word(name):
+        words.append((''.join(word['text']).strip(), word['prob']))
+        parser.CharacterDataHandler = None
+        parser.EndElementHandler = None
+
+    def start_element(name, attributes):
+        nonlocal words
+        if name == 'word':
+            if not top_words:
+                return
+            try:
+                rank = int(attributes.get('rank') or 0)
+            except ValueError as e:
+                warnings.warn(
+                    f"Could not parse word rank {attributes.get('rank')!r} "
+                    f"in {xml_file_path}: {e}",
+                    stacklevel=2,
+                )
+                return
+            if 0 < rank <= top_words:
+                word.update(text=[], prob=_float_attribute(attributes, 'prob'))
+                parser.CharacterDataHandler = word_text
+                parser.EndElementHandler = end_word
+            return
+        if name != 'topic':
+            return
+
+        words = []
+        try:
+            row = (int(attributes.get('id')),) + tuple(
+                _float_attribute(attributes, attribute)
+                for _, attribute in DIAGNOSTIC_FIELDS
+            )
+        except (ValueError, TypeError) as e:
+            warnings.warn(
+                f"Could not parse topic {attributes.get('id')!r} "
+                f"in {xml_file_path}: {e}",
+                stacklevel=2,
+            )
+            return
+        # The words list is filled in as the topic's <word> entries stream past
+        rows.append(row + (words,) if top_words else row)
+
+    parser.StartElementHandler = start_element
+    with open(xml_file_path, 'rb') as f:
+        parser.ParseFile(f)
+
+    if not top_words:
+        return np.array(rows, dtype=DIAGNOSTICS_DTYPE)
+
+    records = np.empty(len(rows), dtype=TOP_WORDS_DTYPE)
+    for i, row in enumerate(rows):
+        records[i] = row
+    return records
+
+
+def mallet_diagnostics_files(folder):
+    """{k: path} of the mallet.diagnostics.{k}.xml files in folder, sorted by K"""
+    paths = {}
+    for filename in os.listdir(folder):
+        match = MALLET_FILE_PATTERN.fullmatch(filename)
+        if match:
+            paths[int(match.group(1))] = os.path.join(folder, filename)
+    return dict(sorted(paths.items()))
+
+
+def load_mallet_diagnostics(paths, max_workers=None, processes=True, top_words=0):
+    """
+    Parse several MALLET diagnostics files in a pool and combine them into one frame
+
+    Parsing is pure-Python callback work, so files are spread over a process
+    pool (one worker per file, capped by CPU count). Files that cannot be
+    parsed are skipped with a warning.
+
+    Args:
+        paths (dict): K -> diagnostics file, e.g. from mallet_diagnostics_files
+        max_workers (int, optional): Pool size
+        processes (bool): Use processes; threads (or a single file) parse in-process
+        top_words (int): Also collect each topic's N best-ranked words
+            (see parse_mallet_diagnostics)
+
+    Returns:
+        pd.DataFrame: One row per topic, ordered by K then file order, with
+                      'global_topic_id' (e.g. 'K4_MC2'), 'k_value', 'topic_id',
+                      the DIAGNOSTIC_FIELDS, 'top_words' (only with top_words)
+                      and 'source_file'
+    """
+    dtype = TOP_WORDS_DTYPE if top_words else DIAGNOSTICS_DTYPE
+    columns = ['global_topic_id', 'k_value'] + list(dtype.names) + ['source_file']
+    if not paths:
+        return pd.DataFrame(columns=columns)
+
+    workers = max_workers or min(len(paths), os.cpu_count() or 1)
+    in_process = not processes or workers == 1 or len(paths) == 1
+    pool = ThreadPoolExecutor if in_process else ProcessPoolExecutor
+
+    parsed = {}
+    with pool(max_workers=workers) as executor:
+        futures = {
+            k: executor.submit(parse_mallet_diagnostics, path, top_words)
+            for k, path in paths.items()
+        }
+        for k, future in futures.items():
+            try:
+                parsed[k] = future.result()
+            except (OSError, expat.ExpatError) as e:
+                warnings.warn(f"Skipping {paths[k]}: {e}", stacklevel=2)
+
+    records = np.concatenate(list(parsed.values())) if parsed else np.empty(0, dtype)
+    counts = [len(parsed[k]) for k in parsed]
+    k_values = np.fromiter(parsed, dtype=np.int64, count=len(parsed))
+
+    df = pd.DataFrame(records)
+    df.insert(0, 'k_value', np.repeat(k_values, counts))
+    df.insert(
+        0,
+        'global_topic_id',
+        'K' + df['k_value'].astype(str) + '_MC' + df['topic_id'].astype(str),
+    )
+    df['source_file'] = np.repeat([os.path.basename(paths[k]) for k in parsed], counts)
+    return df[columns]
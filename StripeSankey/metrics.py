@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from .mallet import DIAGNOSTIC_FIELDS
+
+DIAGNOSTIC_COLUMNS = [name for name, _ in DIAGNOSTIC_FIELDS]
+
+
+def topic_keys(topic_ids):
+    """
+    Parse global topic ids ('K4_MC2') into join keys, vectorized
+
+    Returns:
+        pd.DataFrame: 'topic_id', 'k_value', 'topic_index' in input order;
+                      ids that do not match K{k}_MC{i} get -1 keys
+    """
+    ids = pd.Series(list(topic_ids), dtype=object)
+    parts = ids.str.extract(r'^K(\d+)_MC(\d+)$')
+    return pd.DataFrame({
+        'topic_id': ids,
+        'k_value': pd.to_numeric(parts[0]).fillna(-1).astype(np.int64),
+        'topic_index': pd.to_numeric(parts[1]).fillna(-1).astype(np.int64),
+    })
+
+
+def load_perplexity(csv_file_path):
+    """
+    Read a per-K metrics CSV with 'Num_MCs' and 'Perplexity' columns
+
+    Returns:
+        pd.DataFrame: 'k_value', 'perplexity', one row per K that has a perplexity
+
+    Raises:
+        KeyError: If either column is missing
+    """
+    df = pd.read_csv(csv_file_path)
+    missing = [c for c in ('Num_MCs', 'Perplexity') if c not in df.columns]
+    if missing:
+        raise KeyError(f"{csv_file_path} has no {', '.join(missing)} column")
+
+    df = df[['Num_MCs', 'Perplexity']].dropna()
+    return pd.DataFrame({
+        'k_value': df['Num_MCs'].astype(np.int64).to_numpy(),
+        'perplexity': df['Perplexity'].astype(np.float64).to_numpy(),
+    }).drop_duplicates('k_value', keep='last')
+
+
+def join_topic_metrics(topic_ids, diagnostics=None, perplexity=None):
+    """
+    Node table with topic metrics attached by left joins on (k_value, topic_index)
+
+    Args:
+        topic_ids (iterable): Global topic ids, e.g. the keys of sankey_data['nodes']
+        diagnostics (pd.DataFrame, optional): From load_mallet_diagnostics
+            ('k_value', 'topic_id', ...)
+        perplexity (pd.DataFrame, optional): From load_perplexity
+            ('k_value', 'perplexity')
+
+    Returns:
+        pd.DataFrame: One row per topic id in input order: topic_keys' columns, every
+                      diagnostics column (NaN where missing), 'perplexity', and the
+                      boolean match flags 'has_diagnostics' / 'has_perplexity'
+    """
+    table = topic_keys(topic_ids)
+
+    if diagnostics is not None:
+        columns = [
+            c for c in diagnostics.columns
+            if c not in ('global_topic_id', 'source_file')
+        ]
+        right = (diagnostics[columns]
+                 .rename(columns={'topic_id': 'topic_index'})
+                 .astype({'k_value': np.int64, 'topic_index': np.int64})
+                 .drop_duplicates(['k_value', 'topic_index'], keep='last')
+                 .assign(has_diagnostics=True))
+        table = table.merge(right, on=['k_value', 'topic_index'], how='left')
+        table['has_diagnostics'] = table['has_diagnostics'].fillna(False).astype(bool)
+
+    if perplexity is not None:
+        right = (perplexity[['k_value', 'perplexity']]
+                 .astype({'k_value': np.int64})
+                 .assign(has_perplexity=True))
+        table = table.merge(right, on='k_value', how='left')
+        table['has_perplexity'] = table['has_perplexity'].fillna(False).astype(bool)
+
+    return table
+
+
+def attach_topic_metrics(nodes, table):
+    """
+    Write the metrics of a join_topic_metrics table into the node dicts
+
+    Matched nodes get 'mallet_diagnostics' (the diagnostic fields present in
+    the table), 'top_words', and 'perplexity'/'k_value' merged into
+    'model_metrics' -- the keys the widget reads.
+
+    Returns:
+        dict: Matched node count per attached field
+    """
+    counts = {}
+
+    if 'has_diagnostics' in table:
+        matched = table[table['has_diagnostics']]
+        fields = [c for c in DIAGNOSTIC_COLUMNS if c in table]
+        if fields:
+            records = matched[fields].to_dict('records')
+            for topic_id, record in zip(matched['topic_id'], records):
+                nodes[topic_id]['mallet_diagnostics'] = record
+            counts['mallet_diagnostics'] = len(matched)
+        if 'top_words' in table:
+            for topic_id, words in zip(matched['topic_id'], matched['top_words']):
+                nodes[topic_id]['top_words'] = words
+            counts['top_words'] = len(matched)
+
+    if 'has_perplexity' in table:
+        matched = table[table['has_perplexity']]
+        for topic_id, perplexity, k_value in zip(
+            matched['topic_id'],
+            matched['perplexity'].tolist(),
+            matched['k_value'].tolist(),
+        ):
+            metrics = nodes[topic_id].setdefault('model_metrics', {})
+            metrics.update(perplexity=perplexity, k_value=k_value)
+        counts['model_metrics'] = len(matched)
+
+    return counts
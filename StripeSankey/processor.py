@@ -0,0 +1,944 @@
+import os
+from collections.abc import Mapping
+from xml.parsers.expat import ExpatError
+
+import numpy as np
+import pandas as pd
+
+from .cache import SweepCache, sweep_cache_key
+from .export import dump_sankey_data
+from .loading import k_file_paths, read_csv_files
+from .mallet import (
+    load_mallet_diagnostics,
+    mallet_diagnostics_files,
+    parse_mallet_diagnostics,
+)
+from .metrics import attach_topic_metrics, join_topic_metrics, load_perplexity
+from .schema import INDEXED_FORMAT
+from .segments import LEVEL_CODES, LEVELS, UNASSIGNED, segment_name
+
+
+def topic_name(k, topic_idx):
+    """Global topic id used by the widget, e.g. 'K4_MC2'"""
+    return f"K{k}_MC{topic_idx}"
+
+
+def categorize_topic_matrix(
+    probabilities, high_threshold=0.67, medium_threshold=0.33
+):
+    """
+    Categorize one K's topic x sample probability matrix with array operations
+
+    Args:
+        probabilities (np.ndarray): Shape (topics, samples)
+        high_threshold (float): Minimum probability for 'high' representation
+        medium_threshold (float): Minimum probability for 'medium' representation
+
+    Returns:
+        dict: {
+            'high': bool array (topics x samples),
+            'medium': bool array (topics x samples), medium but not high,
+            'total_probability': float array (topics,), summed over high + medium,
+            'topic': int array (samples,), primary topic index or -1,
+            'probability': float array (samples,), probability of the primary topic,
+            'level': int8 array (samples,), index into LEVELS or -1
+        }
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    n_topics, n_samples = probabilities.shape
+
+    high = probabilities >= high_threshold
+    medium = (probabilities >= medium_threshold) & ~high
+    total_probability = np.where(high | medium, probabilities, 0.0).sum(axis=1)
+
+    # Primary assignment: highest probability at or above the medium threshold
+    # (first topic wins ties)
+    topic = np.full(n_samples, UNASSIGNED, dtype=np.int64)
+    probability = np.zeros(n_samples, dtype=np.float64)
+    level = np.full(n_samples, UNASSIGNED, dtype=np.int8)
+
+    if n_topics and n_samples:
+        eligible = np.where(probabilities >= medium_threshold, probabilities, -np.inf)
+        best_topic = eligible.argmax(axis=0)
+        best = eligible[best_topic, np.arange(n_samples)]
+        assigned = best > 0
+
+        topic[assigned] = best_topic[assigned]
+        probability[assigned] = best[assigned]
+        level[assigned] = np.where(
+            best[assigned] >= high_threshold,
+            LEVEL_CODES["high"],
+            LEVEL_CODES["medium"],
+        )
+
+    return {
+        "high": high,
+        "medium": medium,
+        "total_probability": total_probability,
+        "topic": topic,
+        "probability": probability,
+        "level": level,
+    }
+
+
+def segment_codes(topic, level):
+    """Segment code per (topic, level): topic * len(LEVELS) + level, -1 if unassigned"""
+    return np.where(topic != UNASSIGNED, topic * len(LEVELS) + level, UNASSIGNED)
+
+
+def calculate_flow_table(source, target):
+    """
+    Count K -> K+1 transitions between two primary-assignment tables
+
+    Segments are integer codes (see segment_codes), so each sample's transition
+    is one integer and the flow counts are a single np.bincount.
+
+    Args:
+        source (dict): 'assignments' of the lower K, from categorize_sample_assignments
+        target (dict): 'assignments' of the higher K
+
+    Returns:
+        dict: One row per non-empty flow, ordered by (source segment, target segment): {
+            'source_segment', 'target_segment': segment codes,
+            'sample_count': int array,
+            'average_probability': mean of (source_prob + target_prob) / 2 per flow,
+            'sample_offsets': int array (flows + 1), CSR offsets into the arrays below,
+            'sample_index': rows into source['sample_names'],
+            'source_prob', 'target_prob': float arrays
+        }
+    """
+    # Target row of every source sample (-1 if the sample is missing at the higher K)
+    source_names = np.asarray(source['sample_names'])
+    target_names = np.asarray(target['sample_names'])
+    if np.array_equal(source_names, target_names):
+        target_rows = np.arange(len(source_names))
+    else:
+        target_rows = pd.Index(target_names).get_indexer(source_names)
+
+    source_codes = segment_codes(source['topic'], source['level'])
+    target_codes = np.where(
+        target_rows >= 0,
+        segment_codes(target['topic'], target['level'])[target_rows],
+        UNASSIGNED,
+    )
+
+    # Samples assigned at both K, grouped by flow (stable, so column order is kept
+    # within a flow)
+    rows = np.flatnonzero((source_codes != UNASSIGNED) & (target_codes != UNASSIGNED))
+    n_target_segments = len(LEVELS) * (int(np.max(target['topic'], initial=-1)) + 1)
+    pair = source_codes[rows] * n_target_segments + target_codes[rows]
+    order = np.argsort(pair, kind='stable')
+    rows = rows[order]
+    pair = pair[order]
+
+    source_prob = np.asarray(source['probability'])[rows]
+    target_prob = np.asarray(target['probability'])[target_rows[rows]]
+
+    counts = np.bincount(pair)
+    flow_pairs = np.flatnonzero(counts)
+    sample_count = counts[flow_pairs]
+    pair_probability = (source_prob + target_prob) / 2
+    probability_sums = np.bincount(pair, weights=pair_probability)[flow_pairs]
+
+    return {
+        'source_segment': flow_pairs // max(n_target_segments, 1),
+        'target_segment': flow_pairs % max(n_target_segments, 1),
+        'sample_count': sample_count,
+        'average_probability': probability_sums / np.maximum(sample_count, 1),
+        'sample_offsets': np.concatenate(([0], np.cumsum(sample_count))),
+        'sample_index': rows,
+        'source_prob': source_prob,
+        'target_prob': target_prob,
+    }
+
+
+def code_segment_name(k, code):
+    """Segment name for a segment code at K, e.g. (3, 5) -> 'K3_MC2_medium'"""
+    return segment_name(topic_name(k, code // len(LEVELS)), LEVELS[code % len(LEVELS)])
+
+
+class SampleAssignments(Mapping):
+    """
+    Read-only {sample_id: {'assigned_topic', 'probability', 'level'}} view over
+    assignment arrays
+
+    Entries are built on access, so categorizing large cohorts does not create
+    one dict per sample up front.
+    """
+
+    def __init__(self, sample_names, topic_names, topic, probability, level):
+        assigned = np.flatnonzero(topic != UNASSIGNED)
+        self._names = sample_names[assigned].tolist()
+        self._topic_names = topic_names
+        self._topic = topic[assigned]
+        self._probability = probability[assigned]
+        self._level = level[assigned]
+        self._rows = None
+
+    def __getitem__(self, sample_name):
+        if self._rows is None:
+            self._rows = {name: row for row, name in enumerate(self._names)}
+        row = self._rows[sample_name]
+        return {
+            'assigned_topic': self._topic_names[self._topic[row]],
+            'probability': float(self._probability[row]),
+            'level': LEVELS[self._level[row]]
+        }
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+class StripeSankeyDataProcessor:
+    """
+    Build StripeSankeyInline data from a sweep of topic models
+
+    Expects one DirichletComponentProbabilities_{k}.csv per K in sample_mc_folder,
+    with topics (MCs) as rows and samples as columns, and optionally one
+    ASVProbabilities_{k}.csv per K in mc_feature_folder (topics x features).
+
+    With cache_dir set, the parsed matrices and flow tables are stored there as
+    .npy files keyed on the source files' paths and mtimes (see SweepCache), and
+    prepare_sankey_data reuses them while the sweep is unchanged. The MALLET
+    diagnostics and perplexity tables are cached the same way, each keyed on
+    its own files, so metric integration skips the XML on unchanged files.
+    """
+
+    sample_mc_pattern = 'DirichletComponentProbabilities_{}.csv'
+    mc_feature_pattern = 'ASVProbabilities_{}.csv'
+
+    def __init__(self, sample_mc_folder, mc_feature_folder, k_range=range(2, 11),
+                 verbose=True, feature_dtype=np.float32, max_workers=None,
+                 cache_dir=None):
+        self.sample_mc_folder = sample_mc_folder
+        self.mc_feature_folder = mc_feature_folder
+        self.k_range = k_range
+        self.verbose = verbose
+
+        # CSV loading: reader pool size (None = one worker per file) and the value
+        # dtype of the MC-feature matrices. Sample-MC matrices are always float64,
+        # so categorization and the exported probabilities match the source files
+        # exactly
+        self.feature_dtype = feature_dtype
+        self.max_workers = max_workers
+        self.cache = SweepCache(cache_dir) if cache_dir else None
+
+        # Thresholds for representation levels
+        self.high_threshold = 0.67
+        self.medium_threshold = 0.33
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def load_sample_mc_data(self):
+        """Load all sample-MC probability files (concurrently, one reader per K)"""
+        return self.load_sweep_data(features=False)[0]
+
+    def load_topic_feature_data(self):
+        """Load all MC-feature (ASV) probability files (concurrently, one per K)"""
+        return self.load_sweep_data(samples=False)[1]
+
+    def load_sweep_data(self, samples=True, features=True):
+        """
+        Load the sample-MC and MC-feature files of every K in one reader pool
+
+        Returns:
+            tuple: ({k: sample-MC DataFrame}, {k: MC-feature DataFrame})
+        """
+        paths = {}
+        if samples:
+            sample_paths = k_file_paths(
+                self.sample_mc_folder, self.sample_mc_pattern, self.k_range
+            )
+            paths.update({('samples', k): path for k, path in sample_paths.items()})
+        if features and self.mc_feature_folder:
+            feature_paths = k_file_paths(
+                self.mc_feature_folder, self.mc_feature_pattern, self.k_range
+            )
+            paths.update({('features', k): path for k, path in feature_paths.items()})
+
+        dtypes = {
+            key: np.float64 if key[0] == 'samples' else self.feature_dtype
+            for key in paths
+        }
+        frames = read_csv_files(paths, dtype=dtypes, max_workers=self.max_workers)
+
+        sample_mc_data = {}
+        mc_feature_data = {}
+        for (kind, k), df in frames.items():
+            if kind == 'samples':
+                sample_mc_data[k] = df
+                self._log(
+                    f"Loaded K={k}: {df.shape[0]} topics (MCs), {df.shape[1]} samples"
+                )
+            else:
+                mc_feature_data[k] = df
+                self._log(
+                    f"Loaded K={k}: {df.shape[0]} topics (MCs), {df.shape[1]} features"
+                )
+
+            # Sanity check - K=k should have exactly k topics (rows)
+            if df.shape[0] != k:
+                self._log(f"WARNING: K={k} has {df.shape[0]} topics, expected {k}")
+
+        if samples:
+            for k in self.k_range:
+                if k not in sample_mc_data:
+                    self._log(f"File not found: {self.sample_mc_pattern.format(k)}")
+
+        return sample_mc_data, mc_feature_data
+
+    def categorize_sample_assignments(self, sample_mc_data, sample_lists=True):
+        """
+        For each topic at each K, categorize samples into high/medium
+        representation levels. Data structure: rows=MCs, columns=samples
+
+        Returns the same structure as before ('nodes' and 'sample_assignments'
+        per K), plus 'assignments' with the primary assignment as arrays:
+        {'sample_names', 'topic' (index or -1), 'probability',
+        'level' (index into LEVELS or -1)} and 'membership' with the high/medium
+        masks (topics x samples) per level.
+
+        With sample_lists=False the nodes carry only counts and total probability,
+        not the (sample, probability) lists.
+        """
+        categorized_data = {}
+
+        for k, df in sample_mc_data.items():
+            probabilities = df.to_numpy(dtype=np.float64)
+            sample_names = df.columns.to_numpy()
+            categories = categorize_topic_matrix(
+                probabilities, self.high_threshold, self.medium_threshold
+            )
+            topic_names = [topic_name(k, idx) for idx in range(df.shape[0])]
+
+            k_data = {
+                # topic_id -> {high_samples: [], medium_samples: [], high_count: int,
+                #              medium_count: int, total_prob: float}
+                'nodes': {},
+                # sample_id -> {assigned_topic: str, probability: float, level: str}
+                'sample_assignments': None,
+                'assignments': {
+                    'sample_names': sample_names,
+                    'topic': categories['topic'],
+                    'probability': categories['probability'],
+                    'level': categories['level'],
+                },
+                'membership': {level: categories[level] for level in LEVELS},
+            }
+
+            for topic_idx, name in enumerate(topic_names):
+                high_idx = np.flatnonzero(categories['high'][topic_idx])
+                medium_idx = np.flatnonzero(categories['medium'][topic_idx])
+
+                row = probabilities[topic_idx]
+                node = {
+                    'high_count': len(high_idx),
+                    'medium_count': len(medium_idx),
+                    'total_probability': float(
+                        categories['total_probability'][topic_idx]
+                    ),
+                }
+                if sample_lists:
+                    node = {
+                        'high_samples': list(zip(
+                            sample_names[high_idx].tolist(), row[high_idx].tolist()
+                        )),
+                        'medium_samples': list(zip(
+                            sample_names[medium_idx].tolist(), row[medium_idx].tolist()
+                        )),
+                        **node,
+                    }
+
+                k_data['nodes'][name] = node
+
+            # Each sample's PRIMARY topic assignment (highest probability above
+            # threshold)
+            k_data['sample_assignments'] = SampleAssignments(
+                sample_names,
+                topic_names,
+                categories['topic'],
+                categories['probability'],
+                categories['level'],
+            )
+
+            categorized_data[k] = k_data
+            self._log(
+                f"K={k}: {len(k_data['sample_assignments'])} samples assigned to topics"
+            )
+
+        return categorized_data
+
+    def calculate_flow_tables(self, categorized_data):
+        """
+        Flow tables between consecutive K values, with sample membership as index
+        arrays
+
+        Returns:
+            list: One dict per K pair, calculate_flow_table's arrays plus
+                  'source_k', 'target_k' and 'sample_names' (the rows
+                  'sample_index' refers to)
+        """
+        tables = []
+        k_values = sorted(categorized_data.keys())
+
+        for source_k, target_k in zip(k_values, k_values[1:]):
+            source = categorized_data[source_k]['assignments']
+            target = categorized_data[target_k]['assignments']
+            table = calculate_flow_table(source, target)
+            table.update({
+                'source_k': source_k,
+                'target_k': target_k,
+                'sample_names': source['sample_names'],
+            })
+            tables.append(table)
+            tracked = len(table['sample_index'])
+            self._log(f"K{source_k}→K{target_k}: {tracked} samples to track")
+
+        return tables
+
+    def calculate_flows(self, categorized_data):
+        """Calculate flows between consecutive K values from sample reassignments"""
+        return self.flows_from_tables(self.calculate_flow_tables(categorized_data))
+
+    def flows_from_tables(self, flow_tables, sample_names=None):
+        """
+        Expand flow tables (see calculate_flow_tables) into the widget's list of
+        flow dicts
+
+        With sample_names (a pd.Index), flows use the indexed schema: 'samples'
+        are int rows into sample_names, with parallel 'source_probs' /
+        'target_probs'.
+        """
+        flows = []
+
+        for table in flow_tables:
+            source_k, target_k = table['source_k'], table['target_k']
+            offsets = table['sample_offsets'].tolist()
+            source_probs = table['source_prob'].tolist()
+            target_probs = table['target_prob'].tolist()
+            if sample_names is not None:
+                table_rows = sample_names.get_indexer(table['sample_names'])
+                rows = table_rows[table['sample_index']].tolist()
+            else:
+                names = table['sample_names'][table['sample_index']].tolist()
+
+            for i, (source_code, target_code, count, avg_prob) in enumerate(zip(
+                table['source_segment'].tolist(),
+                table['target_segment'].tolist(),
+                table['sample_count'].tolist(),
+                table['average_probability'].tolist(),
+            )):
+                start, end = offsets[i], offsets[i + 1]
+                flow = {
+                    'source_k': source_k,
+                    'target_k': target_k,
+                    'source_segment': code_segment_name(source_k, source_code),
+                    'target_segment': code_segment_name(target_k, target_code),
+                    'sample_count': count,
+                    'average_probability': avg_prob,
+                }
+                if sample_names is not None:
+                    flow.update({
+                        'samples': rows[start:end],
+                        'source_probs': source_probs[start:end],
+                        'target_probs': target_probs[start:end],
+                    })
+                else:
+                    flow['samples'] = [
+                        {'sample': sample, 'source_prob': source, 'target_prob': target}
+                        for sample, source, target in zip(
+                            names[start:end],
+                            source_probs[start:end],
+                            target_probs[start:end],
+                        )
+                    ]
+                flows.append(flow)
+
+        self._log(f"Total flows calculated: {len(flows)}")
+        return flows
+
+    def cache_key(self):
+        """Cache key of the current sample-MC files and processing parameters"""
+        paths = k_file_paths(
+            self.sample_mc_folder, self.sample_mc_pattern, self.k_range
+        )
+        return sweep_cache_key(
+            paths.values(),
+            k_values=sorted(paths),
+            high_threshold=self.high_threshold,
+            medium_threshold=self.medium_threshold,
+        )
+
+    def load_processed_sweep(self, sample_lists=True):
+        """
+        Sample-MC matrices, categorization and flow tables of the sweep
+
+        The matrices and flow tables come from the cache when cache_dir is set
+        and the source files are unchanged; otherwise they are computed from the
+        CSVs and cached. Categorization is rebuilt from the matrices either way.
+
+        Args:
+            sample_lists (bool): Passed to categorize_sample_assignments
+
+        Returns:
+            tuple: (sample_mc_data, categorized_data, flow_tables), empty if no
+                   files were found
+        """
+        key = self.cache_key() if self.cache else None
+        cached = self.cache.load(key) if key else None
+
+        if cached is not None:
+            sample_mc_data, flow_tables = self._from_cache_tables(*cached)
+            self._log(
+                f"Loaded K={list(sample_mc_data)} from cache "
+                f"{self.cache.entry_path(key)}"
+            )
+        else:
+            sample_mc_data = self.load_sample_mc_data()
+            flow_tables = None
+
+        if not sample_mc_data:
+            return {}, {}, []
+
+        self._log("\nCategorizing sample assignments...")
+        categorized_data = self.categorize_sample_assignments(
+            sample_mc_data, sample_lists=sample_lists
+        )
+
+        if flow_tables is None:
+            self._log("\nCalculating flows...")
+            flow_tables = self.calculate_flow_tables(categorized_data)
+            if key:
+                tables, meta = self._to_cache_tables(sample_mc_data, flow_tables)
+                self.cache.save(key, tables, meta)
+                self._log(f"💾 Cached processed sweep in {self.cache.entry_path(key)}")
+
+        return sample_mc_data, categorized_data, flow_tables
+
+    @staticmethod
+    def _to_cache_tables(sample_mc_data, flow_tables):
+        """Cache tables: one per K (matrix, labels) and one per K pair (flow columns)"""
+        tables = {}
+        for k, df in sample_mc_data.items():
+            tables[f'K{k}'] = {
+                'probabilities': df.to_numpy(),
+                'topic_names': df.index.to_numpy().astype(str),
+                'sample_names': df.columns.to_numpy().astype(str),
+            }
+        for table in flow_tables:
+            tables[f"flows_K{table['source_k']}_K{table['target_k']}"] = {
+                column: values for column, values in table.items()
+                if column not in ('source_k', 'target_k', 'sample_names')
+            }
+
+        meta = {
+            'k_values': list(sample_mc_data),
+            'flow_pairs': [
+                [table['source_k'], table['target_k']] for table in flow_tables
+            ],
+        }
+        return tables, meta
+
+    @staticmethod
+    def _from_cache_tables(tables, meta):
+        """Inverse of _to_cache_tables; matrices stay memory-mapped"""
+        sample_mc_data = {}
+        for k in meta['k_values']:
+            table = tables[f'K{k}']
+            sample_mc_data[k] = pd.DataFrame(
+                table['probabilities'],
+                index=table['topic_names'],
+                columns=table['sample_names'],
+                copy=False,
+            )
+
+        flow_tables = []
+        for source_k, target_k in meta['flow_pairs']:
+            table = dict(tables[f'flows_K{source_k}_K{target_k}'])
+            table.update({
+                'source_k': source_k,
+                'target_k': target_k,
+                'sample_names': tables[f'K{source_k}']['sample_names'],
+            })
+            flow_tables.append(table)
+
+        return sample_mc_data, flow_tables
+
+    def _cached(self, source, paths, load, to_table, from_table, **params):
+        """
+        load() through the cache, keyed on the source files and parameters
+
+        Without cache_dir this is just load(). to_table turns the result into a
+        cache table ({column: array}) and from_table turns it back.
+        """
+        if not self.cache:
+            return load()
+
+        key = sweep_cache_key(paths, source=source, **params)
+        cached = self.cache.load(key)
+        if cached is not None:
+            self._log(f"Loaded {source} from cache {self.cache.entry_path(key)}")
+            return from_table(cached[0][source])
+
+        result = load()
+        self.cache.save(key, {source: to_table(result)})
+        return result
+
+    @staticmethod
+    def _diagnostics_to_cache_table(df):
+        """Diagnostics columns as arrays; top words flattened with offsets"""
+        table = {
+            column: df[column].to_numpy() for column in df.columns
+            if column != 'top_words'
+        }
+        if 'top_words' in df:
+            words = [word for topic in df['top_words'] for word in topic]
+            table.update({
+                'top_words_offsets': np.cumsum(
+                    [0] + [len(topic) for topic in df['top_words']]
+                ),
+                'top_words_text': np.array([w for w, _ in words], dtype=str),
+                'top_words_prob': np.array([p for _, p in words], dtype=np.float64),
+            })
+        return table
+
+    @staticmethod
+    def _diagnostics_from_cache_table(table):
+        """Inverse of _diagnostics_to_cache_table"""
+        columns = [c for c in table if not c.startswith('top_words_')]
+        df = pd.DataFrame({
+            column: table[column].tolist() if table[column].dtype.kind == 'U'
+            else np.array(table[column])
+            for column in columns
+        })
+        if 'top_words_offsets' in table:
+            offsets = table['top_words_offsets'].tolist()
+            text = table['top_words_text'].tolist()
+            prob = table['top_words_prob'].tolist()
+            top_words = [
+                list(zip(text[start:end], prob[start:end]))
+                for start, end in zip(offsets[:-1], offsets[1:])
+            ]
+            df.insert(columns.index('source_file'), 'top_words', top_words)
+        return df
+
+    def prepare_sankey_data(self, indexed=False):
+        """
+        Main function to prepare all data for Sankey diagram
+
+        Args:
+            indexed (bool): Produce the normalized schema (see
+                            schema.index_sankey_data): sample names stored once
+                            in 'sample_names', node and flow membership as int
+                            rows into it
+        """
+        self._log("Loading sample-MC data...")
+        sample_mc_data, categorized_data, flow_tables = self.load_processed_sweep(
+            sample_lists=not indexed
+        )
+
+        if not sample_mc_data:
+            self._log("❌ No data loaded. Check your file paths and naming.")
+            return None, None
+
+        sample_names = self._sample_dictionary(sample_mc_data) if indexed else None
+        flows = self.flows_from_tables(flow_tables, sample_names)
+
+        # Prepare final data structure for StripeSankey
+        sankey_data = {
+            'nodes': {},
+            'flows': flows,
+            # Only include K values we actually have
+            'k_range': list(sample_mc_data.keys()),
+            'thresholds': {
+                'high': self.high_threshold,
+                'medium': self.medium_threshold
+            },
+            'metadata': {
+                # columns = samples
+                'total_samples': next(iter(sample_mc_data.values())).shape[1],
+                'k_values_processed': list(sample_mc_data.keys())
+            }
+        }
+
+        # Collect all node data
+        for k_data in categorized_data.values():
+            for name, node_data in k_data['nodes'].items():
+                sankey_data['nodes'][name] = node_data
+
+        if indexed:
+            sankey_data.update({
+                'format': INDEXED_FORMAT,
+                'sample_names': sample_names.tolist(),
+            })
+            self._add_indexed_membership(
+                sankey_data['nodes'], sample_mc_data, categorized_data, sample_names
+            )
+
+        self._log("\n✅ Data processing complete!")
+        self._log(f"   - K values: {sankey_data['k_range']}")
+        self._log(f"   - Total nodes: {len(sankey_data['nodes'])}")
+        self._log(f"   - Total flows: {len(flows)}")
+        self._log(f"   - Samples tracked: {sankey_data['metadata']['total_samples']}")
+
+        return sankey_data, categorized_data
+
+    @staticmethod
+    def _sample_dictionary(sample_mc_data):
+        """Sample names of all K, once each, in first-seen order"""
+        sample_names = None
+        for df in sample_mc_data.values():
+            columns = pd.Index(df.columns)
+            if sample_names is None:
+                sample_names = columns
+            else:
+                sample_names = sample_names.append(columns[~columns.isin(sample_names)])
+        return sample_names
+
+    @staticmethod
+    def _add_indexed_membership(
+        nodes, sample_mc_data, categorized_data, sample_names
+    ):
+        """Indexed '{level}_samples' / '{level}_probs' of every node, from the masks"""
+        for k, k_data in categorized_data.items():
+            rows = sample_names.get_indexer(k_data['assignments']['sample_names'])
+            probabilities = sample_mc_data[k].to_numpy(dtype=np.float64)
+            for topic_idx, name in enumerate(k_data['nodes']):
+                for level in LEVELS:
+                    members = np.flatnonzero(k_data['membership'][level][topic_idx])
+                    nodes[name][f'{level}_samples'] = rows[members].tolist()
+                    row = probabilities[topic_idx]
+                    nodes[name][f'{level}_probs'] = row[members].tolist()
+
+    def save_processed_data(self, sankey_data, output_path='sankey_data.json',
+                            compression='infer'):
+        """
+        Save processed data as compact JSON
+
+        Numpy values are written directly (no converted copy of the data) and the
+        file is streamed, so large sweeps never exist as one JSON string. A
+        '.gz' or '.zst' suffix compresses the output; see dump_sankey_data.
+        """
+        if sankey_data is None:
+            self._log("❌ No data to save")
+            return
+
+        dump_sankey_data(sankey_data, output_path, compression=compression)
+        self._log(f"💾 Data saved to {output_path}")
+
+    def extract_topic_coherence(self, xml_file_path):
+        """Extract topic coherence data from a single MALLET diagnostic XML file"""
+        try:
+            topics = parse_mallet_diagnostics(xml_file_path)
+        except (OSError, ExpatError) as e:
+            self._log(f"❌ Could not parse {xml_file_path}: {e}")
+            return pd.DataFrame()
+
+        df = pd.DataFrame(topics)
+        self._log(f"Extracted {len(df)} topics from {xml_file_path}")
+        return df
+
+    def load_all_mallet_diagnostics(self, mallet_folder_path, top_words=0):
+        """
+        Load all MALLET diagnostic files from a folder, with global topic IDs
+
+        Args:
+            mallet_folder_path (str): Folder with files named like
+                'mallet.diagnostics.10.xml'
+            top_words (int): Also collect each topic's N top words in the same pass
+
+        Returns:
+            pd.DataFrame: All topics of all K (see load_mallet_diagnostics), empty
+                          if none were found
+        """
+        paths = {}
+        if os.path.isdir(mallet_folder_path):
+            paths = mallet_diagnostics_files(mallet_folder_path)
+        if not paths:
+            self._log(f"❌ No MALLET diagnostic files found in {mallet_folder_path}")
+            return pd.DataFrame()
+
+        df = self._cached(
+            'mallet_diagnostics',
+            paths.values(),
+            lambda: load_mallet_diagnostics(
+                paths, max_workers=self.max_workers, top_words=top_words
+            ),
+            self._diagnostics_to_cache_table,
+            self._diagnostics_from_cache_table,
+            top_words=top_words,
+        )
+        k_values = sorted(df['k_value'].unique().tolist())
+        self._log(
+            f"✅ Loaded MALLET diagnostics: {len(df)} topics, K values {k_values}"
+        )
+        return df
+
+    def load_perplexity_data(self, csv_file_path):
+        """
+        Load perplexity data from CSV file
+
+        Args:
+            csv_file_path (str): Path to CSV file containing Num_MCs and
+                Perplexity columns
+
+        Returns:
+            dict: Dictionary mapping K values to perplexity scores
+        """
+        try:
+            df = self._load_perplexity(csv_file_path)
+        except (OSError, KeyError, ValueError) as e:
+            self._log(f"❌ Error loading perplexity data: {e}")
+            return {}
+        return dict(zip(df['k_value'].tolist(), df['perplexity'].tolist()))
+
+    def _load_perplexity(self, csv_file_path):
+        """load_perplexity through the cache"""
+        return self._cached(
+            'perplexity',
+            [csv_file_path],
+            lambda: load_perplexity(csv_file_path),
+            lambda df: {column: df[column].to_numpy() for column in df.columns},
+            lambda table: pd.DataFrame({c: np.array(v) for c, v in table.items()}),
+        )
+
+    def integrate_model_metrics(self, sankey_data, mallet_folder_path=None,
+                                perplexity_csv_path=None, top_words=0):
+        """
+        Attach MALLET diagnostics and/or perplexity to the nodes in one join
+
+        Both sources are joined onto the node table on (K, topic index) --
+        see join_topic_metrics -- and written to the nodes in a single pass:
+        'mallet_diagnostics', 'top_words' (with top_words=N) and
+        'model_metrics' {'perplexity', 'k_value'}. Integration counts are
+        recorded in sankey_data['metadata'].
+
+        Args:
+            sankey_data (dict): Existing sankey data structure
+            mallet_folder_path (str, optional): Folder with
+                mallet.diagnostics.{k}.xml files
+            perplexity_csv_path (str, optional): CSV with Num_MCs and Perplexity
+                columns
+            top_words (int): Also attach each topic's N top words from the
+                diagnostics
+
+        Returns:
+            dict: sankey_data, updated in place
+        """
+        diagnostics = perplexity = None
+        if mallet_folder_path is not None:
+            diagnostics = self.load_all_mallet_diagnostics(
+                mallet_folder_path, top_words=top_words
+            )
+            if diagnostics.empty:
+                diagnostics = None
+        if perplexity_csv_path is not None:
+            try:
+                perplexity = self._load_perplexity(perplexity_csv_path)
+            except (OSError, KeyError, ValueError) as e:
+                self._log(f"❌ Error loading perplexity data: {e}")
+
+        if diagnostics is None and perplexity is None:
+            self._log("❌ No model metrics to integrate")
+            return sankey_data
+
+        nodes = sankey_data['nodes']
+        table = join_topic_metrics(nodes.keys(), diagnostics, perplexity)
+        counts = attach_topic_metrics(nodes, table)
+        metadata = sankey_data.setdefault('metadata', {})
+        now = pd.Timestamp.now().isoformat()
+
+        if diagnostics is not None:
+            integrated = int(table['has_diagnostics'].sum())
+            metadata['mallet_integration'] = {
+                'integrated_topics': integrated,
+                'missing_topics': len(nodes) - integrated,
+                'total_mallet_topics': len(diagnostics),
+                'integration_date': now,
+                'mallet_folder': mallet_folder_path
+            }
+            self._log(
+                f"✅ MALLET diagnostics added to {integrated} of {len(nodes)} topics"
+            )
+
+        if perplexity is not None:
+            found = table['has_perplexity']
+            missing = ~found & (table['k_value'] >= 0)
+            metadata.setdefault('model_integration', {})['perplexity'] = {
+                'integrated_topics': counts['model_metrics'],
+                'missing_topics': int((~found).sum()),
+                'k_values_with_perplexity': sorted(
+                    set(table.loc[found, 'k_value'].tolist())
+                ),
+                'k_values_missing_perplexity': sorted(
+                    set(table.loc[missing, 'k_value'].tolist())
+                ),
+                'total_k_values_available': len(perplexity),
+                'integration_date': now,
+                'source_file': perplexity_csv_path
+            }
+            self._log(
+                f"✅ Perplexity added to {counts['model_metrics']} of "
+                f"{len(nodes)} topics"
+            )
+
+        return sankey_data
+
+    def integrate_mallet_diagnostics(self, sankey_data, mallet_folder_path,
+                                     top_words=0):
+        """
+        Attach MALLET diagnostics (and optionally top words) to the nodes, see
+        integrate_model_metrics
+        """
+        return self.integrate_model_metrics(
+            sankey_data, mallet_folder_path=mallet_folder_path, top_words=top_words
+        )
+
+    def integrate_perplexity_data(self, sankey_data, csv_file_path):
+        """
+        Attach per-K perplexity to every topic of that K, see
+        integrate_model_metrics
+        """
+        return self.integrate_model_metrics(
+            sankey_data, perplexity_csv_path=csv_file_path
+        )
+
+    def integrate_all_model_data(self, sankey_data, mallet_folder_path,
+                                 perplexity_csv_path, top_words=0):
+        """
+        Attach MALLET diagnostics and perplexity in one pass, see
+        integrate_model_metrics
+        """
+        return self.integrate_model_metrics(
+            sankey_data, mallet_folder_path, perplexity_csv_path, top_words
+        )
+
+    def integrate_top_words(self, sankey_data, mallet_folder_path, top_n=10):
+        """
+        Add each topic's top words from the MALLET diagnostics to its node
+
+        The words come from the diagnostics files' <word> entries, so the dense
+        ASVProbabilities matrices are never loaded. Nodes get 'top_words' as
+        [(word, probability), ...] in rank order, shown in the widget's tooltips.
+        """
+        diagnostics = self.load_all_mallet_diagnostics(
+            mallet_folder_path, top_words=top_n
+        )
+        if diagnostics.empty:
+            return sankey_data
+
+        nodes = sankey_data['nodes']
+        table = join_topic_metrics(
+            nodes.keys(), diagnostics[['k_value', 'topic_id', 'top_words']]
+        )
+        counts = attach_topic_metrics(nodes, table)
+        self._log(
+            f"✅ Top {top_n} words added to {counts.get('top_words', 0)} of "
+            f"{len(nodes)} topics"
+        )
+        return sankey_data
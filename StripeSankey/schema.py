@@ -0,0 +1,103 @@
+import math
+
+from .segments import LEVELS
+
+# sankey_data['format'] of the normalized schema: samples are int rows into
+# sankey_data['sample_names']
+INDEXED_FORMAT = "indexed"
+
+
+def is_indexed(sankey_data):
+    """True for the normalized schema (see index_sankey_data)"""
+    return sankey_data.get("format") == INDEXED_FORMAT
+
+
+def flow_members(flow):
+    """
+    A flow's samples in either schema
+
+    Returns:
+        tuple: (samples, source_probs, target_probs); samples are names in the
+               name-based schema and rows into 'sample_names' in the indexed one
+    """
+    samples = flow.get("samples") or []
+    if "source_probs" in flow:
+        return samples, flow["source_probs"], flow["target_probs"]
+    return (
+        [s["sample"] for s in samples],
+        [s.get("source_prob") or 0 for s in samples],
+        [s.get("target_prob") or 0 for s in samples],
+    )
+
+
+def node_members(node_data, level):
+    """
+    A node's samples at a level ('high' or 'medium') in either schema
+
+    Returns:
+        tuple: (samples, probabilities); a probability is NaN when unknown
+               (plain sample names in the name-based schema)
+    """
+    entries = node_data.get(f"{level}_samples") or []
+    probs_key = f"{level}_probs"
+    if probs_key in node_data:
+        return entries, [math.nan if p is None else p for p in node_data[probs_key]]
+
+    samples, probs = [], []
+    for entry in entries:
+        # Plain sample names, or (name, probability) pairs from the data processor
+        if isinstance(entry, str):
+            samples.append(entry)
+            probs.append(math.nan)
+        else:
+            samples.append(entry[0])
+            probs.append(entry[1])
+    return samples, probs
+
+
+def index_sankey_data(sankey_data):
+    """
+    Convert name-based sankey data to the normalized (indexed) schema
+
+    Sample names are stored once in 'sample_names' (flow order first, then
+    node-only samples); flows keep 'samples' as int rows with parallel
+    'source_probs'/'target_probs' lists, and nodes keep '{level}_samples' as
+    int rows with parallel '{level}_probs' (None where unknown, so the data
+    stays valid JSON). Everything else is unchanged. Already indexed data is
+    returned as is.
+    """
+    if is_indexed(sankey_data):
+        return sankey_data
+
+    sample_index = {}
+
+    def rows(samples):
+        return [sample_index.setdefault(s, len(sample_index)) for s in samples]
+
+    flows = []
+    for flow in sankey_data.get("flows") or []:
+        samples, source_probs, target_probs = flow_members(flow)
+        flows.append({
+            **{k: v for k, v in flow.items() if k != "samples"},
+            "samples": rows(samples),
+            "source_probs": source_probs,
+            "target_probs": target_probs,
+        })
+
+    nodes = {}
+    for node_id, node_data in (sankey_data.get("nodes") or {}).items():
+        node = dict(node_data)
+        for level in LEVELS:
+            if f"{level}_samples" in node_data:
+                samples, probs = node_members(node_data, level)
+                node[f"{level}_samples"] = rows(samples)
+                node[f"{level}_probs"] = [None if math.isnan(p) else p for p in probs]
+        nodes[node_id] = node
+
+    return {
+        **sankey_data,
+        "format": INDEXED_FORMAT,
+        "sample_names": list(sample_index),
+        "nodes": nodes,
+        "flows": flows,
+    }
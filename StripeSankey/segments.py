@@ -0,0 +1,40 @@
+"""Helpers for segment names of the form K{k}_MC{mc}_{level}"""
+
+# Representation levels in code order; the frontend decodes level codes with the
+# same list
+LEVELS = ("high", "medium")
+LEVEL_CODES = {level: code for code, level in enumerate(LEVELS)}
+
+# Code used for "no assignment" in integer-coded tables
+UNASSIGNED = -1
+
+
+def parse_segment(segment):
+    """
+    Split a segment name into its topic id and representation level
+
+    Args:
+        segment (str): Segment name, e.g. 'K3_MC2_high'
+
+    Returns:
+        tuple: (topic_id, level), e.g. ('K3_MC2', 'high')
+    """
+    topic_id, _, level = segment.rpartition("_")
+    if topic_id and level in LEVEL_CODES:
+        return topic_id, level
+    # Same fallback as the renderer: an unknown suffix is treated as medium
+    return segment, "medium"
+
+
+def segment_name(topic_id, level):
+    """
+    Segment name of a topic at a representation level, the inverse of parse_segment
+
+    Args:
+        topic_id (str): Global topic id, e.g. 'K3_MC2'
+        level (str): 'high' or 'medium'
+
+    Returns:
+        str: Segment name, e.g. 'K3_MC2_high'
+    """
+    return f"{topic_id}_{level}"
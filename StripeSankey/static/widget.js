@@ -0,0 +1,117 @@
+// d3 v7.9.0 subset: select, scaleLinear, extent, group, max, color (d3-selection, d3-scale, d3-array, d3-color)
+// https://d3js.org Copyright 2010-2023 Mike Bostock, ISC License (see LICENSE-d3)
+var d3=function(){"use strict";function n(t,n){return null==t||null==n?NaN:t<n?-1:t>n?1:t>=n?0:NaN}function e(t,n){return null==t||null==n?NaN:n<t?-1:n>t?1:n>=t?0:NaN}function r(t){let r,o,a;function u(t,n,e=0,i=t.length){if(e<i){if(0!==r(n,n))return i;do{const r=e+i>>>1;o(t[r],n)<0?e=r+1:i=r}while(e<i)}return e}return 2!==t.length?(r=n,o=(e,r)=>n(t(e),r),a=(n,e)=>t(n)-e):(r=t===n||t===e?t:i,o=t,a=t),{left:u,center:function(t,n,e=0,r=t.length){const i=u(t,n,e,r-1);return i>e&&a(t[i-1],n)>-a(t[i],n)?i-1:i},right:function(t,n,e=0,i=t.length){if(e<i){if(0!==r(n,n))return i;do{const r=e+i>>>1;o(t[r],n)<=0?e=r+1:i=r}while(e<i)}return e}}}function i(){return 0}const a=r(n);const u=a.right;var s=u;function M(t,n){let e,r;if(void 0===n)for(const n of t)null!=n&&(void 0===e?n>=n&&(e=r=n):(e>n&&(e=n),r<n&&(r=n)));else{let i=-1;for(let o of t)null!=(o=n(o,++i,t))&&(void 0===e?o>=o&&(e=r=o):(e>o&&(e=o),r<o&&(r=o)))}return[e,r]}class InternMap extends Map{constructor(t,n=N){if(super(),Object.defineProperties(this,{_intern:{value:new Map},_key:{value:n}}),null!=t)for(const[n,e]of t)this.set(n,e)}get(t){return super.get(A(this,t))}has(t){return super.has(A(this,t))}set(t,n){return super.set(S(this,t),n)}delete(t){return super.delete(E(this,t))}}function A({_intern:t,_key:n},e){const r=n(e);return t.has(r)?t.get(r):e}function S({_intern:t,_key:n},e){const r=n(e);return t.has(r)?t.get(r):(t.set(r,e),e)}function E({_intern:t,_key:n},e){const r=n(e);return t.has(r)&&(e=t.get(r),t.delete(r)),e}function N(t){return null!==t&&"object"==typeof t?t.valueOf():t}function k(t){return t}function C(t,...n){return F(t,k,k,n)}function F(t,n,e,r){return function t(i,o){if(o>=r.length)return e(i);const a=new InternMap,u=r[o++];let c=-1;for(const t of i){const n=u(t,++c,i),e=a.get(n);e?e.push(t):a.set(n,[t])}for(const[n,e]of a)a.set(n,t(e,o));return n(a)}(t,0)}const L=Math.sqrt(50);const j=Math.sqrt(10);const H=Math.sqrt(2);function X(t,n,e){const r=(n-t)/Math.max(0,e),i=Math.floor(Math.log10(r)),o=r/Math.pow(10,i),a=o>=L?10:o>=j?5:o>=H?2:1;let u,c,f;return i<0?(f=Math.pow(10,-i)/a,u=Math.round(t*f),c=Math.round(n*f),u/f<t&&++u,c/f>n&&--c,f=-f):(f=Math.pow(10,i)*a,u=Math.round(t/f),c=Math.round(n/f),u*f<t&&++u,c*f>n&&--c),c<u&&.5<=e&&e<2?X(t,n,2*e):[u,c,f]}function G(t,n,e){if(!((e=+e)>0))return[];if((t=+t)===(n=+n))return[t];const r=n<t,[i,o,a]=r?X(n,t,e):X(t,n,e);if(!(o>=i))return[];const u=o-i+1,c=new Array(u);if(r)if(a<0)for(let t=0;t<u;++t)c[t]=(o-t)/-a;else for(let t=0;t<u;++t)c[t]=(o-t)*a;else if(a<0)for(let t=0;t<u;++t)c[t]=(i+t)/-a;else for(let t=0;t<u;++t)c[t]=(i+t)*a;return c}function V(t,n,e){return X(t=+t,n=+n,e=+e)[2]}function W(t,n,e){e=+e;const r=(n=+n)<(t=+t),i=r?V(n,t,e):V(t,n,e);return(r?-1:1)*(i<0?1/-i:i)}function J(t,n){let e;if(void 0===n)for(const n of t)null!=n&&(e<n||void 0===e&&n>=n)&&(e=n);else{let r=-1;for(let i of t)null!=(i=n(i,++r,t))&&(e<i||void 0===e&&i>=i)&&(e=i)}return e}var qt="http://www.w3.org/1999/xhtml";var Ut={svg:"http://www.w3.org/2000/svg",xhtml:qt,xlink:"http://www.w3.org/1999/xlink",xml:"http://www.w3.org/XML/1998/namespace",xmlns:"http://www.w3.org/2000/xmlns/"};function It(t){var n=t+="",e=n.indexOf(":");return e>=0&&"xmlns"!==(n=t.slice(0,e))&&(t=t.slice(e+1)),Ut.hasOwnProperty(n)?{space:Ut[n],local:t}:t}function Ot(t){return function(){var n=this.ownerDocument,e=this.namespaceURI;return e===qt&&n.documentElement.namespaceURI===qt?n.createElement(t):n.createElementNS(e,t)}}function Bt(t){return function(){return this.ownerDocument.createElementNS(t.space,t.local)}}function Yt(t){var n=It(t);return(n.local?Bt:Ot)(n)}function Lt(){}function jt(t){return null==t?Lt:function(){return this.querySelector(t)}}function Ht(t){return null==t?[]:Array.isArray(t)?t:Array.from(t)}function Xt(){return[]}function Gt(t){return null==t?Xt:function(){return this.querySelectorAll(t)}}function Vt(t){return function(){return this.matches(t)}}function Wt(t){return function(n){return n.matches(t)}}var Zt=Array.prototype.find;function Kt(){return this.firstElementChild}var Qt=Array.prototype.filter;function Jt(){return Array.from(this.children)}function tn(t){return new Array(t.length)}function nn(t,n){this.ownerDocument=t.ownerDocument,this.namespaceURI=t.namespaceURI,this._next=null,this._parent=t,this.__data__=n}function en(t,n,e,r,i,o){for(var a,u=0,c=n.length,f=o.length;u<f;++u)(a=n[u])?(a.__data__=o[u],r[u]=a):e[u]=new nn(t,o[u]);for(;u<c;++u)(a=n[u])&&(i[u]=a)}function rn(t,n,e,r,i,o,a){var u,c,f,s=new Map,l=n.length,h=o.length,d=new Array(l);for(u=0;u<l;++u)(c=n[u])&&(d[u]=f=a.call(c,c.__data__,u,n)+"",s.has(f)?i[u]=c:s.set(f,c));for(u=0;u<h;++u)f=a.call(t,o[u],u,o)+"",(c=s.get(f))?(r[u]=c,c.__data__=o[u],s.delete(f)):e[u]=new nn(t,o[u]);for(u=0;u<l;++u)(c=n[u])&&s.get(d[u])===c&&(i[u]=c)}function on(t){return t.__data__}function an(t){return"object"==typeof t&&"length"in t?t:Array.from(t)}function un(t,n){return t<n?-1:t>n?1:t>=n?0:NaN}function cn(t){return function(){this.removeAttribute(t)}}function fn(t){return function(){this.removeAttributeNS(t.space,t.local)}}function sn(t,n){return function(){this.setAttribute(t,n)}}function ln(t,n){return function(){this.setAttributeNS(t.space,t.local,n)}}function hn(t,n){return function(){var e=n.apply(this,arguments);null==e?this.removeAttribute(t):this.setAttribute(t,e)}}function dn(t,n){return function(){var e=n.apply(this,arguments);null==e?this.removeAttributeNS(t.space,t.local):this.setAttributeNS(t.space,t.local,e)}}function pn(t){return t.ownerDocument&&t.ownerDocument.defaultView||t.document&&t||t.defaultView}function gn(t){return function(){this.style.removeProperty(t)}}function yn(t,n,e){return function(){this.style.setProperty(t,n,e)}}function vn(t,n,e){return function(){var r=n.apply(this,arguments);null==r?this.style.removeProperty(t):this.style.setProperty(t,r,e)}}function _n(t,n){return t.style.getPropertyValue(n)||pn(t).getComputedStyle(t,null).getPropertyValue(n)}function bn(t){return function(){delete this[t]}}function mn(t,n){return function(){this[t]=n}}function xn(t,n){return function(){var e=n.apply(this,arguments);null==e?delete this[t]:this[t]=e}}function wn(t){return t.trim().split(/^|\s+/)}function Mn(t){return t.classList||new Tn(t)}function Tn(t){this._node=t,this._names=wn(t.getAttribute("class")||"")}function An(t,n){for(var e=Mn(t),r=-1,i=n.length;++r<i;)e.add(n[r])}function Sn(t,n){for(var e=Mn(t),r=-1,i=n.length;++r<i;)e.remove(n[r])}function En(t){return function(){An(this,t)}}function Nn(t){return function(){Sn(this,t)}}function kn(t,n){return function(){(n.apply(this,arguments)?An:Sn)(this,t)}}function Cn(){this.textContent=""}function Pn(t){return function(){this.textContent=t}}function zn(t){return function(){var n=t.apply(this,arguments);this.textContent=null==n?"":n}}function $n(){this.innerHTML=""}function Dn(t){return function(){this.innerHTML=t}}function Rn(t){return function(){var n=t.apply(this,arguments);this.innerHTML=null==n?"":n}}function Fn(){this.nextSibling&&this.parentNode.appendChild(this)}function qn(){this.previousSibling&&this.parentNode.insertBefore(this,this.parentNode.firstChild)}function Un(){return null}function In(){var t=this.parentNode;t&&t.removeChild(this)}function On(){var t=this.cloneNode(!1),n=this.parentNode;return n?n.insertBefore(t,this.nextSibling):t}function Bn(){var t=this.cloneNode(!0),n=this.parentNode;return n?n.insertBefore(t,this.nextSibling):t}function Yn(t){return function(){var n=this.__on;if(n){for(var e,r=0,i=-1,o=n.length;r<o;++r)e=n[r],t.type&&e.type!==t.type||e.name!==t.name?n[++i]=e:this.removeEventListener(e.type,e.listener,e.options);++i?n.length=i:delete this.__on}}}function Ln(t,n,e){return function(){var r,i=this.__on,o=function(t){return function(n){t.call(this,n,this.__data__)}}(n);if(i)for(var a=0,u=i.length;a<u;++a)if((r=i[a]).type===t.type&&r.name===t.name)return this.removeEventListener(r.type,r.listener,r.options),this.addEventListener(r.type,r.listener=o,r.options=e),void(r.value=n);this.addEventListener(t.type,o,e),r={type:t.type,name:t.name,value:n,listener:o,options:e},i?i.push(r):this.__on=[r]}}function jn(t,n,e){var r=pn(t),i=r.CustomEvent;"function"==typeof i?i=new i(n,e):(i=r.document.createEvent("Event"),e?(i.initEvent(n,e.bubbles,e.cancelable),i.detail=e.detail):i.initEvent(n,!1,!1)),t.dispatchEvent(i)}function Hn(t,n){return function(){return jn(this,t,n)}}function Xn(t,n){return function(){return jn(this,t,n.apply(this,arguments))}}nn.prototype={constructor:nn,appendChild:function(t){return this._parent.insertBefore(t,this._next)},insertBefore:function(t,n){return this._parent.insertBefore(t,n)},querySelector:function(t){return this._parent.querySelector(t)},querySelectorAll:function(t){return this._parent.querySelectorAll(t)}};Tn.prototype={add:function(t){this._names.indexOf(t)<0&&(this._names.push(t),this._node.setAttribute("class",this._names.join(" ")))},remove:function(t){var n=this._names.indexOf(t);n>=0&&(this._names.splice(n,1),this._node.setAttribute("class",this._names.join(" ")))},contains:function(t){return this._names.indexOf(t)>=0}};var Gn=[null];function Vn(t,n){this._groups=t,this._parents=n}function Wn(){return new Vn([[document.documentElement]],Gn)}function Zn(t){return"string"==typeof t?new Vn([[document.querySelector(t)]],[document.documentElement]):new Vn([[t]],Gn)}Vn.prototype=Wn.prototype={constructor:Vn,select:function(t){"function"!=typeof t&&(t=jt(t));for(var n=this._groups,e=n.length,r=new Array(e),i=0;i<e;++i)for(var o,a,u=n[i],c=u.length,f=r[i]=new Array(c),s=0;s<c;++s)(o=u[s])&&(a=t.call(o,o.__data__,s,u))&&("__data__"in o&&(a.__data__=o.__data__),f[s]=a);return new Vn(r,this._parents)},selectAll:function(t){t="function"==typeof t?function(t){return function(){return Ht(t.apply(this,arguments))}}(t):Gt(t);for(var n=this._groups,e=n.length,r=[],i=[],o=0;o<e;++o)for(var a,u=n[o],c=u.length,f=0;f<c;++f)(a=u[f])&&(r.push(t.call(a,a.__data__,f,u)),i.push(a));return new Vn(r,i)},selectChild:function(t){return this.select(null==t?Kt:function(t){return function(){return Zt.call(this.children,t)}}("function"==typeof t?t:Wt(t)))},selectChildren:function(t){return this.selectAll(null==t?Jt:function(t){return function(){return Qt.call(this.children,t)}}("function"==typeof t?t:Wt(t)))},filter:function(t){"function"!=typeof t&&(t=Vt(t));for(var n=this._groups,e=n.length,r=new Array(e),i=0;i<e;++i)for(var o,a=n[i],u=a.length,c=r[i]=[],f=0;f<u;++f)(o=a[f])&&t.call(o,o.__data__,f,a)&&c.push(o);return new Vn(r,this._parents)},data:function(t,n){if(!arguments.length)return Array.from(this,on);var e=n?rn:en,r=this._parents,i=this._groups;"function"!=typeof t&&(t=function(t){return function(){return t}}(t));for(var o=i.length,a=new Array(o),u=new Array(o),c=new Array(o),f=0;f<o;++f){var s=r[f],l=i[f],h=l.length,d=an(t.call(s,s&&s.__data__,f,r)),p=d.length,g=u[f]=new Array(p),y=a[f]=new Array(p);e(s,l,g,y,c[f]=new Array(h),d,n);for(var v,_,b=0,m=0;b<p;++b)if(v=g[b]){for(b>=m&&(m=b+1);!(_=y[m])&&++m<p;);v._next=_||null}}return(a=new Vn(a,r))._enter=u,a._exit=c,a},enter:function(){return new Vn(this._enter||this._groups.map(tn),this._parents)},exit:function(){return new Vn(this._exit||this._groups.map(tn),this._parents)},join:function(t,n,e){var r=this.enter(),i=this,o=this.exit();return"function"==typeof t?(r=t(r))&&(r=r.selection()):r=r.append(t+""),null!=n&&(i=n(i))&&(i=i.selection()),null==e?o.remove():e(o),r&&i?r.merge(i).order():i},merge:function(t){for(var n=t.selection?t.selection():t,e=this._groups,r=n._groups,i=e.length,o=r.length,a=Math.min(i,o),u=new Array(i),c=0;c<a;++c)for(var f,s=e[c],l=r[c],h=s.length,d=u[c]=new Array(h),p=0;p<h;++p)(f=s[p]||l[p])&&(d[p]=f);for(;c<i;++c)u[c]=e[c];return new Vn(u,this._parents)},selection:function(){return this},order:function(){for(var t=this._groups,n=-1,e=t.length;++n<e;)for(var r,i=t[n],o=i.length-1,a=i[o];--o>=0;)(r=i[o])&&(a&&4^r.compareDocumentPosition(a)&&a.parentNode.insertBefore(r,a),a=r);return this},sort:function(t){function n(n,e){return n&&e?t(n.__data__,e.__data__):!n-!e}t||(t=un);for(var e=this._groups,r=e.length,i=new Array(r),o=0;o<r;++o){for(var a,u=e[o],c=u.length,f=i[o]=new Array(c),s=0;s<c;++s)(a=u[s])&&(f[s]=a);f.sort(n)}return new Vn(i,this._parents).order()},call:function(){var t=arguments[0];return arguments[0]=this,t.apply(null,arguments),this},nodes:function(){return Array.from(this)},node:function(){for(var t=this._groups,n=0,e=t.length;n<e;++n)for(var r=t[n],i=0,o=r.length;i<o;++i){var a=r[i];if(a)return a}return null},size:function(){let t=0;for(const n of this)++t;return t},empty:function(){return!this.node()},each:function(t){for(var n=this._groups,e=0,r=n.length;e<r;++e)for(var i,o=n[e],a=0,u=o.length;a<u;++a)(i=o[a])&&t.call(i,i.__data__,a,o);return this},attr:function(t,n){var e=It(t);if(arguments.length<2){var r=this.node();return e.local?r.getAttributeNS(e.space,e.local):r.getAttribute(e)}return this.each((null==n?e.local?fn:cn:"function"==typeof n?e.local?dn:hn:e.local?ln:sn)(e,n))},style:function(t,n,e){return arguments.length>1?this.each((null==n?gn:"function"==typeof n?vn:yn)(t,n,null==e?"":e)):_n(this.node(),t)},property:function(t,n){return arguments.length>1?this.each((null==n?bn:"function"==typeof n?xn:mn)(t,n)):this.node()[t]},classed:function(t,n){var e=wn(t+"");if(arguments.length<2){for(var r=Mn(this.node()),i=-1,o=e.length;++i<o;)if(!r.contains(e[i]))return!1;return!0}return this.each(("function"==typeof n?kn:n?En:Nn)(e,n))},text:function(t){return arguments.length?this.each(null==t?Cn:("function"==typeof t?zn:Pn)(t)):this.node().textContent},html:function(t){return arguments.length?this.each(null==t?$n:("function"==typeof t?Rn:Dn)(t)):this.node().innerHTML},raise:function(){return this.each(Fn)},lower:function(){return this.each(qn)},append:function(t){var n="function"==typeof t?t:Yt(t);return this.select((function(){return this.appendChild(n.apply(this,arguments))}))},insert:function(t,n){var e="function"==typeof t?t:Yt(t),r=null==n?Un:"function"==typeof n?n:jt(n);return this.select((function(){return this.insertBefore(e.apply(this,arguments),r.apply(this,arguments)||null)}))},remove:function(){return this.each(In)},clone:function(t){return this.select(t?Bn:On)},datum:function(t){return arguments.length?this.property("__data__",t):this.node().__data__},on:function(t,n,e){var r,i,o=function(t){return t.trim().split(/^|\s+/).map((function(t){var n="",e=t.indexOf(".");return e>=0&&(n=t.slice(e+1),t=t.slice(0,e)),{type:t,name:n}}))}(t+""),a=o.length;if(!(arguments.length<2)){for(u=n?Ln:Yn,r=0;r<a;++r)this.each(u(o[r],n,e));return this}var u=this.node().__on;if(u)for(var c,f=0,s=u.length;f<s;++f)for(r=0,c=u[f];r<a;++r)if((i=o[r]).type===c.type&&i.name===c.name)return c.value},dispatch:function(t,n){return this.each(("function"==typeof n?Xn:Hn)(t,n))},[Symbol.iterator]:function*(){for(var t=this._groups,n=0,e=t.length;n<e;++n)for(var r,i=t[n],o=0,a=i.length;o<a;++o)(r=i[o])&&(yield r)}};function pe(t,n,e){t.prototype=n.prototype=e,e.constructor=t}function ge(t,n){var e=Object.create(t.prototype);for(var r in n)e[r]=n[r];return e}function ye(){}var ve=.7;var _e=1/ve;var be="\\s*([+-]?\\d+)\\s*";var me="\\s*([+-]?(?:\\d*\\.)?\\d+(?:[eE][+-]?\\d+)?)\\s*";var xe="\\s*([+-]?(?:\\d*\\.)?\\d+(?:[eE][+-]?\\d+)?)%\\s*";var we=/^#([0-9a-f]{3,8})$/;var Me=new RegExp(`^rgb\\(${be},${be},${be}\\)$`);var Te=new RegExp(`^rgb\\(${xe},${xe},${xe}\\)$`);var Ae=new RegExp(`^rgba\\(${be},${be},${be},${me}\\)$`);var Se=new RegExp(`^rgba\\(${xe},${xe},${xe},${me}\\)$`);var Ee=new RegExp(`^hsl\\(${me},${xe},${xe}\\)$`);var Ne=new RegExp(`^hsla\\(${me},${xe},${xe},${me}\\)$`);var ke={aliceblue:15792383,antiquewhite:16444375,aqua:65535,aquamarine:8388564,azure:15794175,beige:16119260,bisque:16770244,black:0,blanchedalmond:16772045,blue:255,blueviolet:9055202,brown:10824234,burlywood:14596231,cadetblue:6266528,chartreuse:8388352,chocolate:13789470,coral:16744272,cornflowerblue:6591981,cornsilk:16775388,crimson:14423100,cyan:65535,darkblue:139,darkcyan:35723,darkgoldenrod:12092939,darkgray:11119017,darkgreen:25600,darkgrey:11119017,darkkhaki:12433259,darkmagenta:9109643,darkolivegreen:5597999,darkorange:16747520,darkorchid:10040012,darkred:9109504,darksalmon:15308410,darkseagreen:9419919,darkslateblue:4734347,darkslategray:3100495,darkslategrey:3100495,darkturquoise:52945,darkviolet:9699539,deeppink:16716947,deepskyblue:49151,dimgray:6908265,dimgrey:6908265,dodgerblue:2003199,firebrick:11674146,floralwhite:16775920,forestgreen:2263842,fuchsia:16711935,gainsboro:14474460,ghostwhite:16316671,gold:16766720,goldenrod:14329120,gray:8421504,green:32768,greenyellow:11403055,grey:8421504,honeydew:15794160,hotpink:16738740,indianred:13458524,indigo:4915330,ivory:16777200,khaki:15787660,lavender:15132410,lavenderblush:16773365,lawngreen:8190976,lemonchiffon:16775885,lightblue:11393254,lightcoral:15761536,lightcyan:14745599,lightgoldenrodyellow:16448210,lightgray:13882323,lightgreen:9498256,lightgrey:13882323,lightpink:16758465,lightsalmon:16752762,lightseagreen:2142890,lightskyblue:8900346,lightslategray:7833753,lightslategrey:7833753,lightsteelblue:11584734,lightyellow:16777184,lime:65280,limegreen:3329330,linen:16445670,magenta:16711935,maroon:8388608,mediumaquamarine:6737322,mediumblue:205,mediumorchid:12211667,mediumpurple:9662683,mediumseagreen:3978097,mediumslateblue:8087790,mediumspringgreen:64154,mediumturquoise:4772300,mediumvioletred:13047173,midnightblue:1644912,mintcream:16121850,mistyrose:16770273,moccasin:16770229,navajowhite:16768685,navy:128,oldlace:16643558,olive:8421376,olivedrab:7048739,orange:16753920,orangered:16729344,orchid:14315734,palegoldenrod:15657130,palegreen:10025880,paleturquoise:11529966,palevioletred:14381203,papayawhip:16773077,peachpuff:16767673,peru:13468991,pink:16761035,plum:14524637,powderblue:11591910,purple:8388736,rebeccapurple:6697881,red:16711680,rosybrown:12357519,royalblue:4286945,saddlebrown:9127187,salmon:16416882,sandybrown:16032864,seagreen:3050327,seashell:16774638,sienna:10506797,silver:12632256,skyblue:8900331,slateblue:6970061,slategray:7372944,slategrey:7372944,snow:16775930,springgreen:65407,steelblue:4620980,tan:13808780,teal:32896,thistle:14204888,tomato:16737095,turquoise:4251856,violet:15631086,wheat:16113331,white:16777215,whitesmoke:16119285,yellow:16776960,yellowgreen:10145074};function Ce(){return this.rgb().formatHex()}function Pe(){return this.rgb().formatRgb()}function ze(t){var n,e;return t=(t+"").trim().toLowerCase(),(n=we.exec(t))?(e=n[1].length,n=parseInt(n[1],16),6===e?$e(n):3===e?new qe(n>>8&15|n>>4&240,n>>4&15|240&n,(15&n)<<4|15&n,1):8===e?De(n>>24&255,n>>16&255,n>>8&255,(255&n)/255):4===e?De(n>>12&15|n>>8&240,n>>8&15|n>>4&240,n>>4&15|240&n,((15&n)<<4|15&n)/255):null):(n=Me.exec(t))?new qe(n[1],n[2],n[3],1):(n=Te.exec(t))?new qe(255*n[1]/100,255*n[2]/100,255*n[3]/100,1):(n=Ae.exec(t))?De(n[1],n[2],n[3],n[4]):(n=Se.exec(t))?De(255*n[1]/100,255*n[2]/100,255*n[3]/100,n[4]):(n=Ee.exec(t))?Le(n[1],n[2]/100,n[3]/100,1):(n=Ne.exec(t))?Le(n[1],n[2]/100,n[3]/100,n[4]):ke.hasOwnProperty(t)?$e(ke[t]):"transparent"===t?new qe(NaN,NaN,NaN,0):null}function $e(t){return new qe(t>>16&255,t>>8&255,255&t,1)}function De(t,n,e,r){return r<=0&&(t=n=e=NaN),new qe(t,n,e,r)}function Re(t){return t instanceof ye||(t=ze(t)),t?new qe((t=t.rgb()).r,t.g,t.b,t.opacity):new qe}function Fe(t,n,e,r){return 1===arguments.length?Re(t):new qe(t,n,e,null==r?1:r)}function qe(t,n,e,r){this.r=+t,this.g=+n,this.b=+e,this.opacity=+r}function Ue(){return`#${Ye(this.r)}${Ye(this.g)}${Ye(this.b)}`}function Ie(){const t=Oe(this.opacity);return`${1===t?"rgb(":"rgba("}${Be(this.r)}, ${Be(this.g)}, ${Be(this.b)}${1===t?")":`, ${t})`}`}function Oe(t){return isNaN(t)?1:Math.max(0,Math.min(1,t))}function Be(t){return Math.max(0,Math.min(255,Math.round(t)||0))}function Ye(t){return((t=Be(t))<16?"0":"")+t.toString(16)}function Le(t,n,e,r){return r<=0?t=n=e=NaN:e<=0||e>=1?t=n=NaN:n<=0&&(t=NaN),new Xe(t,n,e,r)}function je(t){if(t instanceof Xe)return new Xe(t.h,t.s,t.l,t.opacity);if(t instanceof ye||(t=ze(t)),!t)return new Xe;if(t instanceof Xe)return t;var n=(t=t.rgb()).r/255,e=t.g/255,r=t.b/255,i=Math.min(n,e,r),o=Math.max(n,e,r),a=NaN,u=o-i,c=(o+i)/2;return u?(a=n===o?(e-r)/u+6*(e<r):e===o?(r-n)/u+2:(n-e)/u+4,u/=c<.5?o+i:2-o-i,a*=60):u=c>0&&c<1?0:a,new Xe(a,u,c,t.opacity)}function He(t,n,e,r){return 1===arguments.length?je(t):new Xe(t,n,e,null==r?1:r)}function Xe(t,n,e,r){this.h=+t,this.s=+n,this.l=+e,this.opacity=+r}function Ge(t){return(t=(t||0)%360)<0?t+360:t}function Ve(t){return Math.max(0,Math.min(1,t||0))}function We(t,n,e){return 255*(t<60?n+(e-n)*t/60:t<180?e:t<240?n+(e-n)*(240-t)/60:n)}pe(ye,ze,{copy(t){return Object.assign(new this.constructor,this,t)},displayable(){return this.rgb().displayable()},hex:Ce,formatHex:Ce,formatHex8:function(){return this.rgb().formatHex8()},formatHsl:function(){return je(this).formatHsl()},formatRgb:Pe,toString:Pe});pe(qe,Fe,ge(ye,{brighter(t){return t=null==t?_e:Math.pow(_e,t),new qe(this.r*t,this.g*t,this.b*t,this.opacity)},darker(t){return t=null==t?ve:Math.pow(ve,t),new qe(this.r*t,this.g*t,this.b*t,this.opacity)},rgb(){return this},clamp(){return new qe(Be(this.r),Be(this.g),Be(this.b),Oe(this.opacity))},displayable(){return-.5<=this.r&&this.r<255.5&&-.5<=this.g&&this.g<255.5&&-.5<=this.b&&this.b<255.5&&0<=this.opacity&&this.opacity<=1},hex:Ue,formatHex:Ue,formatHex8:function(){return`#${Ye(this.r)}${Ye(this.g)}${Ye(this.b)}${Ye(255*(isNaN(this.opacity)?1:this.opacity))}`},formatRgb:Ie,toString:Ie}));pe(Xe,He,ge(ye,{brighter(t){return t=null==t?_e:Math.pow(_e,t),new Xe(this.h,this.s,this.l*t,this.opacity)},darker(t){return t=null==t?ve:Math.pow(ve,t),new Xe(this.h,this.s,this.l*t,this.opacity)},rgb(){var t=this.h%360+360*(this.h<0),n=isNaN(t)||isNaN(this.s)?0:this.s,e=this.l,r=e+(e<.5?e:1-e)*n,i=2*e-r;return new qe(We(t>=240?t-240:t+120,i,r),We(t,i,r),We(t<120?t+240:t-120,i,r),this.opacity)},clamp(){return new Xe(Ge(this.h),Ve(this.s),Ve(this.l),Oe(this.opacity))},displayable(){return(0<=this.s&&this.s<=1||isNaN(this.s))&&0<=this.l&&this.l<=1&&0<=this.opacity&&this.opacity<=1},formatHsl(){const t=Oe(this.opacity);return`${1===t?"hsl(":"hsla("}${Ge(this.h)}, ${100*Ve(this.s)}%, ${100*Ve(this.l)}%${1===t?")":`, ${t})`}`}}));var kr=t=>()=>t;function Cr(t,n){return function(e){return t+e*n}}function zr(t){return 1==(t=+t)?$r:function(n,e){return e-n?function(t,n,e){return t=Math.pow(t,e),n=Math.pow(n,e)-t,e=1/e,function(r){return Math.pow(t+r*n,e)}}(n,e,t):kr(isNaN(n)?e:n)}}function $r(t,n){var e=n-t;return e?Cr(t,e):kr(isNaN(t)?n:t)}var Dr=function t(n){var e=zr(n);function r(t,n){var r=e((t=Fe(t)).r,(n=Fe(n)).r),i=e(t.g,n.g),o=e(t.b,n.b),a=$r(t.opacity,n.opacity);return function(n){return t.r=r(n),t.g=i(n),t.b=o(n),t.opacity=a(n),t+""}}return r.gamma=t,r}(1);function Ur(t,n){n||(n=[]);var e,r=t?Math.min(n.length,t.length):0,i=n.slice();return function(o){for(e=0;e<r;++e)i[e]=t[e]*(1-o)+n[e]*o;return i}}function Ir(t){return ArrayBuffer.isView(t)&&!(t instanceof DataView)}function Or(t,n){var e,r=n?n.length:0,i=t?Math.min(r,t.length):0,o=new Array(i),a=new Array(r);for(e=0;e<i;++e)o[e]=Gr(t[e],n[e]);for(;e<r;++e)a[e]=n[e];return function(t){for(e=0;e<i;++e)a[e]=o[e](t);return a}}function Br(t,n){var e=new Date;return t=+t,n=+n,function(r){return e.setTime(t*(1-r)+n*r),e}}function Yr(t,n){return t=+t,n=+n,function(e){return t*(1-e)+n*e}}function Lr(t,n){var e,r={},i={};for(e in null!==t&&"object"==typeof t||(t={}),null!==n&&"object"==typeof n||(n={}),n)e in t?r[e]=Gr(t[e],n[e]):i[e]=n[e];return function(t){for(e in r)i[e]=r[e](t);return i}}var jr=/[-+]?(?:\d+\.?\d*|\.?\d+)(?:[eE][-+]?\d+)?/g;var Hr=new RegExp(jr.source,"g");function Xr(t,n){var e,r,i,o=jr.lastIndex=Hr.lastIndex=0,a=-1,u=[],c=[];for(t+="",n+="";(e=jr.exec(t))&&(r=Hr.exec(n));)(i=r.index)>o&&(i=n.slice(o,i),u[a]?u[a]+=i:u[++a]=i),(e=e[0])===(r=r[0])?u[a]?u[a]+=r:u[++a]=r:(u[++a]=null,c.push({i:a,x:Yr(e,r)})),o=Hr.lastIndex;return o<n.length&&(i=n.slice(o),u[a]?u[a]+=i:u[++a]=i),u.length<2?c[0]?function(t){return function(n){return t(n)+""}}(c[0].x):function(t){return function(){return t}}(n):(n=c.length,function(t){for(var e,r=0;r<n;++r)u[(e=c[r]).i]=e.x(t);return u.join("")})}function Gr(t,n){var e,r=typeof n;return null==n||"boolean"===r?kr(n):("number"===r?Yr:"string"===r?(e=ze(n))?(n=e,Dr):Xr:n instanceof ze?Dr:n instanceof Date?Br:Ir(n)?Ur:Array.isArray(n)?Or:"function"!=typeof n.valueOf&&"function"!=typeof n.toString||isNaN(n)?Lr:Yr)(t,n)}function Vr(t,n){return t=+t,n=+n,function(e){return Math.round(t*(1-e)+n*e)}}function Wc(t,n){if((e=(t=n?t.toExponential(n-1):t.toExponential()).indexOf("e"))<0)return null;var e,r=t.slice(0,e);return[r.length>1?r[0]+r.slice(2):r,+t.slice(e+1)]}function Zc(t){return(t=Wc(Math.abs(t)))?t[1]:NaN}var Qc=/^(?:(.)?([<>=^]))?([+\-( ])?([$#])?(0)?(\d+)?(,)?(\.\d+)?(~)?([a-z%])?$/i;function Jc(t){if(!(n=Qc.exec(t)))throw new Error("invalid format: "+t);var n;return new tf({fill:n[1],align:n[2],sign:n[3],symbol:n[4],zero:n[5],width:n[6],comma:n[7],precision:n[8]&&n[8].slice(1),trim:n[9],type:n[10]})}function tf(t){this.fill=void 0===t.fill?" ":t.fill+"",this.align=void 0===t.align?">":t.align+"",this.sign=void 0===t.sign?"-":t.sign+"",this.symbol=void 0===t.symbol?"":t.symbol+"",this.zero=!!t.zero,this.width=void 0===t.width?void 0:+t.width,this.comma=!!t.comma,this.precision=void 0===t.precision?void 0:+t.precision,this.trim=!!t.trim,this.type=void 0===t.type?"":t.type+""}Jc.prototype=tf.prototype;tf.prototype.toString=function(){return this.fill+this.align+this.sign+this.symbol+(this.zero?"0":"")+(void 0===this.width?"":Math.max(1,0|this.width))+(this.comma?",":"")+(void 0===this.precision?"":"."+Math.max(0,0|this.precision))+(this.trim?"~":"")+this.type};function sf(t){return Math.max(0,-Zc(Math.abs(t)))}function lf(t,n){return Math.max(0,3*Math.max(-8,Math.min(8,Math.floor(Zc(n)/3)))-Zc(Math.abs(t)))}function hf(t,n){return t=Math.abs(t),n=Math.abs(n)-t,Math.max(0,Zc(n)-Zc(t))+1}function hg(t,n){switch(arguments.length){case 0:break;case 1:this.range(t);break;default:this.range(n).domain(t)}return this}function _g(t){return+t}var bg=[0,1];function mg(t){return t}function xg(t,n){return(n-=t=+t)?function(e){return(e-t)/n}:function(t){return function(){return t}}(isNaN(n)?NaN:.5)}function wg(t,n,e){var r=t[0],i=t[1],o=n[0],a=n[1];return i<r?(r=xg(i,r),o=e(a,o)):(r=xg(r,i),o=e(o,a)),function(t){return o(r(t))}}function Mg(t,n,e){var r=Math.min(t.length,n.length)-1,i=new Array(r),o=new Array(r),a=-1;for(t[r]<t[0]&&(t=t.slice().reverse(),n=n.slice().reverse());++a<r;)i[a]=xg(t[a],t[a+1]),o[a]=e(n[a],n[a+1]);return function(n){var e=s(t,n,1,r)-1;return o[e](i[e](n))}}function Tg(t,n){return n.domain(t.domain()).range(t.range()).interpolate(t.interpolate()).clamp(t.clamp()).unknown(t.unknown())}function Ag(){var t,n,e,r,i,o,a=bg,u=bg,c=Gr,f=mg;function s(){var t=Math.min(a.length,u.length);return f!==mg&&(f=function(t,n){var e;return t>n&&(e=t,t=n,n=e),function(e){return Math.max(t,Math.min(n,e))}}(a[0],a[t-1])),r=t>2?Mg:wg,i=o=null,l}function l(n){return null==n||isNaN(n=+n)?e:(i||(i=r(a.map(t),u,c)))(t(f(n)))}return l.invert=function(e){return f(n((o||(o=r(u,a.map(t),Yr)))(e)))},l.domain=function(t){return arguments.length?(a=Array.from(t,_g),s()):a.slice()},l.range=function(t){return arguments.length?(u=Array.from(t),s()):u.slice()},l.rangeRound=function(t){return u=Array.from(t),c=Vr,s()},l.clamp=function(t){return arguments.length?(f=!!t||mg,s()):f!==mg},l.interpolate=function(t){return arguments.length?(c=t,s()):c},l.unknown=function(t){return arguments.length?(e=t,l):e},function(e,r){return t=e,n=r,s()}}function Sg(){return Ag()(mg,mg)}function Eg(n,e,r,i){var o,a=W(n,e,r);switch((i=Jc(null==i?",f":i)).type){case"s":var u=Math.max(Math.abs(n),Math.abs(e));return null!=i.precision||isNaN(o=lf(a,u))||(i.precision=o),t.formatPrefix(i,u);case"":case"e":case"g":case"p":case"r":null!=i.precision||isNaN(o=hf(a,Math.max(Math.abs(n),Math.abs(e))))||(i.precision=o-("e"===i.type));break;case"f":case"%":null!=i.precision||isNaN(o=sf(a))||(i.precision=o-2*("%"===i.type))}return t.format(i)}function Ng(t){var n=t.domain;return t.ticks=function(t){var e=n();return G(e[0],e[e.length-1],null==t?10:t)},t.tickFormat=function(t,e){var r=n();return Eg(r[0],r[r.length-1],null==t?10:t,e)},t.nice=function(e){null==e&&(e=10);var r,i,o=n(),a=0,u=o.length-1,c=o[a],f=o[u],s=10;for(f<c&&(i=c,c=f,f=i,i=a,a=u,u=i);s-- >0;){if((i=V(c,f,e))===r)return o[a]=c,o[u]=f,n(o);if(i>0)c=Math.floor(c/i)*i,f=Math.ceil(f/i)*i;else{if(!(i<0))break;c=Math.ceil(c*i)/i,f=Math.floor(f*i)/i}r=i}return t},t}return{select:Zn,scaleLinear:function t(){var n=Sg();return n.copy=function(){return Tg(n,t())},hg.apply(n,arguments),Ng(n)},extent:M,group:C,max:J,color:ze}}();
+const LEVELS=['high','medium'];const SELECTION_SYNC_DELAY=150;const logger={enabled:false,log(){}};function setDebugLogging(enabled){logger.enabled=Boolean(enabled);logger.log=logger.enabled?console.log.bind(console,"[StripeSankey]"):()=>{};}
+function render({model,el}){el.innerHTML='';const emptyMessage=d3.select(el).append("div").style("padding","20px").style("text-align","center").style("font-family","sans-serif").style("display","none").text("No data available. Please load your processed data first.");const container=d3.select(el).append("div").style("position","relative");const canvasLayers={};["flows","hover","tracing"].forEach(layer=>{canvasLayers[layer]=container.append("canvas").attr("class",`canvas-${layer}`).style("position","absolute").style("left","1px").style("top","1px").style("pointer-events","none").style("display","none").node().getContext("2d");});const svg=container.append("svg").style("position","relative").style("background","#fafafa").style("border","1px solid #ddd");const margin={top:60,right:150,bottom:60,left:100};const g=svg.append("g").attr("transform",`translate(${margin.left}, ${margin.top})`);g.append("g").attr("class","flows");g.append("g").attr("class","sample-tracing");g.append("g").attr("class","nodes");g.append("g").attr("class","k-labels");g.append("g").attr("class","legend");const tooltip=createTooltip(g);let syncedSelection=model.get("selected_flow");let settingSelection=false;const saveSelection=debounce(()=>{const selection=model.get("selected_flow");if(isSameSelection(selection,syncedSelection))return;syncedSelection=selection;model.save_changes();},SELECTION_SYNC_DELAY);function setSelectedFlow(selection){if(isSameSelection(model.get("selected_flow"),selection))return;settingSelection=true;model.set("selected_flow",selection);settingSelection=false;saveSelection();}
+function toggleFlowSelection(flow){logger.log("Flow clicked:",flow);setSelectedFlow(isFlowSelected(model.get("selected_flow"),flow)?{}:flowSelection(flow));}
+const updateTooltip=coalesceToFrame(show=>{if(show)show();else tooltip.hide();});function tooltipBounds(){const view=getCache();return{width:view.chartWidth,height:view.chartHeight};}
+const interactions={toggleFlowSelection,showFlowTooltip:(event,flow)=>updateTooltip(()=>showTooltip(tooltip,event,flow,tooltipBounds())),showSegmentTooltip:(event,segment)=>updateTooltip(()=>showSegmentTooltip(tooltip,event,segment.node,segment.level,segment.count,model.get("sankey_data"),model.get("metric_mode"),tooltipBounds())),hideTooltip:()=>updateTooltip(null)};g.on("click",function(){setSelectedFlow({});});let cache=null;let currentSelection=model.get("selected_flow");let hoveredFlow=null;const samplePayloads=createSamplePayloadCache(model,32);function getCache(){if(!cache){const width=model.get("width");const height=model.get("height");const chartWidth=width-margin.left-margin.right;const chartHeight=height-margin.top-margin.bottom;const data=model.get("sankey_data");svg.attr("width",width).attr("height",height);sizeCanvasLayers(canvasLayers,width,height,margin);cache={data,chartWidth,chartHeight,processedData:null,layout:null,metricScales:undefined};if(data&&data.nodes&&Object.keys(data.nodes).length>0){cache.processedData=processDataForVisualization(data);cache.layout=computeLayout(cache.processedData,chartWidth,chartHeight);}}
+return cache;}
+function getMetricScales(){const view=getCache();if(view.metricScales===undefined){view.metricScales=calculateMetricScales(view.processedData,view.data,model.get("metric_config"));}
+return view.metricScales;}
+function useDebugSetting(){setDebugLogging(model.get("debug"));}
+function draw(){useDebugSetting();const view=getCache();if(!view.processedData){emptyMessage.style("display",null);svg.style("display","none");return;}
+emptyMessage.style("display","none");svg.style("display",null);const canvas=getCanvas();Object.values(canvasLayers).forEach(ctx=>{ctx.canvas.style.display=canvas?null:"none";});svg.style("background",canvas?"transparent":"#fafafa");hoveredFlow=null;if(canvas){clearCanvasLayer(canvas.hover);drawFlowsCanvas(canvas.flows,view.layout.drawableFlows);}
+currentSelection=model.get("selected_flow");drawSankeyDiagram(g,view.layout,view.chartWidth,view.chartHeight,currentSelection,model,samplePayloads,canvas,interactions);applyNodeColors();requestSelectionSamples();}
+function getCanvas(){return model.get("renderer")==="canvas"?canvasLayers:null;}
+function setHoveredFlow(flow,event){if(flow===hoveredFlow)return;hoveredFlow=flow;tooltip.hide("flow");clearCanvasLayer(canvasLayers.hover);svg.style("cursor",flow?"pointer":null);if(flow){if(!isFlowSelected(currentSelection,flow)){strokeFlowCanvas(canvasLayers.hover,flow,"#888",flow.width,0.5);}
+showTooltip(tooltip,event,flow,tooltipBounds());}}
+function flowAtPointer(event){const view=getCache();if(!getCanvas()||!view.layout||event.target!==svg.node())return null;if(!view.layout.flowIndex){view.layout.flowIndex=buildFlowIndex(view.layout.drawableFlows,24);}
+const box=svg.node().getBoundingClientRect();return findFlowAt(view.layout.flowIndex,view.layout.drawableFlows,event.clientX-box.left-margin.left,event.clientY-box.top-margin.top);}
+const hoverAtPointer=coalesceToFrame(event=>{if(getCanvas())setHoveredFlow(flowAtPointer(event),event);});svg.on("mousemove.canvas",function(event){hoverAtPointer(event);});svg.on("mouseleave.canvas",function(event){hoverAtPointer.cancel();if(getCanvas())setHoveredFlow(null,event);});svg.on("click.canvas",function(event){const flow=flowAtPointer(event);if(flow){event.stopPropagation();toggleFlowSelection(flow);}});function requestSelectionSamples(){const view=getCache();if(!view.layout||!view.layout.lazy)return;const selection=currentSelection;const flow=view.layout.flows.find(f=>isFlowSelected(selection,f));if(!flow||samplePayloads.get(flow))return;samplePayloads.load(flow).then(()=>{if(currentSelection!==selection||cache!==view)return;useDebugSetting();const{nodes,flows,kValues}=view.layout;updateSampleTracing(g,view.layout,selection,nodes,flows,kValues,samplePayloads,getCanvas());});}
+function applyNodeColors(){useDebugSetting();const view=getCache();if(!view.layout)return;const metricMode=model.get("metric_mode");const metricScales=metricMode?getMetricScales():null;styleNodes(g,view.layout,view.chartHeight,model.get("color_schemes"),view.data,metricMode,metricScales,model.get("metric_config"));}
+function invalidate(){cache=null;draw();}
+draw();model.on("change:sankey_data",()=>{samplePayloads.clear();invalidate();});model.on("change:width",invalidate);model.on("change:height",invalidate);model.on("change:renderer",invalidate);model.on("change:debug",useDebugSetting);model.on("change:metric_mode",applyNodeColors);model.on("change:metric_config",applyNodeColors);model.on("change:color_schemes",applyNodeColors);const updateSelection=coalesceToFrame(()=>{useDebugSetting();const view=getCache();if(!view.layout)return;const previousSelection=currentSelection;currentSelection=model.get("selected_flow");const changedFlows=g.select(".flows").selectAll("path.flow").filter(flow=>isFlowSelected(previousSelection,flow)||isFlowSelected(currentSelection,flow));styleFlows(changedFlows,currentSelection);const{nodes,flows,kValues}=view.layout;updateSampleTracing(g,view.layout,currentSelection,nodes,flows,kValues,samplePayloads,getCanvas());requestSelectionSamples();});model.on("change:selected_flow",()=>{if(!settingSelection)syncedSelection=model.get("selected_flow");updateSelection();});return()=>{saveSelection.flush();updateSelection.cancel();updateTooltip.cancel();hoverAtPointer.cancel();samplePayloads.dispose();};}
+function debounce(fn,wait){let timer=null;const debounced=()=>{clearTimeout(timer);timer=setTimeout(debounced.flush,wait);};debounced.flush=()=>{if(timer===null)return;clearTimeout(timer);timer=null;fn();};return debounced;}
+function coalesceToFrame(fn){let frame=null;let latestArgs=[];const scheduled=(...args)=>{latestArgs=args;if(frame===null){frame=requestAnimationFrame(()=>{frame=null;fn(...latestArgs);});}};scheduled.cancel=()=>{if(frame!==null)cancelAnimationFrame(frame);frame=null;};return scheduled;}
+function calculateMetricScales(processedData,rawData,metricConfig){logger.log("Calculating metric scales...");const perplexityValues=[];const coherenceValues=[];processedData.nodes.forEach(node=>{const nodeData=rawData.nodes[node.id];if(nodeData){if(nodeData.model_metrics&&nodeData.model_metrics.perplexity!==undefined){perplexityValues.push(nodeData.model_metrics.perplexity);}
+if(nodeData.mallet_diagnostics&&nodeData.mallet_diagnostics.coherence!==undefined){coherenceValues.push(nodeData.mallet_diagnostics.coherence);}}});if(logger.enabled)logger.log(`Found ${perplexityValues.length} perplexity values, ${coherenceValues.length} coherence values`);if(perplexityValues.length===0||coherenceValues.length===0){console.warn("Insufficient metric data for metric mode");return null;}
+const perplexityExtent=d3.extent(perplexityValues);const coherenceExtent=d3.extent(coherenceValues);logger.log("Perplexity range:",perplexityExtent);logger.log("Coherence range:",coherenceExtent);const perplexityScale=d3.scaleLinear().domain(perplexityExtent).range([1,0]);const coherenceScale=d3.scaleLinear().domain(coherenceExtent).range([0,1]);return{perplexity:perplexityScale,coherence:coherenceScale,perplexityExtent,coherenceExtent};}
+function getMetricColor(nodeId,rawData,metricScales,metricConfig){if(!metricScales)return"#666";const nodeData=rawData.nodes[nodeId];if(!nodeData)return"#666";let perplexityValue=null;let coherenceValue=null;if(nodeData.model_metrics&&nodeData.model_metrics.perplexity!==undefined){perplexityValue=nodeData.model_metrics.perplexity;}
+if(nodeData.mallet_diagnostics&&nodeData.mallet_diagnostics.coherence!==undefined){coherenceValue=nodeData.mallet_diagnostics.coherence;}
+if(perplexityValue===null||coherenceValue===null){return"#999";}
+const redIntensity=metricScales.perplexity(perplexityValue);const blueIntensity=metricScales.coherence(coherenceValue);if(logger.enabled)logger.log(`${nodeId}: perp=${perplexityValue.toFixed(3)} (red=${redIntensity.toFixed(3)}), coh=${coherenceValue.toFixed(3)} (blue=${blueIntensity.toFixed(3)})`);const minBrightness=0.2;const red=Math.round(255*Math.max(minBrightness,redIntensity*metricConfig.red_weight));const blue=Math.round(255*Math.max(minBrightness,blueIntensity*metricConfig.blue_weight));const green=0;const clampedRed=Math.max(0,Math.min(255,red));const clampedBlue=Math.max(0,Math.min(255,blue));const clampedGreen=0;const finalColor=`rgb(${clampedRed}, ${clampedGreen}, ${clampedBlue})`;if(logger.enabled)logger.log(`${nodeId}: Final color = ${finalColor}`);return finalColor;}
+function drawMetricLegend(svg,metricScales,metricConfig,width,height,margin){const legend=svg.append("g").attr("class","metric-legend").attr("transform",`translate(${margin.left}, ${height - margin.bottom + 10})`);legend.append("text").attr("x",0).attr("y",0).style("font-size","12px").style("font-weight","bold").style("fill","#333").text("Metric Mode: Perplexity (Red) × Coherence (Blue) = Quality (Purple)");const gradientWidth=200;const gradientHeight=15;const defs=svg.append("defs");const gradient=defs.append("linearGradient").attr("id","metric-gradient").attr("x1","0%").attr("x2","100%").attr("y1","0%").attr("y2","0%");const stops=[{offset:"0%",color:"rgb(255, 0, 0)"},{offset:"25%",color:"rgb(200, 0, 55)"},{offset:"50%",color:"rgb(128, 0, 128)"},{offset:"75%",color:"rgb(55, 0, 200)"},{offset:"100%",color:"rgb(0, 0, 255)"}];stops.forEach(stop=>{gradient.append("stop").attr("offset",stop.offset).attr("stop-color",stop.color);});legend.append("rect").attr("x",0).attr("y",15).attr("width",gradientWidth).attr("height",gradientHeight).attr("fill","url(#metric-gradient)").attr("stroke","#333").attr("stroke-width",1);legend.append("text").attr("x",0).attr("y",45).style("font-size","10px").style("fill","#d62728").text("Poor Quality");legend.append("text").attr("x",gradientWidth/2).attr("y",45).attr("text-anchor","middle").style("font-size","10px").style("fill","#7f4f7f").text("Good Quality");legend.append("text").attr("x",gradientWidth).attr("y",45).attr("text-anchor","end").style("font-size","10px").style("fill","#2f2fdf").text("Excellent Quality");legend.append("text").attr("x",gradientWidth+20).attr("y",20).style("font-size","9px").style("fill","#666").text(`Perplexity: ${metricScales.perplexityExtent[1].toFixed(2)} (poor) - ${metricScales.perplexityExtent[0].toFixed(2)} (good)`);legend.append("text").attr("x",gradientWidth+20).attr("y",35).style("font-size","9px").style("fill","#666").text(`Coherence: ${metricScales.coherenceExtent[0].toFixed(2)} (poor) - ${metricScales.coherenceExtent[1].toFixed(2)} (good)`);}
+function processDataForVisualization(data){const nodes=[];const nodeById=new Map();const flows=[];const kValues=data.k_range||[];const sampleNames=data.sample_names||[];const nodeSamples=data.node_samples||{};const highOffsets=typedArray(nodeSamples.high_offsets,Int32Array);const highIndex=typedArray(nodeSamples.high_index,Int32Array);const mediumOffsets=typedArray(nodeSamples.medium_offsets,Int32Array);const mediumIndex=typedArray(nodeSamples.medium_index,Int32Array);(data.node_ids||[]).forEach((nodeName,i)=>{const node=createNode(nodeName,data.nodes[nodeName]||{},highIndex.subarray(highOffsets[i],highOffsets[i+1]),mediumIndex.subarray(mediumOffsets[i],mediumOffsets[i+1]));if(node){nodes.push(node);nodeById.set(nodeName,node);}});const segments=data.segments||[];const parsedSegments=segments.map(parseSegment);const columns=data.flows||{};const sourceSegment=typedArray(columns.source_segment,Int32Array);const targetSegment=typedArray(columns.target_segment,Int32Array);const sourceK=typedArray(columns.source_k,Int32Array);const targetK=typedArray(columns.target_k,Int32Array);const sampleCount=typedArray(columns.sample_count,Int32Array);const averageProbability=typedArray(columns.average_probability,Float32Array);const sampleOffsets=typedArray(columns.sample_offsets,Int32Array);const sampleIndex=typedArray(columns.sample_index,Int32Array);const sourceProb=typedArray(columns.source_prob,Float32Array);const targetProb=typedArray(columns.target_prob,Float32Array);for(let i=0;i<(columns.count||0);i++){const start=sampleOffsets[i];const end=sampleOffsets[i+1];const flow=createFlow(segments[sourceSegment[i]],parsedSegments[sourceSegment[i]],segments[targetSegment[i]],parsedSegments[targetSegment[i]],sourceK[i],targetK[i],sampleCount[i],averageProbability[i],sampleIndex.subarray(start,end),sourceProb.subarray(start,end),targetProb.subarray(start,end));flow.index=i;flows.push(flow);}
+const trajectories=data.trajectories?decodeTrajectories(data.trajectories):null;if(logger.enabled)logger.log(`Processed ${nodes.length} nodes and ${flows.length} flows`);return{nodes,nodeById,flows,kValues,sampleNames,trajectories,lazy:!!data.lazy,flowFilter:data.flow_filter||{}};}
+function createNode(nodeName,nodeData,highSamples,mediumSamples){const match=nodeName.match(/K(\d+)_MC(\d+)/);if(!match)return null;return{id:nodeName,k:parseInt(match[1]),mc:parseInt(match[2]),highCount:nodeData.high_count||0,mediumCount:nodeData.medium_count||0,totalProbability:nodeData.total_probability||0,highSamples:highSamples,mediumSamples:mediumSamples};}
+function createFlow(source,sourceSegment,target,targetSegment,sourceK,targetK,sampleCount,averageProbability,sampleRows,sourceProbs,targetProbs){return{source:source,target:target,sourceTopicId:sourceSegment.topicId,sourceLevel:sourceSegment.level,targetTopicId:targetSegment.topicId,targetLevel:targetSegment.level,sourceK:sourceK,targetK:targetK,sampleCount:sampleCount,averageProbability:averageProbability,sampleRows:sampleRows,sourceProbs:sourceProbs,targetProbs:targetProbs};}
+function createSamplePayloadCache(model,limit){const entries=new Map();const pending=new Map();const viewId=Math.random().toString(36).slice(2);let nextRequest=0;function get(flow){const key=flowKey(flow);const payload=entries.get(key);if(payload){entries.delete(key);entries.set(key,payload);}
+return payload||null;}
+function load(flow){const payload=get(flow);if(payload)return Promise.resolve(payload);const key=flowKey(flow);for(const request of pending.values()){if(request.key===key)return request.promise;}
+const requestId=`${viewId}:${nextRequest++}`;const request={key};request.promise=new Promise(resolve=>{request.resolve=resolve;});pending.set(requestId,request);model.send({type:"flow_samples",request_id:requestId,flow:flow.index,source:flow.source,target:flow.target,source_k:flow.sourceK,target_k:flow.targetK});return request.promise;}
+function onMessage(msg,buffers){if(!msg||msg.type!=="flow_samples")return;const request=pending.get(msg.request_id);if(!request)return;pending.delete(msg.request_id);const payload=decodeFlowSamples(msg,buffers||[]);entries.set(request.key,payload);while(entries.size>limit){entries.delete(entries.keys().next().value);}
+request.resolve(payload);}
+model.on("msg:custom",onMessage);return{get,load,clear:()=>{entries.clear();pending.clear();},dispose:()=>model.off("msg:custom",onMessage)};}
+function decodeFlowSamples(msg,buffers){const sampleNames=msg.sample_names||[];const sourceProbs=typedArray(buffers[0],Float32Array);const targetProbs=typedArray(buffers[1],Float32Array);return{sampleNames,sourceProbs,targetProbs,trajectories:decodeTrajectories({node_ids:msg.node_ids,k_values:msg.k_values,topic:buffers[2],level:buffers[3],probability:buffers[4]})};}
+function typedArray(buffer,Type){if(!buffer)return new Type(0);if(buffer instanceof ArrayBuffer)return new Type(buffer);if(buffer.byteOffset%Type.BYTES_PER_ELEMENT===0){return new Type(buffer.buffer,buffer.byteOffset,buffer.byteLength/Type.BYTES_PER_ELEMENT);}
+return new Type(buffer.buffer.slice(buffer.byteOffset,buffer.byteOffset+buffer.byteLength));}
+function decodeTrajectories(raw){return{nodeIds:raw.node_ids||[],kValues:raw.k_values||[],topic:typedArray(raw.topic,Int32Array),level:typedArray(raw.level,Int8Array),probability:typedArray(raw.probability,Float32Array)};}
+function gatherTrajectory(trajectories,row){const assignments={};const kCount=trajectories.kValues.length;const offset=row*kCount;for(let column=0;column<kCount;column++){const topic=trajectories.topic[offset+column];if(topic>=0){assignments[trajectories.kValues[column]]={topicId:trajectories.nodeIds[topic],level:LEVELS[trajectories.level[offset+column]],probability:trajectories.probability[offset+column]};}}
+return assignments;}
+function parseSegment(segment){const cut=segment.lastIndexOf('_');const level=segment.slice(cut+1);if(cut>0&&(level==='high'||level==='medium')){return{topicId:segment.slice(0,cut),level:level};}
+return{topicId:segment,level:'medium'};}
+function computeLayout(data,width,height){const{nodes,nodeById,flows,kValues}=data;const significantFlows=flows;if(logger.enabled)logger.log(`Showing ${significantFlows.length} flows`);if(nodes.length===0){return{nodes,nodeById,flows:significantFlows,drawableFlows:[],kValues,kSpacing:0,sampleNames:data.sampleNames,trajectories:data.trajectories,lazy:data.lazy,flowFilter:data.flowFilter};}
+const kSpacing=width/Math.max(1,kValues.length-1);const nodesByK=d3.group(nodes,d=>d.k);const kIndexByK=new Map(kValues.map((k,index)=>[k,index]));const maxTotalCount=d3.max(nodes,d=>d.highCount+d.mediumCount)||1;const minNodeHeight=20;const maxNodeHeight=120;const optimizedNodePositions=optimizeNodeOrder(nodes,significantFlows,kValues,nodesByK,height);nodes.forEach(node=>{const kIndex=kIndexByK.has(node.k)?kIndexByK.get(node.k):-1;node.x=kIndex*kSpacing;node.y=optimizedNodePositions[node.id];const totalSamples=node.highCount+node.mediumCount;node.height=minNodeHeight+(totalSamples/maxTotalCount)*(maxNodeHeight-minNodeHeight);node.segments=nodeSegments(node);});const maxFlowCount=d3.max(significantFlows,d=>d.sampleCount)||1;const minFlowWidth=2;const maxFlowWidth=25;const drawableFlows=[];significantFlows.forEach(flow=>{const sourceNode=nodeById.get(flow.sourceTopicId);const targetNode=nodeById.get(flow.targetTopicId);if(sourceNode&&targetNode&&flow.sampleCount>0){flow.width=minFlowWidth+(flow.sampleCount/maxFlowCount)*(maxFlowWidth-minFlowWidth);const sourceY=calculateSegmentY(sourceNode,flow.sourceLevel);const targetY=calculateSegmentY(targetNode,flow.targetLevel);flow.curve=[sourceNode.x+15,sourceY,targetNode.x-15,targetY];flow.path=createCurvePath(...flow.curve);drawableFlows.push(flow);}});return{nodes,nodeById,flows:significantFlows,drawableFlows,kValues,kSpacing,sampleNames:data.sampleNames,trajectories:data.trajectories,lazy:data.lazy,flowFilter:data.flowFilter};}
+function drawSankeyDiagram(g,layout,width,height,selectedFlow,model,samplePayloads,canvas,interactions){const{nodes,flows,drawableFlows,kValues,kSpacing}=layout;g.selectAll(".empty-message").remove();if(nodes.length===0){g.selectAll(".flows, .sample-tracing, .nodes, .k-labels, .legend").selectAll("*").remove();g.append("text").attr("class","empty-message").attr("x",width/2).attr("y",height/2).attr("text-anchor","middle").style("font-size","16px").style("fill","#666").text("No nodes to display");return;}
+const flowPaths=g.select(".flows").selectAll("path.flow").data(canvas?[]:drawableFlows,flowKey).join(enter=>enter.append("path").attr("class","flow").attr("fill","none").style("cursor","pointer").on("mouseover",function(event,flow){if(!isFlowSelected(model.get("selected_flow"),flow)){d3.select(this).attr("opacity",0.8);}
+interactions.showFlowTooltip(event,flow);}).on("mouseout",function(event,flow){if(!isFlowSelected(model.get("selected_flow"),flow)){d3.select(this).attr("opacity",0.6);}
+interactions.hideTooltip();}).on("click",function(event,flow){event.stopPropagation();interactions.toggleFlowSelection(flow);})).attr("d",flow=>flow.path);styleFlows(flowPaths,selectedFlow);const nodeGroups=g.select(".nodes").selectAll("g.node").data(nodes,node=>node.id).join(enter=>{const nodeG=enter.append("g").attr("class","node");nodeG.append("text").attr("class","node-label").attr("x",25).attr("dy","0.35em").style("font-size","11px").style("font-weight","bold").style("fill","#333").style("cursor","pointer").on("click",function(event,node){logger.log("Node clicked:",node);});return nodeG;}).attr("transform",node=>`translate(${node.x}, ${node.y - node.height/2})`);nodeGroups.select("text.node-label").attr("y",node=>node.height/2).text(node=>`MC${node.mc}`);nodeGroups.selectAll("rect.segment").data(node=>node.segments,segment=>segment.level).join(enter=>enter.insert("rect","text").attr("class",segment=>`segment segment-${segment.node.id}-${segment.level}`).attr("x",-10).attr("width",20).attr("stroke","white").attr("stroke-width",1).style("cursor","pointer").on("mouseover",function(event,segment){d3.select(this).attr("opacity",0.8);interactions.showSegmentTooltip(event,segment);}).on("mouseout",function(){d3.select(this).attr("opacity",1);interactions.hideTooltip();})).attr("y",segment=>segment.y).attr("height",segment=>segment.height);g.select(".k-labels").selectAll("text").data(kValues,k=>k).join(enter=>enter.append("text").attr("y",-30).attr("text-anchor","middle").style("font-size","16px").style("font-weight","bold").text(k=>`K=${k}`)).attr("x",(k,index)=>index*kSpacing);updateSampleTracing(g,layout,selectedFlow,nodes,flows,kValues,samplePayloads,canvas);}
+function flowSelection(flow){return{source:flow.source,target:flow.target,sourceK:flow.sourceK,targetK:flow.targetK};}
+function styleNodes(g,layout,height,colorSchemes,rawData,metricMode,metricScales,metricConfig){g.select(".nodes").selectAll("rect.segment").attr("fill",segment=>{let baseColor;if(metricMode&&metricScales){baseColor=getMetricColor(segment.node.id,rawData,metricScales,metricConfig);}else{baseColor=colorSchemes[segment.node.k]||"#666";}
+return segment.level==='high'&&!metricMode?d3.color(baseColor).darker(0.8):baseColor;});g.select(".k-labels").selectAll("text").style("fill",k=>metricMode?"#333":(colorSchemes[k]||"#333"));drawLegend(g.select(".legend"),metricMode,layout.flows.length,layout.flowFilter,height);}
+function nodeSegments(node){const totalCount=node.highCount+node.mediumCount;let highHeight=0;let mediumHeight=0;if(totalCount>0){highHeight=(node.highCount/totalCount)*node.height;mediumHeight=(node.mediumCount/totalCount)*node.height;}
+const segments=[];if(highHeight>0){segments.push({node:node,level:'high',count:node.highCount,y:0,height:highHeight});}
+if(mediumHeight>0){segments.push({node:node,level:'medium',count:node.mediumCount,y:highHeight,height:mediumHeight});}
+return segments;}
+function flowKey(flow){return`${flow.sourceK}:${flow.source}->${flow.targetK}:${flow.target}`;}
+function hasSelection(selectedFlow){return!!selectedFlow&&Object.keys(selectedFlow).length>0;}
+function isSameSelection(a,b){return hasSelection(a)?isFlowSelected(a,b):!hasSelection(b);}
+function isFlowSelected(selectedFlow,flow){return!!selectedFlow&&selectedFlow.source===flow.source&&selectedFlow.target===flow.target&&selectedFlow.sourceK===flow.sourceK&&selectedFlow.targetK===flow.targetK;}
+function styleFlows(flowPaths,selectedFlow){flowPaths.attr("stroke",flow=>isFlowSelected(selectedFlow,flow)?"#ff6b35":"#888").attr("stroke-width",flow=>isFlowSelected(selectedFlow,flow)?flow.width+3:flow.width).attr("opacity",flow=>isFlowSelected(selectedFlow,flow)?1.0:0.6);}
+function sizeCanvasLayers(canvasLayers,width,height,margin){const ratio=window.devicePixelRatio||1;Object.values(canvasLayers).forEach(ctx=>{ctx.canvas.width=Math.round(width*ratio);ctx.canvas.height=Math.round(height*ratio);ctx.canvas.style.width=`${width}px`;ctx.canvas.style.height=`${height}px`;ctx.setTransform(ratio,0,0,ratio,margin.left*ratio,margin.top*ratio);});}
+function clearCanvasLayer(ctx,background){ctx.save();ctx.setTransform(1,0,0,1,0,0);ctx.clearRect(0,0,ctx.canvas.width,ctx.canvas.height);if(background){ctx.fillStyle=background;ctx.fillRect(0,0,ctx.canvas.width,ctx.canvas.height);}
+ctx.restore();}
+function traceCurve(ctx,x1,y1,x2,y2){const midX=(x1+x2)/2;ctx.beginPath();ctx.moveTo(x1,y1);ctx.bezierCurveTo(midX,y1,midX,y2,x2,y2);}
+function strokeFlowCanvas(ctx,flow,color,width,opacity){ctx.strokeStyle=color;ctx.lineWidth=width;ctx.globalAlpha=opacity;traceCurve(ctx,...flow.curve);ctx.stroke();ctx.globalAlpha=1;}
+function drawFlowsCanvas(ctx,flows){clearCanvasLayer(ctx,"#fafafa");ctx.strokeStyle="#888";ctx.globalAlpha=0.6;flows.forEach(flow=>{ctx.lineWidth=flow.width;traceCurve(ctx,...flow.curve);ctx.stroke();});ctx.globalAlpha=1;}
+function flowPolyline(flow,steps){const[x1,y1,x2,y2]=flow.curve;const midX=(x1+x2)/2;const points=new Float32Array((steps+1)*2);for(let i=0;i<=steps;i++){const t=i/steps;const u=1-t;const a=u*u*u,b=3*u*u*t,c=3*u*t*t,d=t*t*t;points[2*i]=a*x1+(b+c)*midX+d*x2;points[2*i+1]=(a+b)*y1+(c+d)*y2;}
+return points;}
+function buildFlowIndex(flows,cellSize){const cells=new Map();const polylines=flows.map(flow=>flowPolyline(flow,16));flows.forEach((flow,flowIndex)=>{const points=polylines[flowIndex];const pad=flow.width/2+2;for(let i=0;i+3<points.length;i+=2){const cx0=Math.floor((Math.min(points[i],points[i+2])-pad)/cellSize);const cx1=Math.floor((Math.max(points[i],points[i+2])+pad)/cellSize);const cy0=Math.floor((Math.min(points[i+1],points[i+3])-pad)/cellSize);const cy1=Math.floor((Math.max(points[i+1],points[i+3])+pad)/cellSize);for(let cx=cx0;cx<=cx1;cx++){for(let cy=cy0;cy<=cy1;cy++){const key=cellKey(cx,cy);const bucket=cells.get(key);if(!bucket){cells.set(key,[flowIndex]);}else if(bucket[bucket.length-1]!==flowIndex){bucket.push(flowIndex);}}}}});return{cellSize,cells,polylines};}
+function cellKey(cx,cy){return(cx+32768)*65536+(cy+32768);}
+function findFlowAt(index,flows,x,y){const bucket=index.cells.get(cellKey(Math.floor(x/index.cellSize),Math.floor(y/index.cellSize)));if(!bucket)return null;let hit=-1;bucket.forEach(flowIndex=>{if(flowIndex>hit&&distanceToPolyline(index.polylines[flowIndex],x,y)<=flows[flowIndex].width/2+2){hit=flowIndex;}});return hit>=0?flows[hit]:null;}
+function distanceToPolyline(points,x,y){let best=Infinity;for(let i=0;i+3<points.length;i+=2){const ax=points[i],ay=points[i+1];const dx=points[i+2]-ax,dy=points[i+3]-ay;const lengthSq=dx*dx+dy*dy;const t=lengthSq>0?Math.max(0,Math.min(1,((x-ax)*dx+(y-ay)*dy)/lengthSq)):0;const px=ax+t*dx-x,py=ay+t*dy-y;best=Math.min(best,px*px+py*py);}
+return Math.sqrt(best);}
+function drawLegend(legend,metricMode,flowCount,flowFilter,height){legend.attr("transform",`translate(20, ${height - 120})`);legend.selectAll("*").remove();if(!metricMode){legend.append("rect").attr("width",15).attr("height",10).attr("fill","#333");legend.append("text").attr("x",20).attr("y",8).style("font-size","10px").text("High (≥0.67)");legend.append("rect").attr("y",15).attr("width",15).attr("height",10).attr("fill","#666");legend.append("text").attr("x",20).attr("y",23).style("font-size","10px").text("Medium (0.33-0.66)");}else{legend.append("text").attr("x",0).attr("y",8).style("font-size","10px").style("font-weight","bold").style("fill","#333").text("Metric Mode Active");legend.append("text").attr("x",0).attr("y",20).style("font-size","9px").style("fill","#d62728").text("Red: Low Perplexity");legend.append("text").attr("x",0).attr("y",32).style("font-size","9px").style("fill","#2ca02c").text("Blue: High Coherence");legend.append("text").attr("x",0).attr("y",44).style("font-size","9px").style("fill","#7f4f7f").text("Purple: Optimal Topics");legend.append("text").attr("x",0).attr("y",56).style("font-size","8px").style("fill","#888").text("(Uniform colors - quality by hue)");}
+legend.append("text").attr("x",0).attr("y",metricMode?72:40).style("font-size","9px").style("fill","#666").text(`Flows: ${flowCount} (≥${flowFilter.min_samples} samples${flowFilter.top_n != null ? `,top ${flowFilter.top_n}per K pair` : ""})`);legend.append("text").attr("x",0).attr("y",metricMode?84:52).style("font-size","9px").style("fill","#888").text("Barycenter optimized");legend.append("text").attr("x",0).attr("y",metricMode?96:64).style("font-size","9px").style("fill","#ff6b35").text("Click flows to trace samples");}
+function updateSampleTracing(g,data,selectedFlow,nodes,flows,kValues,samplePayloads,canvas){g.selectAll(".sample-tracing").selectAll("*").remove();g.selectAll(".sample-count-badge").remove();g.selectAll(".sample-info-panel").remove();g.selectAll(".nodes rect.traced").classed("traced",false).attr("stroke","white").attr("stroke-width",1);if(canvas){clearCanvasLayer(canvas.tracing);const selected=(data.drawableFlows||[]).find(flow=>isFlowSelected(selectedFlow,flow));if(selected){strokeFlowCanvas(canvas.tracing,selected,"#ff6b35",selected.width+3,1.0);}}
+if(!hasSelection(selectedFlow)){return;}
+logger.log("Tracing samples for selected flow:",selectedFlow);const payload=data.lazy?samplePayloads&&samplePayloads.get(selectedFlow):null;if(data.lazy&&!payload){return;}
+const flow=data.lazy?null:flows.find(f=>isFlowSelected(selectedFlow,f));const rows=flow?flow.sampleRows:null;const trajectories=data.lazy?payload.trajectories:data.trajectories;const sampleIds=data.lazy?payload.sampleNames:Array.from(rows||[],row=>data.sampleNames[row]);const tracingGroup=g.select(".sample-tracing");if(logger.enabled)logger.log(`Tracing ${sampleIds.length} samples:`,sampleIds.slice(0,3));if(sampleIds.length===0){showSampleInfo(g,selectedFlow,0);return;}
+const sampleAssignments=traceSampleAssignments(sampleIds,rows,trajectories);const segmentCounts=countSampleSegments(sampleAssignments);const marks=trajectoryMarks(sampleAssignments,segmentCounts,data.nodeById,selectedFlow,data);if(canvas){drawTrajectoriesCanvas(canvas.tracing,marks);}else{drawSampleTrajectories(tracingGroup,marks);}
+highlightSampleSegments(g,segmentCounts,data.nodeById);showSampleInfo(g,selectedFlow,sampleIds.length);}
+function traceSampleAssignments(sampleIds,rows,trajectories){logger.log("Tracing sample assignments across K values...");const assignments={};sampleIds.forEach((sampleId,position)=>{assignments[sampleId]=gatherTrajectory(trajectories,rows?rows[position]:position);});if(logger.enabled)logger.log("Sample assignments traced:",Object.keys(assignments).length,"samples");return assignments;}
+function countSampleSegments(sampleAssignments){const segmentCounts=new Map();Object.values(sampleAssignments).forEach(assignments=>{Object.values(assignments).forEach(assignment=>{const segmentKey=`${assignment.topicId}-${assignment.level}`;const segment=segmentCounts.get(segmentKey);if(segment){segment.count+=1;}else{segmentCounts.set(segmentKey,{topicId:assignment.topicId,level:assignment.level,count:1});}});});return segmentCounts;}
+function trajectoryMarks(sampleAssignments,segmentCounts,nodeById,selectedFlow,data){const sampleIds=Object.keys(sampleAssignments);const lines=[];const dots=[];if(logger.enabled)logger.log(`Drawing trajectories for ${sampleIds.length} samples`);let maxSampleCount=0;segmentCounts.forEach(segment=>{maxSampleCount=Math.max(maxSampleCount,segment.count);});const allFlows=data.flows;const maxFlowCount=d3.max(allFlows,d=>d.sampleCount)||1;const minFlowWidth=2;const maxFlowWidth=25;const getSankeyLineWeight=(count)=>{return minFlowWidth+(count/maxFlowCount)*(maxFlowWidth-minFlowWidth);};sampleIds.forEach((sampleId,sampleIndex)=>{const assignments=sampleAssignments[sampleId];const pathPoints=[];Object.entries(assignments).forEach(([k,assignment])=>{const node=nodeById.get(assignment.topicId);if(node){const segmentY=calculateSegmentY(node,assignment.level);const segment=segmentCounts.get(`${assignment.topicId}-${assignment.level}`);pathPoints.push({k:parseInt(k),x:node.x,y:segmentY,topicId:assignment.topicId,level:assignment.level,probability:assignment.probability,sampleCount:segment?segment.count:0});}});pathPoints.sort((a,b)=>a.k-b.k);if(pathPoints.length>=2){for(let i=0;i<pathPoints.length-1;i++){const start=pathPoints[i];const end=pathPoints[i+1];if(end.k-start.k===1){const isSelectedSegment=start.k===selectedFlow.sourceK&&end.k===selectedFlow.targetK;const trajectoryFlowCount=Math.min(start.sampleCount,end.sampleCount);const lineWeight=getSankeyLineWeight(trajectoryFlowCount);lines.push({curve:[start.x+15,start.y,end.x-15,end.y],width:isSelectedSegment?lineWeight+2:lineWeight,opacity:isSelectedSegment?0.9:0.7,className:`trajectory-${sampleIndex}-${i}`});}}
+pathPoints.forEach((point,pointIndex)=>{const baseDotSize=3;const maxDotSize=8;const dotRadius=maxSampleCount>0?baseDotSize+(point.sampleCount/maxSampleCount)*(maxDotSize-baseDotSize):baseDotSize;dots.push({x:point.x,y:point.y,r:dotRadius,className:`trajectory-point-${sampleIndex}-${pointIndex}`});});}});return{lines,dots};}
+function drawSampleTrajectories(tracingGroup,marks){const trajectoryColor="#ff6b35";marks.lines.forEach(line=>{tracingGroup.append("path").attr("d",createCurvePath(...line.curve)).attr("stroke",trajectoryColor).attr("stroke-width",line.width).attr("stroke-dasharray","none").attr("fill","none").attr("opacity",line.opacity).attr("class",line.className).style("pointer-events","none");});marks.dots.forEach(dot=>{tracingGroup.append("circle").attr("cx",dot.x).attr("cy",dot.y).attr("r",dot.r).attr("fill",trajectoryColor).attr("stroke","white").attr("stroke-width",1.5).attr("opacity",0.8).attr("class",dot.className).style("pointer-events","none");});logger.log("Sample trajectories drawn with sankey-matching line weights (all solid)");}
+function drawTrajectoriesCanvas(ctx,marks){const trajectoryColor="#ff6b35";ctx.strokeStyle=trajectoryColor;marks.lines.forEach(line=>{ctx.lineWidth=line.width;ctx.globalAlpha=line.opacity;traceCurve(ctx,...line.curve);ctx.stroke();});ctx.fillStyle=trajectoryColor;ctx.strokeStyle="white";ctx.lineWidth=1.5;ctx.globalAlpha=0.8;marks.dots.forEach(dot=>{ctx.beginPath();ctx.arc(dot.x,dot.y,dot.r,0,2*Math.PI);ctx.fill();ctx.stroke();});ctx.globalAlpha=1;}
+function highlightSampleSegments(g,segmentCounts,nodeById){const highlightColor="#ff6b35";logger.log("Segment counts:",segmentCounts);g.select(".nodes").selectAll("rect.segment").filter(segment=>segmentCounts.has(`${segment.node.id}-${segment.level}`)).classed("traced",true).attr("stroke",highlightColor).attr("stroke-width",3);segmentCounts.forEach(({topicId,level,count})=>{const node=nodeById.get(topicId);if(node){const badgeY=level==='high'?node.y-node.height/2+15:node.y+node.height/2-15;g.append("circle").attr("cx",node.x+35).attr("cy",badgeY).attr("r",10).attr("fill",highlightColor).attr("stroke","white").attr("stroke-width",2).attr("class","sample-count-badge");g.append("text").attr("x",node.x+35).attr("y",badgeY).attr("text-anchor","middle").attr("dy","0.35em").style("font-size","9px").style("font-weight","bold").style("fill","white").text(count).attr("class","sample-count-badge");}});}
+function optimizeNodeOrder(nodes,flows,kValues,nodesByK,height){logger.log("Applying barycenter method for node ordering...");const nodePositions={};const firstK=kValues[0];const firstKNodes=nodesByK.get(firstK)||[];const spacing=height/Math.max(1,firstKNodes.length+1);firstKNodes.forEach((node,index)=>{nodePositions[node.id]=(index+1)*spacing;});if(logger.enabled)logger.log(`Initialized K=${firstK} with ${firstKNodes.length} nodes`);const incomingFlows=d3.group(flows,flow=>flow.targetTopicId);for(let kIndex=1;kIndex<kValues.length;kIndex++){const currentK=kValues[kIndex];const prevK=kValues[kIndex-1];const currentKNodes=nodesByK.get(currentK)||[];if(logger.enabled)logger.log(`Optimizing K=${currentK} (${currentKNodes.length} nodes)`);const barycenterData=currentKNodes.map(node=>{const nodeId=node.id;let weightedSum=0;let totalWeight=0;(incomingFlows.get(nodeId)||[]).forEach(flow=>{if(flow.sourceK===prevK){const sourcePosition=nodePositions[flow.sourceTopicId];if(sourcePosition!==undefined){const weight=flow.sampleCount;weightedSum+=sourcePosition*weight;totalWeight+=weight;}}});const barycenter=totalWeight>0?weightedSum/totalWeight:height/2;return{node:node,barycenter:barycenter,totalWeight:totalWeight};});barycenterData.sort((a,b)=>a.barycenter-b.barycenter);const newSpacing=height/Math.max(1,barycenterData.length+1);barycenterData.forEach((data,index)=>{nodePositions[data.node.id]=(index+1)*newSpacing;});}
+logger.log("Barycenter optimization complete!");return nodePositions;}
+function calculateSegmentY(node,level){const totalCount=node.highCount+node.mediumCount;if(totalCount===0)return node.y;const highHeight=(node.highCount/totalCount)*node.height;if(level==='high'){return node.y-node.height/2+highHeight/2;}else{return node.y-node.height/2+highHeight+(node.height-highHeight)/2;}}
+function createCurvePath(x1,y1,x2,y2){const midX=(x1+x2)/2;return`M ${x1} ${y1} C ${midX} ${y1} ${midX} ${y2} ${x2} ${y2}`;}
+function createTooltip(g){const group=g.append("g").attr("class","tooltip").style("display","none");const rect=group.append("rect").attr("fill","white").attr("stroke","black").attr("rx",3).attr("opacity",0.9);let shownKind=null;function show(kind,lines,x,y,width,height){shownKind=kind;rect.attr("x",x).attr("y",y).attr("width",width).attr("height",height);group.selectAll("text").data(lines).join(enter=>enter.append("text").style("font-size","10px").style("fill","black")).attr("x",x+5).attr("y",(line,i)=>y+15+i*12).text(line=>line);group.style("display",null).raise();}
+function hide(kind){if(shownKind===null||(kind&&kind!==shownKind))return;shownKind=null;group.style("display","none");}
+return{show,hide};}
+function placeTooltip(event,width,height,offsetY,bounds){let tooltipX=event.layerX||0;let tooltipY=(event.layerY||0)-offsetY;if(tooltipX+width>bounds.width){tooltipX=bounds.width-width-10;}
+if(tooltipY<0){tooltipY=(event.layerY||0)+20;}
+if(tooltipY+height>bounds.height){tooltipY=Math.max(0,bounds.height-height);}
+return[tooltipX,tooltipY];}
+function showTooltip(tooltip,event,flow,bounds){const lines=[`${flow.sampleCount} samples`,`${flow.source} → ${flow.target}`];const tooltipWidth=160;const tooltipHeight=35;const[tooltipX,tooltipY]=placeTooltip(event,tooltipWidth,tooltipHeight,40,bounds);tooltip.show("flow",lines,tooltipX,tooltipY,tooltipWidth,tooltipHeight);}
+function showSampleInfo(g,selectedFlow,sampleCount){const infoPanel=g.append("g").attr("class","sample-info-panel");infoPanel.append("rect").attr("x",10).attr("y",10).attr("width",200).attr("height",60).attr("fill","white").attr("stroke","#ff6b35").attr("stroke-width",2).attr("rx",5).attr("opacity",0.95);infoPanel.append("text").attr("x",20).attr("y",30).style("font-size","12px").style("font-weight","bold").style("fill","#ff6b35").text(`Selected: ${sampleCount} Samples`);infoPanel.append("text").attr("x",20).attr("y",45).style("font-size","10px").style("fill","#333").text(`${selectedFlow.source} → ${selectedFlow.target}`);infoPanel.append("text").attr("x",20).attr("y",58).style("font-size","9px").style("fill","#666").text("Click flow again or background to clear");}
+function showSegmentTooltip(tooltip,event,node,level,count,rawData,metricMode,bounds){const levelText=level==='high'?'High (≥0.67)':'Medium (0.33-0.66)';let tooltipLines=[`${node.id}`,levelText,`${count} samples`];if(metricMode&&rawData&&rawData.nodes[node.id]){const nodeData=rawData.nodes[node.id];if(nodeData.model_metrics&&nodeData.model_metrics.perplexity!==undefined){tooltipLines.push(`Perplexity: ${nodeData.model_metrics.perplexity.toFixed(3)}`);}
+if(nodeData.mallet_diagnostics&&nodeData.mallet_diagnostics.coherence!==undefined){tooltipLines.push(`Coherence: ${nodeData.mallet_diagnostics.coherence.toFixed(3)}`);}}
+const topWords=rawData&&rawData.nodes[node.id]&&rawData.nodes[node.id].top_words;if(topWords&&topWords.length){tooltipLines.push("Top features:");topWords.slice(0,5).forEach(([word,prob])=>{tooltipLines.push(`· ${word} (${(prob || 0).toFixed(3)})`);});}
+const tooltipHeight=tooltipLines.length*12+10;const tooltipWidth=Math.max(140,Math.max(...tooltipLines.map(line=>line.length*6+10)));const[tooltipX,tooltipY]=placeTooltip(event,tooltipWidth,tooltipHeight,tooltipHeight+10,bounds);tooltip.show("segment",tooltipLines,tooltipX,tooltipY,tooltipWidth,tooltipHeight);}
+export default{render};
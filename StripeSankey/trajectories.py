@@ -0,0 +1,115 @@
+import numpy as np
+
+from .schema import flow_members, is_indexed
+from .segments import LEVEL_CODES, UNASSIGNED, parse_segment
+
+
+def build_trajectory_table(
+    sankey_data, min_flow_samples=10, sample_names=None, node_ids=None
+):
+    """
+    Build a per-sample trajectory table (sample x K) from processed sankey data
+
+    Each sample's assignment at a K comes from the flows it appears in, exactly
+    as the frontend traces it: flows are visited in order and a later flow
+    overwrites an earlier one for the same (sample, K).
+
+    Args:
+        sankey_data (dict): Processed data with 'k_range' and 'flows', in either schema
+        min_flow_samples (int): Flows with fewer samples are ignored, matching
+                                the flows drawn by the widget
+        sample_names (list, optional): Fixed row order, e.g. a shared sample dictionary;
+                                       indexed data always uses its own 'sample_names'
+        node_ids (list, optional): Fixed topic order; unseen topics are appended
+
+    Returns:
+        dict: {
+            'sample_names': list of sample ids (row order),
+            'node_ids': list of topic ids referenced by 'topic',
+            'k_values': list of K values (column order),
+            'topic': int32 array (samples x K), index into node_ids or -1,
+            'level': int8 array (samples x K), index into LEVELS or -1,
+            'probability': float32 array (samples x K)
+        }
+    """
+    k_values = list(sankey_data.get("k_range") or [])
+    k_index = {k: i for i, k in enumerate(k_values)}
+
+    indexed = is_indexed(sankey_data)
+    if indexed:
+        sample_names = list(sankey_data["sample_names"])
+    sample_index = {name: row for row, name in enumerate(sample_names or [])}
+    node_index = {node_id: topic for topic, node_id in enumerate(node_ids or [])}
+
+    # One block of (sample, K) observations per flow endpoint, in flow order
+    blocks = []
+
+    for flow in sankey_data.get("flows") or []:
+        if (flow.get("sample_count") or 0) < min_flow_samples:
+            continue
+
+        samples, source_probs, target_probs = flow_members(flow)
+        if not indexed:
+            samples = [sample_index.setdefault(s, len(sample_index)) for s in samples]
+        samples = np.asarray(samples, dtype=np.int64)
+
+        for segment_key, k_key, probs in (
+            ("source_segment", "source_k", source_probs),
+            ("target_segment", "target_k", target_probs),
+        ):
+            col = k_index.get(flow.get(k_key))
+            if col is None:
+                continue
+            topic_id, level = parse_segment(flow[segment_key])
+            topic = node_index.setdefault(topic_id, len(node_index))
+            blocks.append((samples, col, topic, LEVEL_CODES[level], probs))
+
+    shape = (len(sample_index), len(k_values))
+    topic_table = np.full(shape, UNASSIGNED, dtype=np.int32)
+    level_table = np.full(shape, UNASSIGNED, dtype=np.int8)
+    probability_table = np.zeros(shape, dtype=np.float32)
+
+    if blocks:
+        rows = np.concatenate([block[0] for block in blocks])
+        sizes = [len(block[0]) for block in blocks]
+        cols = np.repeat([block[1] for block in blocks], sizes)
+        topics = np.repeat(np.asarray([b[2] for b in blocks], dtype=np.int32), sizes)
+        levels = np.repeat(np.asarray([b[3] for b in blocks], dtype=np.int8), sizes)
+        probabilities = np.concatenate(
+            [np.asarray(block[4], dtype=np.float32) for block in blocks]
+        )
+        flat = rows * len(k_values) + cols
+
+        # Keep the last observation per cell (fancy assignment does not guarantee order)
+        _, last_reversed = np.unique(flat[::-1], return_index=True)
+        keep = len(flat) - 1 - last_reversed
+
+        topic_table.ravel()[flat[keep]] = topics[keep]
+        level_table.ravel()[flat[keep]] = levels[keep]
+        probability_table.ravel()[flat[keep]] = probabilities[keep]
+
+    return {
+        "sample_names": list(sample_index),
+        "node_ids": list(node_index),
+        "k_values": k_values,
+        "topic": topic_table,
+        "level": level_table,
+        "probability": probability_table,
+    }
+
+
+def trajectory_table_to_json(table):
+    """Convert a trajectory table to widget state, with the arrays as binary buffers"""
+    return {
+        "sample_names": table["sample_names"],
+        "node_ids": table["node_ids"],
+        "k_values": table["k_values"],
+        "topic": _buffer(table["topic"], "<i4"),
+        "level": _buffer(table["level"], "i1"),
+        "probability": _buffer(table["probability"], "<f4"),
+    }
+
+
+def _buffer(array, dtype):
+    """Flat, contiguous little-endian view of an array for binary sync"""
+    return memoryview(np.ascontiguousarray(array, dtype=dtype).reshape(-1))
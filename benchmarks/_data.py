@@ -0,0 +1,46 @@
+"""
+Synthetic topic-model sweeps for the benchmarks
+
+Sample-topic probabilities are drawn from Dirichlet(alpha=0.5), as in
+example/example1.py::create_lda_demo_data, for every sweep size x K range.
+"""
+import numpy as np
+import pandas as pd
+
+SAMPLE_COUNTS = [1_000, 10_000, 100_000]
+K_RANGES = {"K2-10": range(2, 11), "K2-30": range(2, 31)}
+
+SWEEPS = [(n_samples, k_label) for k_label in K_RANGES for n_samples in SAMPLE_COUNTS]
+
+
+def create_sweep(n_samples, k_range, alpha=0.5, seed=42):
+    """{k: topics x samples DataFrame} of Dirichlet(alpha) topic distributions"""
+    rng = np.random.default_rng(seed)
+    sample_names = [f"doc_{i:06d}" for i in range(n_samples)]
+    return {
+        k: pd.DataFrame(
+            rng.dirichlet(np.full(k, alpha), size=n_samples).T.astype(np.float32),
+            index=[f"MC{topic}" for topic in range(k)],
+            columns=sample_names,
+        )
+        for k in k_range
+    }
+
+
+def create_model_metrics(k_range, seed=42):
+    """MALLET-diagnostics-like (per topic) and perplexity (per K) frames for a sweep"""
+    rng = np.random.default_rng(seed)
+    k_values = np.repeat(list(k_range), list(k_range))
+    topic_ids = np.concatenate([np.arange(k) for k in k_range])
+    diagnostics = pd.DataFrame({
+        "k_value": k_values,
+        "topic_id": topic_ids,
+        "tokens": rng.uniform(1e3, 1e6, len(k_values)),
+        "coherence": rng.normal(-100, 30, len(k_values)),
+        "exclusivity": rng.uniform(0, 1, len(k_values)),
+    })
+    perplexity = pd.DataFrame({
+        "k_value": list(k_range),
+        "perplexity": rng.uniform(1, 2, len(k_range)),
+    })
+    return diagnostics, perplexity
@@ -0,0 +1,58 @@
+"""Data preparation stages of StripeSankeyDataProcessor"""
+import copy
+
+import numpy as np
+from _data import create_model_metrics
+
+from StripeSankey.metrics import attach_topic_metrics, join_topic_metrics
+from StripeSankey.processor import categorize_topic_matrix
+from StripeSankey.schema import index_sankey_data
+
+
+def bench_categorize_topic_matrices(run, sweep):
+    matrices = [
+        df.to_numpy(dtype=np.float64) for df in sweep["sample_mc_data"].values()
+    ]
+    run(lambda: [categorize_topic_matrix(matrix) for matrix in matrices])
+
+
+def bench_categorize_sample_assignments(run, sweep, processor):
+    run(processor.categorize_sample_assignments, sweep["sample_mc_data"])
+
+
+def bench_categorize_without_sample_lists(run, sweep, processor):
+    run(
+        processor.categorize_sample_assignments,
+        sweep["sample_mc_data"],
+        sample_lists=False,
+    )
+
+
+def bench_calculate_flow_tables(run, categorized, processor):
+    run(processor.calculate_flow_tables, categorized)
+
+
+def bench_flows_from_tables(run, flow_tables, processor):
+    run(processor.flows_from_tables, flow_tables)
+
+
+def bench_indexed_flows_from_tables(run, sweep, flow_tables, processor):
+    sample_names = processor._sample_dictionary(sweep["sample_mc_data"])
+    run(processor.flows_from_tables, flow_tables, sample_names)
+
+
+def bench_index_sankey_data(run, sankey_data):
+    run(index_sankey_data, sankey_data)
+
+
+def bench_metric_integration(run, sweep, sankey_data):
+    diagnostics, perplexity = create_model_metrics(sweep["k_range"])
+    # A copy, so the session-scoped sankey_data that later benchmarks sync stays
+    # unchanged
+    nodes = copy.deepcopy(sankey_data["nodes"])
+
+    def attach():
+        table = join_topic_metrics(nodes.keys(), diagnostics, perplexity)
+        return attach_topic_metrics(nodes, table)
+
+    run(attach)
@@ -0,0 +1,58 @@
+"""Serialization to disk and to the frontend, with payload sizes in extra_info"""
+import json
+
+import pytest
+
+from StripeSankey import StripeSankeyInline
+from StripeSankey.export import dump_sankey_data
+from StripeSankey.widget import _sankey_data_to_json
+
+
+def split_buffers(obj, buffers):
+    """Replace binary values with None, collecting them in buffers (as sent)"""
+    if isinstance(obj, (memoryview, bytes, bytearray)):
+        buffers.append(obj)
+        return None
+    if isinstance(obj, dict):
+        return {key: split_buffers(value, buffers) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [split_buffers(value, buffers) for value in obj]
+    return obj
+
+
+def sync_payload(widget):
+    """sankey_data as the kernel sends it: JSON state plus binary buffers"""
+    buffers = []
+    state = split_buffers(_sankey_data_to_json(widget.sankey_data, widget), buffers)
+    return json.dumps(state, separators=(",", ":")).encode(), buffers
+
+
+def buffer_bytes(buffers):
+    return sum(memoryview(buffer).nbytes for buffer in buffers)
+
+
+@pytest.mark.parametrize("schema", ["named", "indexed"])
+@pytest.mark.parametrize("suffix", [".json", ".json.gz"])
+def bench_json_export(
+    run, benchmark, tmp_path, sankey_data, indexed_sankey_data, schema, suffix
+):
+    data = sankey_data if schema == "named" else indexed_sankey_data
+    path = tmp_path / f"sankey_data{suffix}"
+    size = run(dump_sankey_data, data, path)
+    benchmark.extra_info["json_bytes"] = size
+    benchmark.extra_info["file_bytes"] = path.stat().st_size
+
+
+@pytest.mark.parametrize("lazy_samples", [False, True], ids=["eager", "lazy"])
+def bench_widget_sync(run, benchmark, sankey_data, lazy_samples):
+    widget = StripeSankeyInline(sankey_data=sankey_data, lazy_samples=lazy_samples)
+    state, buffers = run(sync_payload, widget)
+    benchmark.extra_info["state_bytes"] = len(state)
+    benchmark.extra_info["buffer_bytes"] = buffer_bytes(buffers)
+    benchmark.extra_info["payload_bytes"] = len(state) + buffer_bytes(buffers)
+
+
+def bench_widget_sync_indexed(run, benchmark, indexed_sankey_data):
+    widget = StripeSankeyInline(sankey_data=indexed_sankey_data)
+    state, buffers = run(sync_payload, widget)
+    benchmark.extra_info["payload_bytes"] = len(state) + buffer_bytes(buffers)
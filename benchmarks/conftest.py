@@ -0,0 +1,80 @@
+"""
+Benchmark fixtures over the synthetic sweeps in _data.py
+
+Fixtures are session-scoped and parametrized, so pytest builds each sweep
+once and runs all benchmarks on it before moving to the next.
+"""
+import pytest
+from _data import K_RANGES, SWEEPS, create_sweep
+
+from StripeSankey import StripeSankeyDataProcessor
+
+
+def sweep_id(sweep):
+    n_samples, k_label = sweep
+    return f"{n_samples // 1000}k-{k_label}"
+
+
+def rounds_for(n_samples):
+    """Fewer rounds for the larger sweeps, so a full run stays in minutes"""
+    return 5 if n_samples <= 1_000 else 3 if n_samples <= 10_000 else 1
+
+
+@pytest.fixture(scope="session", params=SWEEPS, ids=sweep_id)
+def sweep(request):
+    n_samples, k_label = request.param
+    return {
+        "n_samples": n_samples,
+        "k_range": K_RANGES[k_label],
+        "sample_mc_data": create_sweep(n_samples, K_RANGES[k_label]),
+    }
+
+
+@pytest.fixture(scope="session")
+def processor():
+    return StripeSankeyDataProcessor(None, None, verbose=False)
+
+
+@pytest.fixture(scope="session")
+def categorized(sweep, processor):
+    return processor.categorize_sample_assignments(sweep["sample_mc_data"])
+
+
+@pytest.fixture(scope="session")
+def flow_tables(categorized, processor):
+    return processor.calculate_flow_tables(categorized)
+
+
+@pytest.fixture(scope="session")
+def sankey_data(sweep, categorized, flow_tables, processor):
+    """Name-based sankey data, as prepare_sankey_data returns it"""
+    return {
+        "nodes": {
+            name: node
+            for k_data in categorized.values()
+            for name, node in k_data["nodes"].items()
+        },
+        "flows": processor.flows_from_tables(flow_tables),
+        "k_range": list(sweep["k_range"]),
+    }
+
+
+@pytest.fixture(scope="session")
+def indexed_sankey_data(sankey_data):
+    from StripeSankey.schema import index_sankey_data
+
+    return index_sankey_data(sankey_data)
+
+
+@pytest.fixture
+def run(benchmark, sweep):
+    """benchmark.pedantic with a round count that suits the sweep size"""
+    def run(fn, *args, **kwargs):
+        return benchmark.pedantic(
+            fn,
+            args=args,
+            kwargs=kwargs,
+            rounds=rounds_for(sweep["n_samples"]),
+            iterations=1,
+        )
+    return run
@@ -0,0 +1,1836 @@
+// `d3` is defined by the vendored subset in js/d3.min.js, which scripts/build_frontend.py
+// prepends to this module
+
+// Representation levels in code order (matches StripeSankey.segments.LEVELS)
+const LEVELS = ['high', 'medium'];
+
+// Quiet period before a selection change is synced to the kernel (ms)
+const SELECTION_SYNC_DELAY = 150;
+
+// Console logging behind the debug trait; a no-op unless enabled, so renders skip all log formatting
+const logger = { enabled: false, log() {} };
+
+function setDebugLogging(enabled) {
+    logger.enabled = Boolean(enabled);
+    logger.log = logger.enabled ? console.log.bind(console, "[StripeSankey]") : () => {};
+}
+
+function render({ model, el }) {
+    el.innerHTML = '';
+
+    // Shown in place of the chart while there is no data to draw
+    const emptyMessage = d3.select(el)
+        .append("div")
+        .style("padding", "20px")
+        .style("text-align", "center")
+        .style("font-family", "sans-serif")
+        .style("display", "none")
+        .text("No data available. Please load your processed data first.");
+
+    // Chart container: with the canvas renderer, canvas layers are stacked under the SVG
+    const container = d3.select(el)
+        .append("div")
+        .style("position", "relative");
+
+    const canvasLayers = {};
+    ["flows", "hover", "tracing"].forEach(layer => {
+        canvasLayers[layer] = container.append("canvas")
+            .attr("class", `canvas-${layer}`)
+            .style("position", "absolute")
+            .style("left", "1px")
+            .style("top", "1px")
+            .style("pointer-events", "none")
+            .style("display", "none")
+            .node()
+            .getContext("2d");
+    });
+
+    // Create SVG
+    const svg = container
+        .append("svg")
+        .style("position", "relative")
+        .style("background", "#fafafa")
+        .style("border", "1px solid #ddd");
+
+    const margin = { top: 60, right: 150, bottom: 60, left: 100 }; // Increased right margin for tooltips
+
+    const g = svg.append("g")
+        .attr("transform", `translate(${margin.left}, ${margin.top})`);
+
+    // Persistent layers, back to front. Redraws join into these instead of rebuilding the SVG.
+    g.append("g").attr("class", "flows");
+    g.append("g").attr("class", "sample-tracing");
+    g.append("g").attr("class", "nodes");
+    g.append("g").attr("class", "k-labels");
+    g.append("g").attr("class", "legend");
+    const tooltip = createTooltip(g);
+
+    // Selection changes update the model right away; the kernel sync is debounced, so a burst of
+    // clicks costs at most one round-trip carrying only the flow key
+    let syncedSelection = model.get("selected_flow");
+    let settingSelection = false;
+    const saveSelection = debounce(() => {
+        const selection = model.get("selected_flow");
+        if (isSameSelection(selection, syncedSelection)) return;
+        syncedSelection = selection;
+        model.save_changes();
+    }, SELECTION_SYNC_DELAY);
+
+    function setSelectedFlow(selection) {
+        // Nothing to sync when the selection is unchanged, e.g. a background click with nothing selected
+        if (isSameSelection(model.get("selected_flow"), selection)) return;
+        settingSelection = true;
+        model.set("selected_flow", selection);
+        settingSelection = false;
+        saveSelection();
+    }
+
+    function toggleFlowSelection(flow) {
+        logger.log("Flow clicked:", flow);
+        setSelectedFlow(isFlowSelected(model.get("selected_flow"), flow) ? {} : flowSelection(flow));
+    }
+
+    // Tooltip updates from rapid pointer movement are applied once per frame
+    const updateTooltip = coalesceToFrame(show => {
+        if (show) show(); else tooltip.hide();
+    });
+
+    function tooltipBounds() {
+        const view = getCache();
+        return { width: view.chartWidth, height: view.chartHeight };
+    }
+
+    const interactions = {
+        toggleFlowSelection,
+        showFlowTooltip: (event, flow) => updateTooltip(() => showTooltip(tooltip, event, flow, tooltipBounds())),
+        showSegmentTooltip: (event, segment) => updateTooltip(() => showSegmentTooltip(
+            tooltip, event, segment.node, segment.level, segment.count, model.get("sankey_data"), model.get("metric_mode"), tooltipBounds()
+        )),
+        hideTooltip: () => updateTooltip(null)
+    };
+
+    // Add click handler to clear selection when clicking on background
+    g.on("click", function() {
+        setSelectedFlow({});
+    });
+
+    // Per-view memo of everything derived from sankey_data, width and height.
+    // Only those three traits invalidate it; mode and selection changes reuse it.
+    let cache = null;
+    let currentSelection = model.get("selected_flow");
+    let hoveredFlow = null;
+
+    // Flow samples fetched from Python when sankey_data is lazy
+    const samplePayloads = createSamplePayloadCache(model, 32);
+
+    function getCache() {
+        if (!cache) {
+            const width = model.get("width");
+            const height = model.get("height");
+            const chartWidth = width - margin.left - margin.right;
+            const chartHeight = height - margin.top - margin.bottom;
+            const data = model.get("sankey_data");
+
+            svg.attr("width", width).attr("height", height);
+            sizeCanvasLayers(canvasLayers, width, height, margin);
+
+            cache = { data, chartWidth, chartHeight, processedData: null, layout: null, metricScales: undefined };
+            if (data && data.nodes && Object.keys(data.nodes).length > 0) {
+                // Process data for visualization
+                cache.processedData = processDataForVisualization(data);
+                cache.layout = computeLayout(cache.processedData, chartWidth, chartHeight);
+            }
+        }
+        return cache;
+    }
+
+    function getMetricScales() {
+        // Calculate metric scales the first time metric mode needs them
+        const view = getCache();
+        if (view.metricScales === undefined) {
+            view.metricScales = calculateMetricScales(view.processedData, view.data, model.get("metric_config"));
+        }
+        return view.metricScales;
+    }
+
+    // The logger is shared by all views, so point it at this view's debug setting before drawing
+    function useDebugSetting() {
+        setDebugLogging(model.get("debug"));
+    }
+
+    function draw() {
+        useDebugSetting();
+        const view = getCache();
+
+        if (!view.processedData) {
+            emptyMessage.style("display", null);
+            svg.style("display", "none");
+            return;
+        }
+        emptyMessage.style("display", "none");
+        svg.style("display", null);
+
+        // Canvas renderer: flows and tracing go to the canvas layers, the SVG keeps nodes and labels
+        const canvas = getCanvas();
+        Object.values(canvasLayers).forEach(ctx => {
+            ctx.canvas.style.display = canvas ? null : "none";
+        });
+        svg.style("background", canvas ? "transparent" : "#fafafa");
+        hoveredFlow = null;
+        if (canvas) {
+            clearCanvasLayer(canvas.hover);
+            drawFlowsCanvas(canvas.flows, view.layout.drawableFlows);
+        }
+
+        currentSelection = model.get("selected_flow");
+        drawSankeyDiagram(g, view.layout, view.chartWidth, view.chartHeight, currentSelection, model, samplePayloads, canvas, interactions);
+        applyNodeColors();
+        requestSelectionSamples();
+    }
+
+    function getCanvas() {
+        return model.get("renderer") === "canvas" ? canvasLayers : null;
+    }
+
+    function setHoveredFlow(flow, event) {
+        // Canvas renderer: highlight the flow under the pointer on its own layer
+        if (flow === hoveredFlow) return;
+        hoveredFlow = flow;
+
+        tooltip.hide("flow");
+        clearCanvasLayer(canvasLayers.hover);
+        svg.style("cursor", flow ? "pointer" : null);
+
+        if (flow) {
+            if (!isFlowSelected(currentSelection, flow)) {
+                // 0.6 underneath + 0.5 on top composites to the SVG hover opacity of 0.8
+                strokeFlowCanvas(canvasLayers.hover, flow, "#888", flow.width, 0.5);
+            }
+            showTooltip(tooltip, event, flow, tooltipBounds());
+        }
+    }
+
+    function flowAtPointer(event) {
+        // Only the bare SVG background sits above the canvas flows; nodes and labels take precedence
+        const view = getCache();
+        if (!getCanvas() || !view.layout || event.target !== svg.node()) return null;
+
+        if (!view.layout.flowIndex) {
+            view.layout.flowIndex = buildFlowIndex(view.layout.drawableFlows, 24);
+        }
+        const box = svg.node().getBoundingClientRect();
+        return findFlowAt(
+            view.layout.flowIndex,
+            view.layout.drawableFlows,
+            event.clientX - box.left - margin.left,
+            event.clientY - box.top - margin.top
+        );
+    }
+
+    // Hit-test at most once per frame, for the latest pointer position
+    const hoverAtPointer = coalesceToFrame(event => {
+        if (getCanvas()) setHoveredFlow(flowAtPointer(event), event);
+    });
+
+    svg.on("mousemove.canvas", function(event) {
+        hoverAtPointer(event);
+    });
+
+    svg.on("mouseleave.canvas", function(event) {
+        hoverAtPointer.cancel();
+        if (getCanvas()) setHoveredFlow(null, event);
+    });
+
+    svg.on("click.canvas", function(event) {
+        const flow = flowAtPointer(event);
+        if (flow) {
+            event.stopPropagation();
+            toggleFlowSelection(flow);
+        }
+    });
+
+    function requestSelectionSamples() {
+        // Lazy data: fetch the selected flow's samples if they are not cached, then trace them
+        const view = getCache();
+        if (!view.layout || !view.layout.lazy) return;
+
+        const selection = currentSelection;
+        const flow = view.layout.flows.find(f => isFlowSelected(selection, f));
+        if (!flow || samplePayloads.get(flow)) return;
+
+        samplePayloads.load(flow).then(() => {
+            if (currentSelection !== selection || cache !== view) return;
+            useDebugSetting();
+            const { nodes, flows, kValues } = view.layout;
+            updateSampleTracing(g, view.layout, selection, nodes, flows, kValues, samplePayloads, getCanvas());
+        });
+    }
+
+    function applyNodeColors() {
+        useDebugSetting();
+        const view = getCache();
+        if (!view.layout) return;
+
+        const metricMode = model.get("metric_mode");
+        const metricScales = metricMode ? getMetricScales() : null;
+        styleNodes(g, view.layout, view.chartHeight, model.get("color_schemes"), view.data, metricMode, metricScales, model.get("metric_config"));
+    }
+
+    function invalidate() {
+        cache = null;
+        draw();
+    }
+
+    draw();
+
+    // Topology or size changed - recompute layout
+    model.on("change:sankey_data", () => {
+        samplePayloads.clear();
+        invalidate();
+    });
+    model.on("change:width", invalidate);
+    model.on("change:height", invalidate);
+    model.on("change:renderer", invalidate);
+
+    // Colouring changed - restyle nodes, K labels and legend in place
+    model.on("change:debug", useDebugSetting);
+    model.on("change:metric_mode", applyNodeColors);
+    model.on("change:metric_config", applyNodeColors);
+    model.on("change:color_schemes", applyNodeColors);
+
+    // Update on selected flow change - restyle only the flows whose state changed and redraw the tracing layer.
+    // Coalesced to one update per frame, however many changes arrive in between
+    const updateSelection = coalesceToFrame(() => {
+        useDebugSetting();
+        const view = getCache();
+        if (!view.layout) return;
+
+        const previousSelection = currentSelection;
+        currentSelection = model.get("selected_flow");
+
+        const changedFlows = g.select(".flows")
+            .selectAll("path.flow")
+            .filter(flow => isFlowSelected(previousSelection, flow) || isFlowSelected(currentSelection, flow));
+        styleFlows(changedFlows, currentSelection);
+
+        const { nodes, flows, kValues } = view.layout;
+        updateSampleTracing(g, view.layout, currentSelection, nodes, flows, kValues, samplePayloads, getCanvas());
+        requestSelectionSamples();
+    });
+    model.on("change:selected_flow", () => {
+        // Changes from Python are already in the kernel
+        if (!settingSelection) syncedSelection = model.get("selected_flow");
+        updateSelection();
+    });
+
+    return () => {
+        saveSelection.flush();
+        updateSelection.cancel();
+        updateTooltip.cancel();
+        hoverAtPointer.cancel();
+        samplePayloads.dispose();
+    };
+}
+
+function debounce(fn, wait) {
+    // Call fn once calls have stopped for wait ms; flush() runs a pending call now
+    let timer = null;
+    const debounced = () => {
+        clearTimeout(timer);
+        timer = setTimeout(debounced.flush, wait);
+    };
+    debounced.flush = () => {
+        if (timer === null) return;
+        clearTimeout(timer);
+        timer = null;
+        fn();
+    };
+    return debounced;
+}
+
+function coalesceToFrame(fn) {
+    // Run fn at most once per animation frame, with the arguments of the latest call
+    let frame = null;
+    let latestArgs = [];
+    const scheduled = (...args) => {
+        latestArgs = args;
+        if (frame === null) {
+            frame = requestAnimationFrame(() => {
+                frame = null;
+                fn(...latestArgs);
+            });
+        }
+    };
+    scheduled.cancel = () => {
+        if (frame !== null) cancelAnimationFrame(frame);
+        frame = null;
+    };
+    return scheduled;
+}
+
+function calculateMetricScales(processedData, rawData, metricConfig) {
+    logger.log("Calculating metric scales...");
+
+    const perplexityValues = [];
+    const coherenceValues = [];
+
+    // Extract metric values from all nodes
+    processedData.nodes.forEach(node => {
+        const nodeData = rawData.nodes[node.id];
+        if (nodeData) {
+            // Get perplexity from model_metrics
+            if (nodeData.model_metrics && nodeData.model_metrics.perplexity !== undefined) {
+                perplexityValues.push(nodeData.model_metrics.perplexity);
+            }
+
+            // Get coherence from mallet_diagnostics
+            if (nodeData.mallet_diagnostics && nodeData.mallet_diagnostics.coherence !== undefined) {
+                coherenceValues.push(nodeData.mallet_diagnostics.coherence);
+            }
+        }
+    });
+
+    if (logger.enabled) logger.log(`Found ${perplexityValues.length} perplexity values, ${coherenceValues.length} coherence values`);
+
+    if (perplexityValues.length === 0 || coherenceValues.length === 0) {
+        console.warn("Insufficient metric data for metric mode");
+        return null;
+    }
+
+    // Create scales
+    const perplexityExtent = d3.extent(perplexityValues);
+    const coherenceExtent = d3.extent(coherenceValues);
+
+    logger.log("Perplexity range:", perplexityExtent);
+    logger.log("Coherence range:", coherenceExtent);
+
+    // Perplexity: lower is better, so we invert the scale (low perplexity = high red intensity)
+    const perplexityScale = d3.scaleLinear()
+        .domain(perplexityExtent)
+        .range([1, 0]); // Inverted: low perplexity gets high value (more red)
+
+    // Coherence: higher is better (less negative), but values are negative
+    // More negative = worse, less negative = better
+    const coherenceScale = d3.scaleLinear()
+        .domain(coherenceExtent)
+        .range([0, 1]); // Less negative coherence gets high value (more blue)
+
+    return {
+        perplexity: perplexityScale,
+        coherence: coherenceScale,
+        perplexityExtent,
+        coherenceExtent
+    };
+}
+
+function getMetricColor(nodeId, rawData, metricScales, metricConfig) {
+    if (!metricScales) return "#666";
+
+    const nodeData = rawData.nodes[nodeId];
+    if (!nodeData) return "#666";
+
+    let perplexityValue = null;
+    let coherenceValue = null;
+
+    // Get perplexity
+    if (nodeData.model_metrics && nodeData.model_metrics.perplexity !== undefined) {
+        perplexityValue = nodeData.model_metrics.perplexity;
+    }
+
+    // Get coherence
+    if (nodeData.mallet_diagnostics && nodeData.mallet_diagnostics.coherence !== undefined) {
+        coherenceValue = nodeData.mallet_diagnostics.coherence;
+    }
+
+    // If missing either metric, return gray
+    if (perplexityValue === null || coherenceValue === null) {
+        return "#999";
+    }
+
+    // Calculate normalized scores (0-1)
+    const redIntensity = metricScales.perplexity(perplexityValue); // Low perplexity = high red
+    const blueIntensity = metricScales.coherence(coherenceValue); // High coherence = high blue
+
+    if (logger.enabled) logger.log(`${nodeId}: perp=${perplexityValue.toFixed(3)} (red=${redIntensity.toFixed(3)}), coh=${coherenceValue.toFixed(3)} (blue=${blueIntensity.toFixed(3)})`);
+
+    // Ensure minimum brightness to avoid too dark colors
+    const minBrightness = 0.2; // Minimum 20% brightness
+
+    // Calculate color components with minimum brightness
+    const red = Math.round(255 * Math.max(minBrightness, redIntensity * metricConfig.red_weight));
+    const blue = Math.round(255 * Math.max(minBrightness, blueIntensity * metricConfig.blue_weight));
+    const green = 0; // Pure red-blue spectrum
+
+    // Ensure values are in valid range
+    const clampedRed = Math.max(0, Math.min(255, red));
+    const clampedBlue = Math.max(0, Math.min(255, blue));
+    const clampedGreen = 0;
+
+    const finalColor = `rgb(${clampedRed}, ${clampedGreen}, ${clampedBlue})`;
+    if (logger.enabled) logger.log(`${nodeId}: Final color = ${finalColor}`);
+
+    return finalColor;
+}
+
+function drawMetricLegend(svg, metricScales, metricConfig, width, height, margin) {
+    const legend = svg.append("g")
+        .attr("class", "metric-legend")
+        .attr("transform", `translate(${margin.left}, ${height - margin.bottom + 10})`);
+
+    // Title
+    legend.append("text")
+        .attr("x", 0)
+        .attr("y", 0)
+        .style("font-size", "12px")
+        .style("font-weight", "bold")
+        .style("fill", "#333")
+        .text("Metric Mode: Perplexity (Red) × Coherence (Blue) = Quality (Purple)");
+
+    // Color gradient demonstration
+    const gradientWidth = 200;
+    const gradientHeight = 15;
+
+    // Create gradient definition
+    const defs = svg.append("defs");
+
+    const gradient = defs.append("linearGradient")
+        .attr("id", "metric-gradient")
+        .attr("x1", "0%")
+        .attr("x2", "100%")
+        .attr("y1", "0%")
+        .attr("y2", "0%");
+
+    // Add gradient stops to show the correct color mapping
+    const stops = [
+        { offset: "0%", color: "rgb(255, 0, 0)" },     // Pure red (high perplexity, low coherence)
+        { offset: "25%", color: "rgb(200, 0, 55)" },   // Red-purple (high perplexity, medium coherence)  
+        { offset: "50%", color: "rgb(128, 0, 128)" },  // Pure purple (medium perplexity, medium coherence)
+        { offset: "75%", color: "rgb(55, 0, 200)" },   // Blue-purple (low perplexity, high coherence)
+        { offset: "100%", color: "rgb(0, 0, 255)" }    // Pure blue (low perplexity, high coherence)
+    ];
+
+    stops.forEach(stop => {
+        gradient.append("stop")
+            .attr("offset", stop.offset)
+            .attr("stop-color", stop.color);
+    });
+
+    // Draw gradient bar
+    legend.append("rect")
+        .attr("x", 0)
+        .attr("y", 15)
+        .attr("width", gradientWidth)
+        .attr("height", gradientHeight)
+        .attr("fill", "url(#metric-gradient)")
+        .attr("stroke", "#333")
+        .attr("stroke-width", 1);
+
+    // Add labels with correct interpretation
+    legend.append("text")
+        .attr("x", 0)
+        .attr("y", 45)
+        .style("font-size", "10px")
+        .style("fill", "#d62728")
+        .text("Poor Quality");
+
+    legend.append("text")
+        .attr("x", gradientWidth/2)
+        .attr("y", 45)
+        .attr("text-anchor", "middle")
+        .style("font-size", "10px")
+        .style("fill", "#7f4f7f")
+        .text("Good Quality");
+
+    legend.append("text")
+        .attr("x", gradientWidth)
+        .attr("y", 45)
+        .attr("text-anchor", "end")
+        .style("font-size", "10px")
+        .style("fill", "#2f2fdf")
+        .text("Excellent Quality");
+
+    // Show current ranges with better formatting
+    legend.append("text")
+        .attr("x", gradientWidth + 20)
+        .attr("y", 20)
+        .style("font-size", "9px")
+        .style("fill", "#666")
+        .text(`Perplexity: ${metricScales.perplexityExtent[1].toFixed(2)} (poor) - ${metricScales.perplexityExtent[0].toFixed(2)} (good)`);
+
+    legend.append("text")
+        .attr("x", gradientWidth + 20)
+        .attr("y", 35)
+        .style("font-size", "9px")
+        .style("fill", "#666")
+        .text(`Coherence: ${metricScales.coherenceExtent[0].toFixed(2)} (poor) - ${metricScales.coherenceExtent[1].toFixed(2)} (good)`);
+}
+
+function processDataForVisualization(data) {
+    // Columnar data, as synced by the Python widget, is decoded straight into typed-array views
+    const nodes = [];
+    const nodeById = new Map();
+    const flows = [];
+    const kValues = data.k_range || [];
+    const sampleNames = data.sample_names || [];
+
+    // Node membership: CSR offsets into shared index arrays, viewed with subarray (no copies)
+    const nodeSamples = data.node_samples || {};
+    const highOffsets = typedArray(nodeSamples.high_offsets, Int32Array);
+    const highIndex = typedArray(nodeSamples.high_index, Int32Array);
+    const mediumOffsets = typedArray(nodeSamples.medium_offsets, Int32Array);
+    const mediumIndex = typedArray(nodeSamples.medium_index, Int32Array);
+
+    (data.node_ids || []).forEach((nodeName, i) => {
+        const node = createNode(
+            nodeName,
+            data.nodes[nodeName] || {},
+            highIndex.subarray(highOffsets[i], highOffsets[i + 1]),
+            mediumIndex.subarray(mediumOffsets[i], mediumOffsets[i + 1])
+        );
+        if (node) {
+            nodes.push(node);
+            nodeById.set(nodeName, node);
+        }
+    });
+
+    // Segment names are a small dictionary; parse each one once
+    const segments = data.segments || [];
+    const parsedSegments = segments.map(parseSegment);
+
+    const columns = data.flows || {};
+    const sourceSegment = typedArray(columns.source_segment, Int32Array);
+    const targetSegment = typedArray(columns.target_segment, Int32Array);
+    const sourceK = typedArray(columns.source_k, Int32Array);
+    const targetK = typedArray(columns.target_k, Int32Array);
+    const sampleCount = typedArray(columns.sample_count, Int32Array);
+    const averageProbability = typedArray(columns.average_probability, Float32Array);
+    const sampleOffsets = typedArray(columns.sample_offsets, Int32Array);
+    const sampleIndex = typedArray(columns.sample_index, Int32Array);
+    const sourceProb = typedArray(columns.source_prob, Float32Array);
+    const targetProb = typedArray(columns.target_prob, Float32Array);
+
+    for (let i = 0; i < (columns.count || 0); i++) {
+        const start = sampleOffsets[i];
+        const end = sampleOffsets[i + 1];
+
+        const flow = createFlow(
+            segments[sourceSegment[i]], parsedSegments[sourceSegment[i]],
+            segments[targetSegment[i]], parsedSegments[targetSegment[i]],
+            sourceK[i], targetK[i], sampleCount[i], averageProbability[i],
+            sampleIndex.subarray(start, end), sourceProb.subarray(start, end), targetProb.subarray(start, end)
+        );
+        // Position in the Python flow list, used to request lazy samples
+        flow.index = i;
+        flows.push(flow);
+    }
+
+    // Per-sample trajectory table precomputed in Python (sample x K typed arrays)
+    const trajectories = data.trajectories ? decodeTrajectories(data.trajectories) : null;
+
+    if (logger.enabled) logger.log(`Processed ${nodes.length} nodes and ${flows.length} flows`);
+    return { nodes, nodeById, flows, kValues, sampleNames, trajectories, lazy: !!data.lazy, flowFilter: data.flow_filter || {} };
+}
+
+function createNode(nodeName, nodeData, highSamples, mediumSamples) {
+    const match = nodeName.match(/K(\d+)_MC(\d+)/);
+    if (!match) return null;
+
+    return {
+        id: nodeName,
+        k: parseInt(match[1]),
+        mc: parseInt(match[2]),
+        highCount: nodeData.high_count || 0,
+        mediumCount: nodeData.medium_count || 0,
+        totalProbability: nodeData.total_probability || 0,
+        highSamples: highSamples,
+        mediumSamples: mediumSamples
+    };
+}
+
+function createFlow(source, sourceSegment, target, targetSegment, sourceK, targetK, sampleCount, averageProbability, sampleRows, sourceProbs, targetProbs) {
+    return {
+        source: source,
+        target: target,
+        sourceTopicId: sourceSegment.topicId,
+        sourceLevel: sourceSegment.level,
+        targetTopicId: targetSegment.topicId,
+        targetLevel: targetSegment.level,
+        sourceK: sourceK,
+        targetK: targetK,
+        sampleCount: sampleCount,
+        averageProbability: averageProbability,
+        // Samples as rows into the sample dictionary, with per-sample probabilities
+        sampleRows: sampleRows,
+        sourceProbs: sourceProbs,
+        targetProbs: targetProbs
+    };
+}
+
+function createSamplePayloadCache(model, limit) {
+    // LRU of flow sample payloads requested from Python, keyed by flowKey (Map order = recency)
+    const entries = new Map();
+    const pending = new Map();
+    const viewId = Math.random().toString(36).slice(2);
+    let nextRequest = 0;
+
+    function get(flow) {
+        const key = flowKey(flow);
+        const payload = entries.get(key);
+        if (payload) {
+            entries.delete(key);
+            entries.set(key, payload);
+        }
+        return payload || null;
+    }
+
+    function load(flow) {
+        const payload = get(flow);
+        if (payload) return Promise.resolve(payload);
+
+        const key = flowKey(flow);
+        for (const request of pending.values()) {
+            if (request.key === key) return request.promise;
+        }
+
+        // Replies reach every view of the model, so request ids are scoped to this view
+        const requestId = `${viewId}:${nextRequest++}`;
+        const request = { key };
+        request.promise = new Promise(resolve => { request.resolve = resolve; });
+        pending.set(requestId, request);
+
+        model.send({
+            type: "flow_samples",
+            request_id: requestId,
+            flow: flow.index,
+            source: flow.source,
+            target: flow.target,
+            source_k: flow.sourceK,
+            target_k: flow.targetK
+        });
+        return request.promise;
+    }
+
+    function onMessage(msg, buffers) {
+        if (!msg || msg.type !== "flow_samples") return;
+        const request = pending.get(msg.request_id);
+        if (!request) return; // another view's request, or one made before sankey_data changed
+        pending.delete(msg.request_id);
+
+        const payload = decodeFlowSamples(msg, buffers || []);
+        entries.set(request.key, payload);
+        while (entries.size > limit) {
+            entries.delete(entries.keys().next().value);
+        }
+        request.resolve(payload);
+    }
+
+    model.on("msg:custom", onMessage);
+
+    return {
+        get,
+        load,
+        clear: () => {
+            entries.clear();
+            pending.clear();
+        },
+        dispose: () => model.off("msg:custom", onMessage)
+    };
+}
+
+function decodeFlowSamples(msg, buffers) {
+    // Buffers: source_prob, target_prob, then the samples' trajectory rows (topic, level, probability)
+    const sampleNames = msg.sample_names || [];
+    const sourceProbs = typedArray(buffers[0], Float32Array);
+    const targetProbs = typedArray(buffers[1], Float32Array);
+
+    return {
+        sampleNames,
+        sourceProbs,
+        targetProbs,
+        // Rows follow sampleNames
+        trajectories: decodeTrajectories({
+            node_ids: msg.node_ids,
+            k_values: msg.k_values,
+            topic: buffers[2],
+            level: buffers[3],
+            probability: buffers[4]
+        })
+    };
+}
+
+function typedArray(buffer, Type) {
+    // View a synced binary buffer as a typed array, copying only if it is misaligned
+    if (!buffer) return new Type(0);
+    if (buffer instanceof ArrayBuffer) return new Type(buffer);
+    if (buffer.byteOffset % Type.BYTES_PER_ELEMENT === 0) {
+        return new Type(buffer.buffer, buffer.byteOffset, buffer.byteLength / Type.BYTES_PER_ELEMENT);
+    }
+    return new Type(buffer.buffer.slice(buffer.byteOffset, buffer.byteOffset + buffer.byteLength));
+}
+
+function decodeTrajectories(raw) {
+    // Rows follow the shared sample dictionary, columns follow k_values
+    return {
+        nodeIds: raw.node_ids || [],
+        kValues: raw.k_values || [],
+        topic: typedArray(raw.topic, Int32Array),
+        level: typedArray(raw.level, Int8Array),
+        probability: typedArray(raw.probability, Float32Array)
+    };
+}
+
+function gatherTrajectory(trajectories, row) {
+    // Read one sample's row of the trajectory table into { K: assignment }
+    const assignments = {};
+    const kCount = trajectories.kValues.length;
+    const offset = row * kCount;
+
+    for (let column = 0; column < kCount; column++) {
+        const topic = trajectories.topic[offset + column];
+        if (topic >= 0) {
+            assignments[trajectories.kValues[column]] = {
+                topicId: trajectories.nodeIds[topic],
+                level: LEVELS[trajectories.level[offset + column]],
+                probability: trajectories.probability[offset + column]
+            };
+        }
+    }
+    return assignments;
+}
+
+function parseSegment(segment) {
+    // "K{k}_MC{mc}_{level}" -> { topicId: "K{k}_MC{mc}", level }
+    const cut = segment.lastIndexOf('_');
+    const level = segment.slice(cut + 1);
+    if (cut > 0 && (level === 'high' || level === 'medium')) {
+        return { topicId: segment.slice(0, cut), level: level };
+    }
+    return { topicId: segment, level: 'medium' };
+}
+
+function computeLayout(data, width, height) {
+    const { nodes, nodeById, flows, kValues } = data;
+
+    // Flows arrive already pruned to min_flow_samples / top_n_flows by Python
+    const significantFlows = flows;
+    if (logger.enabled) logger.log(`Showing ${significantFlows.length} flows`);
+
+    if (nodes.length === 0) {
+        return { nodes, nodeById, flows: significantFlows, drawableFlows: [], kValues, kSpacing: 0, sampleNames: data.sampleNames, trajectories: data.trajectories, lazy: data.lazy, flowFilter: data.flowFilter };
+    }
+
+    // Calculate positions with barycenter optimization
+    const kSpacing = width / Math.max(1, kValues.length - 1);
+    const nodesByK = d3.group(nodes, d => d.k);
+    const kIndexByK = new Map(kValues.map((k, index) => [k, index]));
+
+    // Find max total count for scaling node heights
+    const maxTotalCount = d3.max(nodes, d => d.highCount + d.mediumCount) || 1;
+    const minNodeHeight = 20;
+    const maxNodeHeight = 120;
+
+    // Apply barycenter method for node ordering
+    const optimizedNodePositions = optimizeNodeOrder(nodes, significantFlows, kValues, nodesByK, height);
+
+    // Position nodes using optimized order
+    nodes.forEach(node => {
+        const kIndex = kIndexByK.has(node.k) ? kIndexByK.get(node.k) : -1;
+        node.x = kIndex * kSpacing;
+        node.y = optimizedNodePositions[node.id];
+
+        // Set node height based on total sample count (proportional scaling)
+        const totalSamples = node.highCount + node.mediumCount;
+        node.height = minNodeHeight + (totalSamples / maxTotalCount) * (maxNodeHeight - minNodeHeight);
+        node.segments = nodeSegments(node);
+    });
+
+    // Calculate flow width scaling
+    const maxFlowCount = d3.max(significantFlows, d => d.sampleCount) || 1;
+    const minFlowWidth = 2;
+    const maxFlowWidth = 25;
+
+    // Resolve endpoints and geometry once per flow; drawing only sets attributes
+    const drawableFlows = [];
+    significantFlows.forEach(flow => {
+        const sourceNode = nodeById.get(flow.sourceTopicId);
+        const targetNode = nodeById.get(flow.targetTopicId);
+
+        if (sourceNode && targetNode && flow.sampleCount > 0) {
+            // Proportional flow width scaling
+            flow.width = minFlowWidth + (flow.sampleCount / maxFlowCount) * (maxFlowWidth - minFlowWidth);
+
+            // Calculate connection points on the stacked bars
+            const sourceY = calculateSegmentY(sourceNode, flow.sourceLevel);
+            const targetY = calculateSegmentY(targetNode, flow.targetLevel);
+
+            // Create curved path; the endpoints are kept for canvas drawing and hit testing
+            flow.curve = [sourceNode.x + 15, sourceY, targetNode.x - 15, targetY];
+            flow.path = createCurvePath(...flow.curve);
+
+            drawableFlows.push(flow);
+        }
+    });
+
+    return { nodes, nodeById, flows: significantFlows, drawableFlows, kValues, kSpacing, sampleNames: data.sampleNames, trajectories: data.trajectories, lazy: data.lazy, flowFilter: data.flowFilter };
+}
+
+function drawSankeyDiagram(g, layout, width, height, selectedFlow, model, samplePayloads, canvas, interactions) {
+    const { nodes, flows, drawableFlows, kValues, kSpacing } = layout;
+
+    g.selectAll(".empty-message").remove();
+
+    if (nodes.length === 0) {
+        g.selectAll(".flows, .sample-tracing, .nodes, .k-labels, .legend").selectAll("*").remove();
+        g.append("text")
+            .attr("class", "empty-message")
+            .attr("x", width / 2)
+            .attr("y", height / 2)
+            .attr("text-anchor", "middle")
+            .style("font-size", "16px")
+            .style("fill", "#666")
+            .text("No nodes to display");
+        return;
+    }
+
+    // Draw flows first (behind nodes), keyed on source/target/K so redraws update paths in place.
+    // The canvas renderer draws them itself, so the SVG layer stays empty.
+    const flowPaths = g.select(".flows")
+        .selectAll("path.flow")
+        .data(canvas ? [] : drawableFlows, flowKey)
+        .join(enter => enter.append("path")
+            .attr("class", "flow")
+            .attr("fill", "none")
+            .style("cursor", "pointer")
+            .on("mouseover", function(event, flow) {
+                if (!isFlowSelected(model.get("selected_flow"), flow)) {
+                    d3.select(this).attr("opacity", 0.8);
+                }
+                interactions.showFlowTooltip(event, flow);
+            })
+            .on("mouseout", function(event, flow) {
+                if (!isFlowSelected(model.get("selected_flow"), flow)) {
+                    d3.select(this).attr("opacity", 0.6);
+                }
+                interactions.hideTooltip();
+            })
+            .on("click", function(event, flow) {
+                event.stopPropagation();
+                interactions.toggleFlowSelection(flow);
+            }))
+        .attr("d", flow => flow.path);
+
+    styleFlows(flowPaths, selectedFlow);
+
+    // Draw nodes as stacked bars, keyed on node id
+    const nodeGroups = g.select(".nodes")
+        .selectAll("g.node")
+        .data(nodes, node => node.id)
+        .join(enter => {
+            const nodeG = enter.append("g").attr("class", "node");
+
+            // Add node label (only MC number, no sample count)
+            nodeG.append("text")
+                .attr("class", "node-label")
+                .attr("x", 25)
+                .attr("dy", "0.35em")
+                .style("font-size", "11px")
+                .style("font-weight", "bold")
+                .style("fill", "#333")
+                .style("cursor", "pointer")
+                .on("click", function(event, node) {
+                    logger.log("Node clicked:", node);
+                });
+
+            return nodeG;
+        })
+        .attr("transform", node => `translate(${node.x}, ${node.y - node.height/2})`);
+
+    nodeGroups.select("text.node-label")
+        .attr("y", node => node.height / 2)
+        .text(node => `MC${node.mc}`);
+
+    nodeGroups.selectAll("rect.segment")
+        .data(node => node.segments, segment => segment.level)
+        .join(enter => enter.insert("rect", "text")
+            .attr("class", segment => `segment segment-${segment.node.id}-${segment.level}`)
+            .attr("x", -10)
+            .attr("width", 20)
+            .attr("stroke", "white")
+            .attr("stroke-width", 1)
+            .style("cursor", "pointer")
+            .on("mouseover", function(event, segment) {
+                d3.select(this).attr("opacity", 0.8);
+                interactions.showSegmentTooltip(event, segment);
+            })
+            .on("mouseout", function() {
+                d3.select(this).attr("opacity", 1);
+                interactions.hideTooltip();
+            }))
+        .attr("y", segment => segment.y)
+        .attr("height", segment => segment.height);
+
+    // Add K value labels at the top
+    g.select(".k-labels")
+        .selectAll("text")
+        .data(kValues, k => k)
+        .join(enter => enter.append("text")
+            .attr("y", -30)
+            .attr("text-anchor", "middle")
+            .style("font-size", "16px")
+            .style("font-weight", "bold")
+            .text(k => `K=${k}`))
+        .attr("x", (k, index) => index * kSpacing);
+
+    // Re-apply sample tracing for the current selection (clears stale tracing otherwise)
+    updateSampleTracing(g, layout, selectedFlow, nodes, flows, kValues, samplePayloads, canvas);
+}
+
+function flowSelection(flow) {
+    // selected_flow holds only the flow's key; its samples are resolved from the local flow data
+    return {
+        source: flow.source,
+        target: flow.target,
+        sourceK: flow.sourceK,
+        targetK: flow.targetK
+    };
+}
+
+function styleNodes(g, layout, height, colorSchemes, rawData, metricMode, metricScales, metricConfig) {
+    // Fill segments based on mode; geometry is left untouched
+    g.select(".nodes")
+        .selectAll("rect.segment")
+        .attr("fill", segment => {
+            // Determine base color based on mode
+            let baseColor;
+            if (metricMode && metricScales) {
+                baseColor = getMetricColor(segment.node.id, rawData, metricScales, metricConfig);
+            } else {
+                baseColor = colorSchemes[segment.node.k] || "#666";
+            }
+
+            // In metric mode, use uniform colors; in default mode, use darker/lighter
+            return segment.level === 'high' && !metricMode ? d3.color(baseColor).darker(0.8) : baseColor;
+        });
+
+    g.select(".k-labels")
+        .selectAll("text")
+        .style("fill", k => metricMode ? "#333" : (colorSchemes[k] || "#333"));
+
+    // Add legend in bottom-left corner to avoid overlap
+    drawLegend(g.select(".legend"), metricMode, layout.flows.length, layout.flowFilter, height);
+}
+
+function nodeSegments(node) {
+    // Calculate segment heights proportionally
+    const totalCount = node.highCount + node.mediumCount;
+    let highHeight = 0;
+    let mediumHeight = 0;
+
+    if (totalCount > 0) {
+        highHeight = (node.highCount / totalCount) * node.height;
+        mediumHeight = (node.mediumCount / totalCount) * node.height;
+    }
+
+    const segments = [];
+    if (highHeight > 0) {
+        segments.push({ node: node, level: 'high', count: node.highCount, y: 0, height: highHeight });
+    }
+    if (mediumHeight > 0) {
+        segments.push({ node: node, level: 'medium', count: node.mediumCount, y: highHeight, height: mediumHeight });
+    }
+    return segments;
+}
+
+function flowKey(flow) {
+    return `${flow.sourceK}:${flow.source}->${flow.targetK}:${flow.target}`;
+}
+
+function hasSelection(selectedFlow) {
+    return !!selectedFlow && Object.keys(selectedFlow).length > 0;
+}
+
+function isSameSelection(a, b) {
+    return hasSelection(a) ? isFlowSelected(a, b) : !hasSelection(b);
+}
+
+function isFlowSelected(selectedFlow, flow) {
+    return !!selectedFlow &&
+        selectedFlow.source === flow.source &&
+        selectedFlow.target === flow.target &&
+        selectedFlow.sourceK === flow.sourceK &&
+        selectedFlow.targetK === flow.targetK;
+}
+
+function styleFlows(flowPaths, selectedFlow) {
+    flowPaths
+        .attr("stroke", flow => isFlowSelected(selectedFlow, flow) ? "#ff6b35" : "#888")
+        .attr("stroke-width", flow => isFlowSelected(selectedFlow, flow) ? flow.width + 3 : flow.width)
+        .attr("opacity", flow => isFlowSelected(selectedFlow, flow) ? 1.0 : 0.6);
+}
+
+function sizeCanvasLayers(canvasLayers, width, height, margin) {
+    // Backing store at device resolution, drawing in chart coordinates like the SVG group
+    const ratio = window.devicePixelRatio || 1;
+    Object.values(canvasLayers).forEach(ctx => {
+        ctx.canvas.width = Math.round(width * ratio);
+        ctx.canvas.height = Math.round(height * ratio);
+        ctx.canvas.style.width = `${width}px`;
+        ctx.canvas.style.height = `${height}px`;
+        ctx.setTransform(ratio, 0, 0, ratio, margin.left * ratio, margin.top * ratio);
+    });
+}
+
+function clearCanvasLayer(ctx, background) {
+    ctx.save();
+    ctx.setTransform(1, 0, 0, 1, 0, 0);
+    ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);
+    if (background) {
+        ctx.fillStyle = background;
+        ctx.fillRect(0, 0, ctx.canvas.width, ctx.canvas.height);
+    }
+    ctx.restore();
+}
+
+function traceCurve(ctx, x1, y1, x2, y2) {
+    // Same curve as createCurvePath
+    const midX = (x1 + x2) / 2;
+    ctx.beginPath();
+    ctx.moveTo(x1, y1);
+    ctx.bezierCurveTo(midX, y1, midX, y2, x2, y2);
+}
+
+function strokeFlowCanvas(ctx, flow, color, width, opacity) {
+    ctx.strokeStyle = color;
+    ctx.lineWidth = width;
+    ctx.globalAlpha = opacity;
+    traceCurve(ctx, ...flow.curve);
+    ctx.stroke();
+    ctx.globalAlpha = 1;
+}
+
+function drawFlowsCanvas(ctx, flows) {
+    // Base layer: every flow in its unselected style, redrawn only when the layout changes
+    clearCanvasLayer(ctx, "#fafafa");
+    ctx.strokeStyle = "#888";
+    ctx.globalAlpha = 0.6;
+    flows.forEach(flow => {
+        ctx.lineWidth = flow.width;
+        traceCurve(ctx, ...flow.curve);
+        ctx.stroke();
+    });
+    ctx.globalAlpha = 1;
+}
+
+function flowPolyline(flow, steps) {
+    // Sample the flow's cubic curve into steps + 1 points [x0, y0, x1, y1, ...]
+    const [x1, y1, x2, y2] = flow.curve;
+    const midX = (x1 + x2) / 2;
+    const points = new Float32Array((steps + 1) * 2);
+
+    for (let i = 0; i <= steps; i++) {
+        const t = i / steps;
+        const u = 1 - t;
+        const a = u * u * u, b = 3 * u * u * t, c = 3 * u * t * t, d = t * t * t;
+        points[2 * i] = a * x1 + (b + c) * midX + d * x2;
+        points[2 * i + 1] = (a + b) * y1 + (c + d) * y2;
+    }
+    return points;
+}
+
+function buildFlowIndex(flows, cellSize) {
+    // Uniform grid over chart coordinates: cell -> indices of the flows whose stroke crosses it
+    const cells = new Map();
+    const polylines = flows.map(flow => flowPolyline(flow, 16));
+
+    flows.forEach((flow, flowIndex) => {
+        const points = polylines[flowIndex];
+        const pad = flow.width / 2 + 2;
+
+        for (let i = 0; i + 3 < points.length; i += 2) {
+            const cx0 = Math.floor((Math.min(points[i], points[i + 2]) - pad) / cellSize);
+            const cx1 = Math.floor((Math.max(points[i], points[i + 2]) + pad) / cellSize);
+            const cy0 = Math.floor((Math.min(points[i + 1], points[i + 3]) - pad) / cellSize);
+            const cy1 = Math.floor((Math.max(points[i + 1], points[i + 3]) + pad) / cellSize);
+
+            for (let cx = cx0; cx <= cx1; cx++) {
+                for (let cy = cy0; cy <= cy1; cy++) {
+                    const key = cellKey(cx, cy);
+                    const bucket = cells.get(key);
+                    if (!bucket) {
+                        cells.set(key, [flowIndex]);
+                    } else if (bucket[bucket.length - 1] !== flowIndex) {
+                        bucket.push(flowIndex);
+                    }
+                }
+            }
+        }
+    });
+
+    return { cellSize, cells, polylines };
+}
+
+function cellKey(cx, cy) {
+    return (cx + 32768) * 65536 + (cy + 32768);
+}
+
+function findFlowAt(index, flows, x, y) {
+    // Topmost (last drawn) flow whose stroke covers the point, as SVG hit testing would pick
+    const bucket = index.cells.get(cellKey(Math.floor(x / index.cellSize), Math.floor(y / index.cellSize)));
+    if (!bucket) return null;
+
+    let hit = -1;
+    bucket.forEach(flowIndex => {
+        if (flowIndex > hit && distanceToPolyline(index.polylines[flowIndex], x, y) <= flows[flowIndex].width / 2 + 2) {
+            hit = flowIndex;
+        }
+    });
+    return hit >= 0 ? flows[hit] : null;
+}
+
+function distanceToPolyline(points, x, y) {
+    let best = Infinity;
+    for (let i = 0; i + 3 < points.length; i += 2) {
+        const ax = points[i], ay = points[i + 1];
+        const dx = points[i + 2] - ax, dy = points[i + 3] - ay;
+        const lengthSq = dx * dx + dy * dy;
+        const t = lengthSq > 0 ? Math.max(0, Math.min(1, ((x - ax) * dx + (y - ay) * dy) / lengthSq)) : 0;
+        const px = ax + t * dx - x, py = ay + t * dy - y;
+        best = Math.min(best, px * px + py * py);
+    }
+    return Math.sqrt(best);
+}
+
+function drawLegend(legend, metricMode, flowCount, flowFilter, height) {
+    legend.attr("transform", `translate(20, ${height - 120})`); // Bottom-left positioning
+    legend.selectAll("*").remove();
+
+    if (!metricMode) {
+        // Default mode: show high/medium representation legend
+        legend.append("rect")
+            .attr("width", 15)
+            .attr("height", 10)
+            .attr("fill", "#333");
+
+        legend.append("text")
+            .attr("x", 20)
+            .attr("y", 8)
+            .style("font-size", "10px")
+            .text("High (≥0.67)");
+
+        legend.append("rect")
+            .attr("y", 15)
+            .attr("width", 15)
+            .attr("height", 10)
+            .attr("fill", "#666");
+
+        legend.append("text")
+            .attr("x", 20)
+            .attr("y", 23)
+            .style("font-size", "10px")
+            .text("Medium (0.33-0.66)");
+    } else {
+        // Metric mode: show metric interpretation legend
+        legend.append("text")
+            .attr("x", 0)
+            .attr("y", 8)
+            .style("font-size", "10px")
+            .style("font-weight", "bold")
+            .style("fill", "#333")
+            .text("Metric Mode Active");
+
+        legend.append("text")
+            .attr("x", 0)
+            .attr("y", 20)
+            .style("font-size", "9px")
+            .style("fill", "#d62728")
+            .text("Red: Low Perplexity");
+
+        legend.append("text")
+            .attr("x", 0)
+            .attr("y", 32)
+            .style("font-size", "9px")
+            .style("fill", "#2ca02c")
+            .text("Blue: High Coherence");
+
+        legend.append("text")
+            .attr("x", 0)
+            .attr("y", 44)
+            .style("font-size", "9px")
+            .style("fill", "#7f4f7f")
+            .text("Purple: Optimal Topics");
+
+        // Add note about uniform colors in metric mode
+        legend.append("text")
+            .attr("x", 0)
+            .attr("y", 56)
+            .style("font-size", "8px")
+            .style("fill", "#888")
+            .text("(Uniform colors - quality by hue)");
+    }
+
+    // Add flow info
+    legend.append("text")
+        .attr("x", 0)
+        .attr("y", metricMode ? 72 : 40)
+        .style("font-size", "9px")
+        .style("fill", "#666")
+        .text(`Flows: ${flowCount} (≥${flowFilter.min_samples} samples${flowFilter.top_n != null ? `, top ${flowFilter.top_n} per K pair` : ""})`);
+
+    legend.append("text")
+        .attr("x", 0)
+        .attr("y", metricMode ? 84 : 52)
+        .style("font-size", "9px")
+        .style("fill", "#888")
+        .text("Barycenter optimized");
+
+    legend.append("text")
+        .attr("x", 0)
+        .attr("y", metricMode ? 96 : 64)
+        .style("font-size", "9px")
+        .style("fill", "#ff6b35")
+        .text("Click flows to trace samples");
+}
+
+function updateSampleTracing(g, data, selectedFlow, nodes, flows, kValues, samplePayloads, canvas) {
+    // Clear previous tracing
+    g.selectAll(".sample-tracing").selectAll("*").remove();
+    g.selectAll(".sample-count-badge").remove();
+    g.selectAll(".sample-info-panel").remove();
+
+    // Reset segment highlighting - set previously traced segments back to white borders
+    g.selectAll(".nodes rect.traced")
+        .classed("traced", false)
+        .attr("stroke", "white")
+        .attr("stroke-width", 1);
+
+    // Canvas renderer: the selected flow and the trajectories share one layer, redrawn per selection
+    if (canvas) {
+        clearCanvasLayer(canvas.tracing);
+        const selected = (data.drawableFlows || []).find(flow => isFlowSelected(selectedFlow, flow));
+        if (selected) {
+            strokeFlowCanvas(canvas.tracing, selected, "#ff6b35", selected.width + 3, 1.0);
+        }
+    }
+
+    if (!hasSelection(selectedFlow)) {
+        return;
+    }
+
+    logger.log("Tracing samples for selected flow:", selectedFlow);
+
+    // Lazy data traces from the flow's fetched payload; nothing to draw until it arrives
+    const payload = data.lazy ? samplePayloads && samplePayloads.get(selectedFlow) : null;
+    if (data.lazy && !payload) {
+        return;
+    }
+
+    // A payload's trajectory rows follow its samples; otherwise the flow's sample rows
+    // index the shared trajectory table directly
+    const flow = data.lazy ? null : flows.find(f => isFlowSelected(selectedFlow, f));
+    const rows = flow ? flow.sampleRows : null;
+    const trajectories = data.lazy ? payload.trajectories : data.trajectories;
+    const sampleIds = data.lazy ? payload.sampleNames : Array.from(rows || [], row => data.sampleNames[row]);
+
+    const tracingGroup = g.select(".sample-tracing");
+
+    if (logger.enabled) logger.log(`Tracing ${sampleIds.length} samples:`, sampleIds.slice(0, 3));
+
+    if (sampleIds.length === 0) {
+        showSampleInfo(g, selectedFlow, 0);
+        return;
+    }
+
+    // Find where these samples are assigned across all K values
+    const sampleAssignments = traceSampleAssignments(sampleIds, rows, trajectories);
+    const segmentCounts = countSampleSegments(sampleAssignments);
+
+    // Draw sample trajectory paths with count-based line weights
+    const marks = trajectoryMarks(sampleAssignments, segmentCounts, data.nodeById, selectedFlow, data);
+    if (canvas) {
+        drawTrajectoriesCanvas(canvas.tracing, marks);
+    } else {
+        drawSampleTrajectories(tracingGroup, marks);
+    }
+
+    // Highlight segments containing these samples
+    highlightSampleSegments(g, segmentCounts, data.nodeById);
+
+    // Show detailed sample info panel
+    showSampleInfo(g, selectedFlow, sampleIds.length);
+}
+
+function traceSampleAssignments(sampleIds, rows, trajectories) {
+    // Gather each sample's row of the trajectory table; rows[i] is sampleIds[i]'s row,
+    // or rows is null when the table holds exactly these samples in order
+    logger.log("Tracing sample assignments across K values...");
+
+    const assignments = {};
+    sampleIds.forEach((sampleId, position) => {
+        assignments[sampleId] = gatherTrajectory(trajectories, rows ? rows[position] : position);
+    });
+
+    if (logger.enabled) logger.log("Sample assignments traced:", Object.keys(assignments).length, "samples");
+    return assignments;
+}
+
+function countSampleSegments(sampleAssignments) {
+    // Count how many traced samples sit in each segment (keyed "topicId-level")
+    const segmentCounts = new Map();
+
+    Object.values(sampleAssignments).forEach(assignments => {
+        Object.values(assignments).forEach(assignment => {
+            const segmentKey = `${assignment.topicId}-${assignment.level}`;
+            const segment = segmentCounts.get(segmentKey);
+            if (segment) {
+                segment.count += 1;
+            } else {
+                segmentCounts.set(segmentKey, { topicId: assignment.topicId, level: assignment.level, count: 1 });
+            }
+        });
+    });
+
+    return segmentCounts;
+}
+
+function trajectoryMarks(sampleAssignments, segmentCounts, nodeById, selectedFlow, data) {
+    // Geometry of the trajectory lines and dots, shared by the SVG and canvas renderers
+    const sampleIds = Object.keys(sampleAssignments);
+    const lines = [];
+    const dots = [];
+
+    if (logger.enabled) logger.log(`Drawing trajectories for ${sampleIds.length} samples`);
+
+    // Dots are sized relative to the busiest traced segment
+    let maxSampleCount = 0;
+    segmentCounts.forEach(segment => {
+        maxSampleCount = Math.max(maxSampleCount, segment.count);
+    });
+
+    // Use the SAME scaling as the main sankey diagram flows
+    const allFlows = data.flows;
+    const maxFlowCount = d3.max(allFlows, d => d.sampleCount) || 1;
+    const minFlowWidth = 2;
+    const maxFlowWidth = 25;
+
+    // Function to get line weight using same formula as sankey flows
+    const getSankeyLineWeight = (count) => {
+        return minFlowWidth + (count / maxFlowCount) * (maxFlowWidth - minFlowWidth);
+    };
+
+    sampleIds.forEach((sampleId, sampleIndex) => {
+        const assignments = sampleAssignments[sampleId];
+        const pathPoints = [];
+
+        // Convert assignments to path points with coordinates
+        Object.entries(assignments).forEach(([k, assignment]) => {
+            const node = nodeById.get(assignment.topicId);
+            if (node) {
+                const segmentY = calculateSegmentY(node, assignment.level);
+                const segment = segmentCounts.get(`${assignment.topicId}-${assignment.level}`);
+                pathPoints.push({
+                    k: parseInt(k),
+                    x: node.x,
+                    y: segmentY,
+                    topicId: assignment.topicId,
+                    level: assignment.level,
+                    probability: assignment.probability,
+                    sampleCount: segment ? segment.count : 0
+                });
+            }
+        });
+
+        // Sort path points by K value
+        pathPoints.sort((a, b) => a.k - b.k);
+
+        if (pathPoints.length >= 2) {
+            // Draw trajectory ONLY between adjacent K values
+            for (let i = 0; i < pathPoints.length - 1; i++) {
+                const start = pathPoints[i];
+                const end = pathPoints[i + 1];
+
+                // CRITICAL FIX: Only draw lines between adjacent K values
+                if (end.k - start.k === 1) {
+                    // Check if this segment is the selected flow
+                    const isSelectedSegment = 
+                        start.k === selectedFlow.sourceK && 
+                        end.k === selectedFlow.targetK;
+
+                    // Calculate line weight using same scaling as sankey diagram
+                    // Use the minimum sample count as the "flow capacity" between segments
+                    const trajectoryFlowCount = Math.min(start.sampleCount, end.sampleCount);
+                    const lineWeight = getSankeyLineWeight(trajectoryFlowCount);
+
+                    lines.push({
+                        curve: [start.x + 15, start.y, end.x - 15, end.y],
+                        width: isSelectedSegment ? lineWeight + 2 : lineWeight,
+                        opacity: isSelectedSegment ? 0.9 : 0.7, // Slightly higher opacity for solid lines
+                        className: `trajectory-${sampleIndex}-${i}`
+                    });
+                }
+                // If end.k - start.k > 1, we skip drawing the line (gap in trajectory)
+            }
+
+            // Add dots at each assignment point (size proportional to sample count)
+            pathPoints.forEach((point, pointIndex) => {
+                // Scale dot size based on sample count using sankey proportions
+                const baseDotSize = 3;
+                const maxDotSize = 8; // Slightly larger to match sankey scale
+                const dotRadius = maxSampleCount > 0 ? 
+                    baseDotSize + (point.sampleCount / maxSampleCount) * (maxDotSize - baseDotSize) : 
+                    baseDotSize;
+
+                dots.push({
+                    x: point.x,
+                    y: point.y,
+                    r: dotRadius,
+                    className: `trajectory-point-${sampleIndex}-${pointIndex}`
+                });
+            });
+        }
+    });
+
+    return { lines, dots };
+}
+
+function drawSampleTrajectories(tracingGroup, marks) {
+    const trajectoryColor = "#ff6b35";
+
+    // ALL trajectory lines are now SOLID (no dashed lines)
+    marks.lines.forEach(line => {
+        tracingGroup.append("path")
+            .attr("d", createCurvePath(...line.curve))
+            .attr("stroke", trajectoryColor)
+            .attr("stroke-width", line.width)
+            .attr("stroke-dasharray", "none") // Always solid lines
+            .attr("fill", "none")
+            .attr("opacity", line.opacity)
+            .attr("class", line.className)
+            .style("pointer-events", "none");
+    });
+
+    marks.dots.forEach(dot => {
+        tracingGroup.append("circle")
+            .attr("cx", dot.x)
+            .attr("cy", dot.y)
+            .attr("r", dot.r)
+            .attr("fill", trajectoryColor)
+            .attr("stroke", "white")
+            .attr("stroke-width", 1.5)
+            .attr("opacity", 0.8)
+            .attr("class", dot.className)
+            .style("pointer-events", "none");
+    });
+
+    logger.log("Sample trajectories drawn with sankey-matching line weights (all solid)");
+}
+
+function drawTrajectoriesCanvas(ctx, marks) {
+    const trajectoryColor = "#ff6b35";
+
+    ctx.strokeStyle = trajectoryColor;
+    marks.lines.forEach(line => {
+        ctx.lineWidth = line.width;
+        ctx.globalAlpha = line.opacity;
+        traceCurve(ctx, ...line.curve);
+        ctx.stroke();
+    });
+
+    ctx.fillStyle = trajectoryColor;
+    ctx.strokeStyle = "white";
+    ctx.lineWidth = 1.5;
+    ctx.globalAlpha = 0.8;
+    marks.dots.forEach(dot => {
+        ctx.beginPath();
+        ctx.arc(dot.x, dot.y, dot.r, 0, 2 * Math.PI);
+        ctx.fill();
+        ctx.stroke();
+    });
+    ctx.globalAlpha = 1;
+}
+
+function highlightSampleSegments(g, segmentCounts, nodeById) {
+    const highlightColor = "#ff6b35";
+
+    logger.log("Segment counts:", segmentCounts);
+
+    // Highlight the traced segments with an orange border in one pass over the segment rects
+    g.select(".nodes")
+        .selectAll("rect.segment")
+        .filter(segment => segmentCounts.has(`${segment.node.id}-${segment.level}`))
+        .classed("traced", true)
+        .attr("stroke", highlightColor)
+        .attr("stroke-width", 3);
+
+    // Add count badges
+    segmentCounts.forEach(({ topicId, level, count }) => {
+        // Find the node to position the count badge
+        const node = nodeById.get(topicId);
+        if (node) {
+            const badgeY = level === 'high' ? 
+                node.y - node.height/2 + 15 : 
+                node.y + node.height/2 - 15;
+
+            // Add count badge
+            g.append("circle")
+                .attr("cx", node.x + 35)
+                .attr("cy", badgeY)
+                .attr("r", 10)
+                .attr("fill", highlightColor)
+                .attr("stroke", "white")
+                .attr("stroke-width", 2)
+                .attr("class", "sample-count-badge");
+
+            g.append("text")
+                .attr("x", node.x + 35)
+                .attr("y", badgeY)
+                .attr("text-anchor", "middle")
+                .attr("dy", "0.35em")
+                .style("font-size", "9px")
+                .style("font-weight", "bold")
+                .style("fill", "white")
+                .text(count)
+                .attr("class", "sample-count-badge");
+        }
+    });
+}
+
+function optimizeNodeOrder(nodes, flows, kValues, nodesByK, height) {
+    logger.log("Applying barycenter method for node ordering...");
+
+    const nodePositions = {};
+
+    // Step 1: Initialize first K level with evenly spaced positions
+    const firstK = kValues[0];
+    const firstKNodes = nodesByK.get(firstK) || [];
+    const spacing = height / Math.max(1, firstKNodes.length + 1);
+
+    firstKNodes.forEach((node, index) => {
+        nodePositions[node.id] = (index + 1) * spacing;
+    });
+
+    if (logger.enabled) logger.log(`Initialized K=${firstK} with ${firstKNodes.length} nodes`);
+
+    // Index flows by target topic once, so each node only visits its own incoming flows
+    const incomingFlows = d3.group(flows, flow => flow.targetTopicId);
+
+    // Step 2: For each subsequent K level, calculate barycenter positions
+    for (let kIndex = 1; kIndex < kValues.length; kIndex++) {
+        const currentK = kValues[kIndex];
+        const prevK = kValues[kIndex - 1];
+        const currentKNodes = nodesByK.get(currentK) || [];
+
+        if (logger.enabled) logger.log(`Optimizing K=${currentK} (${currentKNodes.length} nodes)`);
+
+        // Calculate barycenter for each node in current K level
+        const barycenterData = currentKNodes.map(node => {
+            const nodeId = node.id;
+            let weightedSum = 0;
+            let totalWeight = 0;
+
+            // Find all flows coming TO this node from previous K level
+            (incomingFlows.get(nodeId) || []).forEach(flow => {
+                if (flow.sourceK === prevK) {
+                    const sourcePosition = nodePositions[flow.sourceTopicId];
+                    if (sourcePosition !== undefined) {
+                        const weight = flow.sampleCount;
+                        weightedSum += sourcePosition * weight;
+                        totalWeight += weight;
+                    }
+                }
+            });
+
+            // Calculate barycenter (weighted average position)
+            const barycenter = totalWeight > 0 ? weightedSum / totalWeight : height / 2;
+
+            return {
+                node: node,
+                barycenter: barycenter,
+                totalWeight: totalWeight
+            };
+        });
+
+        // Sort nodes by barycenter value
+        barycenterData.sort((a, b) => a.barycenter - b.barycenter);
+
+        // Assign new positions based on sorted order
+        const newSpacing = height / Math.max(1, barycenterData.length + 1);
+        barycenterData.forEach((data, index) => {
+            nodePositions[data.node.id] = (index + 1) * newSpacing;
+        });
+    }
+
+    logger.log("Barycenter optimization complete!");
+    return nodePositions;
+}
+
+function calculateSegmentY(node, level) {
+    const totalCount = node.highCount + node.mediumCount;
+    if (totalCount === 0) return node.y;
+
+    const highHeight = (node.highCount / totalCount) * node.height;
+
+    if (level === 'high') {
+        return node.y - node.height/2 + highHeight/2;
+    } else {
+        return node.y - node.height/2 + highHeight + (node.height - highHeight)/2;
+    }
+}
+
+function createCurvePath(x1, y1, x2, y2) {
+    const midX = (x1 + x2) / 2;
+    return `M ${x1} ${y1} C ${midX} ${y1} ${midX} ${y2} ${x2} ${y2}`;
+}
+
+function createTooltip(g) {
+    // One tooltip group per view, reused for every hover and hidden in between
+    const group = g.append("g")
+        .attr("class", "tooltip")
+        .style("display", "none");
+
+    const rect = group.append("rect")
+        .attr("fill", "white")
+        .attr("stroke", "black")
+        .attr("rx", 3)
+        .attr("opacity", 0.9);
+
+    // What the tooltip currently describes ("flow" or "segment"), so one hover source can't hide another's
+    let shownKind = null;
+
+    function show(kind, lines, x, y, width, height) {
+        shownKind = kind;
+        rect.attr("x", x)
+            .attr("y", y)
+            .attr("width", width)
+            .attr("height", height);
+
+        group.selectAll("text")
+            .data(lines)
+            .join(enter => enter.append("text")
+                .style("font-size", "10px")
+                .style("fill", "black"))
+            .attr("x", x + 5)
+            .attr("y", (line, i) => y + 15 + i * 12)
+            .text(line => line);
+
+        // Keep above the badges and info panel appended after the tooltip was created
+        group.style("display", null).raise();
+    }
+
+    function hide(kind) {
+        if (shownKind === null || (kind && kind !== shownKind)) return;
+        shownKind = null;
+        group.style("display", "none");
+    }
+
+    return { show, hide };
+}
+
+function placeTooltip(event, width, height, offsetY, bounds) {
+    // Position above the pointer, kept inside the cached chart dimensions (no layout reads)
+    let tooltipX = event.layerX || 0;
+    let tooltipY = (event.layerY || 0) - offsetY;
+
+    // Adjust X position if tooltip would go off the right edge
+    if (tooltipX + width > bounds.width) {
+        tooltipX = bounds.width - width - 10;
+    }
+
+    // Adjust Y position if tooltip would go off the top edge
+    if (tooltipY < 0) {
+        tooltipY = (event.layerY || 0) + 20; // Show below cursor instead
+    }
+
+    // ... or off the bottom edge
+    if (tooltipY + height > bounds.height) {
+        tooltipY = Math.max(0, bounds.height - height);
+    }
+
+    return [tooltipX, tooltipY];
+}
+
+function showTooltip(tooltip, event, flow, bounds) {
+    const lines = [`${flow.sampleCount} samples`, `${flow.source} → ${flow.target}`];
+
+    const tooltipWidth = 160;
+    const tooltipHeight = 35;
+    const [tooltipX, tooltipY] = placeTooltip(event, tooltipWidth, tooltipHeight, 40, bounds);
+
+    tooltip.show("flow", lines, tooltipX, tooltipY, tooltipWidth, tooltipHeight);
+}
+
+function showSampleInfo(g, selectedFlow, sampleCount) {
+    const infoPanel = g.append("g").attr("class", "sample-info-panel");
+
+    // Background panel
+    infoPanel.append("rect")
+        .attr("x", 10)
+        .attr("y", 10)
+        .attr("width", 200)
+        .attr("height", 60)
+        .attr("fill", "white")
+        .attr("stroke", "#ff6b35")
+        .attr("stroke-width", 2)
+        .attr("rx", 5)
+        .attr("opacity", 0.95);
+
+    // Title
+    infoPanel.append("text")
+        .attr("x", 20)
+        .attr("y", 30)
+        .style("font-size", "12px")
+        .style("font-weight", "bold")
+        .style("fill", "#ff6b35")
+        .text(`Selected: ${sampleCount} Samples`);
+
+    // Flow info
+    infoPanel.append("text")
+        .attr("x", 20)
+        .attr("y", 45)
+        .style("font-size", "10px")
+        .style("fill", "#333")
+        .text(`${selectedFlow.source} → ${selectedFlow.target}`);
+
+    // Instructions
+    infoPanel.append("text")
+        .attr("x", 20)
+        .attr("y", 58)
+        .style("font-size", "9px")
+        .style("fill", "#666")
+        .text("Click flow again or background to clear");
+}
+
+function showSegmentTooltip(tooltip, event, node, level, count, rawData, metricMode, bounds) {
+    const levelText = level === 'high' ? 'High (≥0.67)' : 'Medium (0.33-0.66)';
+    let tooltipLines = [`${node.id}`, levelText, `${count} samples`];
+
+    // Add metric information if in metric mode
+    if (metricMode && rawData && rawData.nodes[node.id]) {
+        const nodeData = rawData.nodes[node.id];
+
+        if (nodeData.model_metrics && nodeData.model_metrics.perplexity !== undefined) {
+            tooltipLines.push(`Perplexity: ${nodeData.model_metrics.perplexity.toFixed(3)}`);
+        }
+
+        if (nodeData.mallet_diagnostics && nodeData.mallet_diagnostics.coherence !== undefined) {
+            tooltipLines.push(`Coherence: ${nodeData.mallet_diagnostics.coherence.toFixed(3)}`);
+        }
+    }
+
+    // Top features from the MALLET diagnostics, if they were integrated
+    const topWords = rawData && rawData.nodes[node.id] && rawData.nodes[node.id].top_words;
+    if (topWords && topWords.length) {
+        tooltipLines.push("Top features:");
+        topWords.slice(0, 5).forEach(([word, prob]) => {
+            tooltipLines.push(`· ${word} (${(prob || 0).toFixed(3)})`);
+        });
+    }
+
+    const tooltipHeight = tooltipLines.length * 12 + 10;
+    const tooltipWidth = Math.max(140, Math.max(...tooltipLines.map(line => line.length * 6 + 10)));
+
+    const [tooltipX, tooltipY] = placeTooltip(event, tooltipWidth, tooltipHeight, tooltipHeight + 10, bounds);
+
+    tooltip.show("segment", tooltipLines, tooltipX, tooltipY, tooltipWidth, tooltipHeight);
+}
+
+export default { render };
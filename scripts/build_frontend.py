@@ -0,0 +1,35 @@
+"""
+Build the widget's frontend files into StripeSankey/static
+
+js/widget.js (with the vendored d3 subset prepended) and js/widget.css are
+minified into static/widget.js and static/widget.css, which widget.py
+loads. Rerun after editing anything in js/:
+
+    pip install rjsmin rcssmin
+    python scripts/build_frontend.py
+"""
+import pathlib
+
+import rcssmin
+import rjsmin
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+SOURCE = ROOT / "js"
+STATIC = ROOT / "StripeSankey" / "static"
+
+
+def build():
+    # d3 comes first so the widget module can use the `d3` it defines
+    d3 = (SOURCE / "d3.min.js").read_text()
+    outputs = {
+        "widget.js": d3 + rjsmin.jsmin((SOURCE / "widget.js").read_text()) + "\n",
+        "widget.css": rcssmin.cssmin((SOURCE / "widget.css").read_text()) + "\n",
+    }
+    for name, contents in outputs.items():
+        (STATIC / name).write_text(contents)
+    return list(outputs)
+
+
+if __name__ == "__main__":
+    for name in build():
+        print(f"{name} ({(STATIC / name).stat().st_size:,} bytes)")
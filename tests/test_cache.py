@@ -0,0 +1,199 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import StripeSankey.processor
+from StripeSankey import StripeSankeyDataProcessor
+from StripeSankey.cache import SweepCache
+
+
+@pytest.fixture
+def sweep_folder(tmp_path):
+    """Two tiny sample-MC files, K=2 and K=3"""
+    folder = tmp_path / "SampleProbabilities_wide"
+    folder.mkdir()
+    for k in (2, 3):
+        rows = [f"MC{topic},{1 / k:.3f},{1 / k:.3f}" for topic in range(k)]
+        text = "\n".join([",s1,s2"] + rows) + "\n"
+        (folder / f"DirichletComponentProbabilities_{k}.csv").write_text(text)
+    return folder
+
+
+@pytest.fixture
+def metrics_files(tmp_path):
+    """MALLET diagnostics for K=2 and K=3, and a perplexity CSV"""
+    folder = tmp_path / "Diagnosis"
+    folder.mkdir()
+    for k in (2, 3):
+        topics = "".join(
+            f'<topic id="{topic}" tokens="{10 * k + topic}" coherence="-{k}.5">'
+            f'<word rank="1" prob="0.4">w{k}{topic}</word>'
+            f'<word rank="2" prob="0.1">v{k}{topic}</word></topic>'
+            for topic in range(k)
+        )
+        (folder / f"mallet.diagnostics.{k}.xml").write_text(
+            f"<model>{topics}</model>"
+        )
+    perplexity = tmp_path / "metrics.csv"
+    perplexity.write_text("Num_MCs,Perplexity\n2,1.5\n3,1.25\n")
+    return str(folder), str(perplexity)
+
+
+@pytest.fixture
+def processor(sweep_folder):
+    return StripeSankeyDataProcessor(
+        str(sweep_folder), None, k_range=range(2, 4), verbose=False
+    )
+
+
+def cached_processor(sweep_folder, tmp_path):
+    return StripeSankeyDataProcessor(
+        str(sweep_folder),
+        None,
+        k_range=range(2, 4),
+        verbose=False,
+        cache_dir=str(tmp_path / "cache"),
+    )
+
+
+def fail(*args, **kwargs):
+    raise AssertionError("source files parsed on a warm load")
+
+
+def test_key_is_stable(processor):
+    assert processor.cache_key() == processor.cache_key()
+
+
+def test_key_changes_with_mtime(processor, sweep_folder):
+    key = processor.cache_key()
+    path = sweep_folder / "DirichletComponentProbabilities_2.csv"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert processor.cache_key() != key
+
+
+def test_key_changes_with_size(processor, sweep_folder):
+    key = processor.cache_key()
+    path = sweep_folder / "DirichletComponentProbabilities_3.csv"
+    stat = path.stat()
+    with open(path, "a") as f:
+        f.write("\n")
+    # Keep the mtime, so only the size differs
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert processor.cache_key() != key
+
+
+@pytest.mark.parametrize("threshold", ["high_threshold", "medium_threshold"])
+def test_key_changes_with_thresholds(processor, threshold):
+    key = processor.cache_key()
+    setattr(processor, threshold, getattr(processor, threshold) + 0.01)
+    assert processor.cache_key() != key
+
+
+def test_key_changes_with_files(processor, sweep_folder):
+    key = processor.cache_key()
+    processor.k_range = range(2, 3)
+    assert processor.cache_key() != key
+    (sweep_folder / "DirichletComponentProbabilities_4.csv").write_text(",s1\n")
+    processor.k_range = range(2, 5)
+    assert processor.cache_key() != key
+
+
+def test_save_and_load(tmp_path):
+    cache = SweepCache(str(tmp_path / "cache"))
+    tables = {
+        "K2": {
+            "probabilities": np.arange(6, dtype=np.float64).reshape(2, 3),
+            "sample_names": np.array(["a", "b", "c"], dtype=object),
+        }
+    }
+    assert cache.load("key") is None
+
+    cache.save("key", tables, meta={"k_values": [2]})
+    loaded, meta = cache.load("key")
+
+    assert meta == {"k_values": [2]}
+    np.testing.assert_array_equal(
+        loaded["K2"]["probabilities"], tables["K2"]["probabilities"]
+    )
+    assert loaded["K2"]["sample_names"].tolist() == ["a", "b", "c"]
+
+
+def test_save_keeps_an_existing_entry(tmp_path):
+    cache = SweepCache(str(tmp_path / "cache"))
+    cache.save("key", {"K2": {"values": np.zeros(3)}}, meta={"run": 1})
+    loaded, _ = cache.load("key")
+
+    # Saving the key again must not pull the entry out from under open memmaps
+    path = cache.save("key", {"K2": {"values": np.ones(3)}}, meta={"run": 2})
+
+    assert path == cache.entry_path("key")
+    assert cache.load("key")[1] == {"run": 1}
+    np.testing.assert_array_equal(loaded["K2"]["values"], np.zeros(3))
+    assert os.listdir(cache.directory) == ["key"]
+
+
+def test_concurrent_saves(tmp_path):
+    cache = SweepCache(str(tmp_path / "cache"))
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def save(i):
+        barrier.wait()
+        try:
+            cache.save("key", {"K2": {"values": np.full(1000, i)}}, meta={"run": i})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    tables, meta = cache.load("key")
+    np.testing.assert_array_equal(tables["K2"]["values"], np.full(1000, meta["run"]))
+    assert os.listdir(cache.directory) == ["key"]
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_warm_prepare_matches_cold(sweep_folder, tmp_path, monkeypatch, indexed):
+    cold = cached_processor(sweep_folder, tmp_path).prepare_sankey_data(indexed)
+
+    monkeypatch.setattr(StripeSankey.processor, "read_csv_files", fail)
+    warm = cached_processor(sweep_folder, tmp_path).prepare_sankey_data(indexed)
+
+    assert warm[0] == cold[0]
+
+
+def test_warm_metrics_match_cold(sweep_folder, metrics_files, tmp_path, monkeypatch):
+    def integrate():
+        processor = cached_processor(sweep_folder, tmp_path)
+        sankey_data, _ = processor.prepare_sankey_data()
+        processor.integrate_all_model_data(sankey_data, *metrics_files, top_words=2)
+        return sankey_data["nodes"]
+
+    cold = integrate()
+    assert cold["K3_MC1"]["mallet_diagnostics"]["tokens"] == 31
+    assert cold["K3_MC1"]["top_words"] == [("w31", 0.4), ("v31", 0.1)]
+    assert cold["K3_MC1"]["model_metrics"]["perplexity"] == 1.25
+
+    monkeypatch.setattr(StripeSankey.processor, "load_mallet_diagnostics", fail)
+    monkeypatch.setattr(StripeSankey.processor, "load_perplexity", fail)
+    assert integrate() == cold
+
+
+def test_metrics_key_changes_with_files(sweep_folder, metrics_files, tmp_path):
+    mallet_folder, _ = metrics_files
+    processor = cached_processor(sweep_folder, tmp_path)
+    processor.load_all_mallet_diagnostics(mallet_folder)
+
+    path = os.path.join(mallet_folder, "mallet.diagnostics.2.xml")
+    with open(path, "w") as f:
+        f.write('<model><topic id="0" tokens="99"/></model>')
+
+    df = processor.load_all_mallet_diagnostics(mallet_folder)
+    assert df["tokens"].tolist() == [99, 30, 31, 32]
@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+import pytest
+
+from StripeSankey.columnar import encode_sankey_data, select_flows
+from StripeSankey.schema import index_sankey_data, is_indexed, node_members
+
+
+def flow(source, target, samples, average=0.5):
+    return {
+        "source_segment": source,
+        "target_segment": target,
+        "source_k": int(source[1]),
+        "target_k": int(target[1]),
+        "sample_count": len(samples),
+        "average_probability": average,
+        "samples": [
+            {"sample": name, "source_prob": sp, "target_prob": tp}
+            for name, sp, tp in samples
+        ],
+    }
+
+
+@pytest.fixture
+def sankey_data():
+    return {
+        "k_range": [2, 3],
+        "nodes": {
+            "K2_MC0": {
+                "high_count": 2,
+                "high_samples": [["a", 0.9], ["b", 0.8]],
+                "medium_samples": [],
+            },
+            # Plain names: probabilities unknown
+            "K3_MC0": {"high_count": 1, "high_samples": ["a"], "medium_samples": ["c"]},
+            "K3_MC1": {"high_count": 0},
+        },
+        "flows": [
+            flow("K2_MC0_high", "K3_MC0_high", [("a", 0.9, 0.7), ("b", 0.8, 0.6)]),
+            flow("K2_MC0_high", "K3_MC1_medium", [("c", 0.7, 0.4)], average=0.25),
+        ],
+    }
+
+
+def column(view, dtype):
+    """A synced buffer as an array, checking it has the expected item size"""
+    assert isinstance(view, memoryview)
+    assert view.itemsize == np.dtype(dtype).itemsize
+    return np.frombuffer(view, dtype=dtype).tolist()
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_encode_sankey_data(sankey_data, indexed):
+    if indexed:
+        sankey_data = index_sankey_data(sankey_data)
+    wire = encode_sankey_data(sankey_data, min_flow_samples=0)
+    names = wire["sample_names"]
+
+    assert wire["format"] == "columnar"
+    assert "lazy" not in wire
+    assert wire["k_range"] == [2, 3]
+    assert wire["node_ids"] == ["K2_MC0", "K3_MC0", "K3_MC1"]
+    assert wire["nodes"]["K2_MC0"] == {"high_count": 2}
+
+    flows = wire["flows"]
+    assert flows["count"] == 2
+    assert wire["segments"] == ["K2_MC0_high", "K3_MC0_high", "K3_MC1_medium"]
+    assert column(flows["source_segment"], "<i4") == [0, 0]
+    assert column(flows["target_segment"], "<i4") == [1, 2]
+    assert column(flows["source_k"], "<i4") == [2, 2]
+    assert column(flows["target_k"], "<i4") == [3, 3]
+    assert column(flows["sample_count"], "<i4") == [2, 1]
+    assert column(flows["average_probability"], "<f4") == [0.5, 0.25]
+    assert column(flows["sample_offsets"], "<i4") == [0, 2, 3]
+    assert [names[row] for row in column(flows["sample_index"], "<i4")] == [
+        "a", "b", "c",
+    ]
+    assert column(flows["source_prob"], "<f4") == pytest.approx([0.9, 0.8, 0.7])
+    assert column(flows["target_prob"], "<f4") == pytest.approx([0.7, 0.6, 0.4])
+
+    node_samples = wire["node_samples"]
+    assert column(node_samples["high_offsets"], "<i4") == [0, 2, 3, 3]
+    assert column(node_samples["medium_offsets"], "<i4") == [0, 0, 1, 1]
+    assert [names[row] for row in column(node_samples["high_index"], "<i4")] == [
+        "a", "b", "a",
+    ]
+    assert [names[row] for row in column(node_samples["medium_index"], "<i4")] == [
+        "c",
+    ]
+    high_prob = column(node_samples["high_prob"], "<f4")
+    assert high_prob[:2] == pytest.approx([0.9, 0.8])
+    assert math.isnan(high_prob[2])
+
+    # One trajectory row per sample name, one column per K
+    trajectories = wire["trajectories"]
+    assert "sample_names" not in trajectories
+    assert trajectories["k_values"] == [2, 3]
+    assert len(column(trajectories["topic"], "<i4")) == len(names) * 2
+    assert len(column(trajectories["level"], "i1")) == len(names) * 2
+    assert len(column(trajectories["probability"], "<f4")) == len(names) * 2
+
+
+def test_schemas_encode_alike(sankey_data):
+    named = encode_sankey_data(sankey_data, min_flow_samples=0)
+    indexed = encode_sankey_data(index_sankey_data(sankey_data), min_flow_samples=0)
+
+    def samples(wire, rows_key, group):
+        rows = np.frombuffer(wire[group][rows_key], dtype="<i4")
+        return [wire["sample_names"][row] for row in rows]
+
+    assert samples(named, "sample_index", "flows") == samples(
+        indexed, "sample_index", "flows"
+    )
+    for level in ("high", "medium"):
+        key = f"{level}_index"
+        assert samples(named, key, "node_samples") == samples(
+            indexed, key, "node_samples"
+        )
+
+
+def test_without_samples(sankey_data):
+    wire = encode_sankey_data(sankey_data, min_flow_samples=2, include_samples=False)
+
+    assert wire["lazy"] is True
+    assert wire["sample_names"] == []
+    assert wire["flow_filter"] == {"min_samples": 2, "top_n": None}
+    assert "node_samples" not in wire
+    assert "trajectories" not in wire
+    assert sorted(wire["flows"]) == [
+        "average_probability", "count", "sample_count", "source_k",
+        "source_segment", "target_k", "target_segment",
+    ]
+    assert wire["flows"]["count"] == 1
+    assert column(wire["flows"]["sample_count"], "<i4") == [2]
+    assert wire["nodes"]["K3_MC0"] == {"high_count": 1}
+
+
+def test_select_flows():
+    flows = [
+        {"source_k": 2, "target_k": 3, "sample_count": 5, "id": "a"},
+        {"source_k": 2, "target_k": 3, "sample_count": 20, "id": "b"},
+        {"source_k": 3, "target_k": 4, "sample_count": 12, "id": "c"},
+        {"source_k": 2, "target_k": 3, "sample_count": 12, "id": "d"},
+        {"source_k": 2, "target_k": 3, "sample_count": 12, "id": "e"},
+        {"source_k": 3, "target_k": 4, "sample_count": None, "id": "f"},
+        {"source_k": 3, "target_k": 4, "sample_count": 3, "id": "g"},
+    ]
+
+    def ids(selected):
+        return [flow["id"] for flow in selected]
+
+    assert ids(select_flows(flows)) == ["b", "c", "d", "e"]
+    assert ids(select_flows(flows, min_flow_samples=0)) == list("abcdefg")
+    # Largest per K pair, in the original order; on a tie the earlier flow wins
+    assert ids(select_flows(flows, min_flow_samples=0, top_n_flows=2)) == [
+        "b", "c", "d", "g",
+    ]
+    assert ids(select_flows(flows, min_flow_samples=0, top_n_flows=0)) == []
+
+
+def test_unknown_probabilities_round_trip(sankey_data):
+    indexed = index_sankey_data(sankey_data)
+    node = indexed["nodes"]["K3_MC0"]
+
+    assert is_indexed(indexed)
+    assert index_sankey_data(indexed) is indexed
+    # Unknown probabilities are stored as None (valid JSON) and read back as NaN
+    assert node["high_probs"] == [None]
+    assert node["medium_probs"] == [None]
+    rows, probs = node_members(node, "high")
+    assert [indexed["sample_names"][row] for row in rows] == ["a"]
+    assert math.isnan(probs[0])
+
+    samples, probs = node_members(sankey_data["nodes"]["K3_MC0"], "high")
+    assert samples == ["a"] and math.isnan(probs[0])
+    assert node_members(indexed["nodes"]["K2_MC0"], "high") == ([0, 1], [0.9, 0.8])
+    assert node_members(indexed["nodes"]["K3_MC1"], "high") == ([], [])
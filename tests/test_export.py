@@ -0,0 +1,108 @@
+import gzip
+import importlib
+import json
+import sys
+
+import numpy as np
+import pytest
+
+import StripeSankey.export
+
+
+@pytest.fixture(params=["orjson", "json"])
+def export(request, monkeypatch):
+    """The export module with orjson, and reloaded without it (stdlib fallback)"""
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        yield StripeSankey.export
+        return
+
+    with monkeypatch.context() as m:
+        m.setitem(sys.modules, "orjson", None)
+        module = importlib.reload(StripeSankey.export)
+    assert module.orjson is None
+    yield module
+    importlib.reload(StripeSankey.export)
+
+
+def sankey_data():
+    return {
+        "nodes": {
+            "K2_MC0": {
+                "high_count": np.int64(3),
+                "total_probability": np.float64(1.75),
+                "high_samples": np.array([0, 2, 5], dtype=np.int32),
+                "high_probs": np.array([0.7, 0.1, 0.9], dtype=np.float32),
+                "flags": [np.bool_(True), None],
+            },
+        },
+        "flows": [
+            {"source_k": np.int32(2), "source_probs": np.zeros((2, 2))},
+        ],
+        "k_range": np.arange(2, 5),
+        "by_k": {2: {3: "deeper int keys"}},
+        3: "top-level int key",
+    }
+
+
+EXPECTED = {
+    "nodes": {
+        "K2_MC0": {
+            "high_count": 3,
+            "total_probability": 1.75,
+            "high_samples": [0, 2, 5],
+            "high_probs": [0.7, 0.1, 0.9],
+            "flags": [True, None],
+        },
+    },
+    "flows": [{"source_k": 2, "source_probs": [[0.0, 0.0], [0.0, 0.0]]}],
+    "k_range": [2, 3, 4],
+    "by_k": {"2": {"3": "deeper int keys"}},
+    "3": "top-level int key",
+}
+
+
+@pytest.mark.parametrize("suffix", [".json", ".json.gz"])
+def test_round_trip(export, tmp_path, suffix):
+    path = str(tmp_path / f"sankey_data{suffix}")
+
+    size = export.dump_sankey_data(sankey_data(), path)
+
+    assert export.load_sankey_data(path) == EXPECTED
+    opener = gzip.open if suffix == ".json.gz" else open
+    with opener(path, "rb") as f:
+        text = f.read()
+    assert size == len(text)
+    assert json.loads(text) == EXPECTED
+
+
+def test_streamed_writes(export, tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "WRITE_BUFFER_SIZE", 8)
+    path = str(tmp_path / "sankey_data.json")
+
+    export.dump_sankey_data(sankey_data(), path)
+
+    assert export.load_sankey_data(path) == EXPECTED
+
+
+def test_unknown_compression(export, tmp_path):
+    with pytest.raises(ValueError, match="Unknown compression"):
+        export.dump_sankey_data({}, str(tmp_path / "out.json"), compression="lz4")
+
+
+def test_unserializable(export):
+    with pytest.raises(TypeError):
+        export.encode_json({"value": object()})
+
+
+def test_encoders_agree(monkeypatch):
+    pytest.importorskip("orjson")
+    fast = StripeSankey.export.encode_json(sankey_data())
+
+    with monkeypatch.context() as m:
+        m.setitem(sys.modules, "orjson", None)
+        fallback = importlib.reload(StripeSankey.export).encode_json
+    try:
+        assert fallback(sankey_data()) == fast
+    finally:
+        importlib.reload(StripeSankey.export)
@@ -0,0 +1,100 @@
+import pytest
+
+from StripeSankey.mallet import (
+    DIAGNOSTIC_FIELDS,
+    load_mallet_diagnostics,
+    mallet_diagnostics_files,
+    parse_mallet_diagnostics,
+)
+
+DIAGNOSTICS = """<?xml version="1.0" encoding="UTF-8"?>
+<model>
+<topic id="0" tokens="120.0" document_entropy="2.5" word-length="5.5"
+       coherence="-80.25" uniform_dist="3.1" corpus_dist="1.2" eff_num_words="40.0"
+       token-doc-diff="0.01" rank_1_docs="0.3" allocation_ratio="0.2"
+       allocation_count="0.4" exclusivity="0.6">
+<word rank="2" prob="0.2">beta</word>
+<word rank="1" prob="0.3">al&amp;pha
+</word>
+<word rank="3" prob="0.1">gamma</word>
+</topic>
+<topic id="x" tokens="5.0">
+<word rank="1" prob="0.9">skipped</word>
+</topic>
+<topic id="1" tokens="80.0">
+<word rank="first" prob="0.5">unranked</word>
+<word rank="1" prob="0.4">delta</word>
+</topic>
+</model>
+"""
+
+
+@pytest.fixture
+def diagnostics_file(tmp_path):
+    path = tmp_path / "mallet.diagnostics.3.xml"
+    path.write_text(DIAGNOSTICS)
+    return str(path)
+
+
+def test_attributes(diagnostics_file):
+    with pytest.warns(UserWarning, match="Could not parse topic 'x'"):
+        records = parse_mallet_diagnostics(diagnostics_file)
+
+    assert records["topic_id"].tolist() == [0, 1]
+    assert records["tokens"].tolist() == [120.0, 80.0]
+    assert records["word_length"][0] == 5.5
+    assert records["token_doc_diff"][0] == 0.01
+    # Missing attributes read as 0.0
+    for name, _ in DIAGNOSTIC_FIELDS:
+        if name != "tokens":
+            assert records[name][1] == 0.0
+    assert "top_words" not in records.dtype.names
+
+
+def test_top_words(diagnostics_file):
+    with pytest.warns(UserWarning) as record:
+        records = parse_mallet_diagnostics(diagnostics_file, top_words=2)
+
+    messages = [str(w.message) for w in record]
+    assert any("Could not parse word rank 'first'" in m for m in messages)
+    # Ranks above top_words are dropped, the rest keep file order; text is
+    # joined across entity chunks and stripped
+    assert records["top_words"].tolist() == [
+        [("beta", 0.2), ("al&pha", 0.3)],
+        [("delta", 0.4)],
+    ]
+
+
+def test_mallet_diagnostics_files(tmp_path):
+    for name in ("mallet.diagnostics.10.xml", "mallet.diagnostics.2.xml",
+                 "mallet.diagnostics.x.xml", "notes.txt"):
+        (tmp_path / name).write_text("")
+
+    assert list(mallet_diagnostics_files(str(tmp_path))) == [2, 10]
+
+
+@pytest.mark.filterwarnings("ignore:Could not parse")
+@pytest.mark.parametrize("processes", [False, True])
+def test_load_mallet_diagnostics(tmp_path, diagnostics_file, processes):
+    broken = tmp_path / "mallet.diagnostics.4.xml"
+    broken.write_text("<model><topic id='0'>")
+    paths = {3: diagnostics_file, 4: str(broken)}
+
+    with pytest.warns(UserWarning, match="Skipping .*mallet.diagnostics.4.xml"):
+        df = load_mallet_diagnostics(paths, processes=processes, top_words=1)
+
+    assert df["global_topic_id"].tolist() == ["K3_MC0", "K3_MC1"]
+    assert df["k_value"].tolist() == [3, 3]
+    assert df["source_file"].tolist() == ["mallet.diagnostics.3.xml"] * 2
+    assert df["top_words"].tolist() == [[("al&pha", 0.3)], [("delta", 0.4)]]
+    assert list(df.columns) == (
+        ["global_topic_id", "k_value", "topic_id"]
+        + [name for name, _ in DIAGNOSTIC_FIELDS]
+        + ["top_words", "source_file"]
+    )
+
+
+def test_load_no_files():
+    df = load_mallet_diagnostics({})
+    assert df.empty
+    assert "global_topic_id" in df.columns
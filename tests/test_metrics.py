@@ -0,0 +1,115 @@
+import math
+
+import pandas as pd
+import pytest
+
+from StripeSankey.metrics import (
+    attach_topic_metrics,
+    join_topic_metrics,
+    load_perplexity,
+    topic_keys,
+)
+
+TOPIC_IDS = ["K2_MC0", "K2_MC1", "K3_MC2", "K4_MC0", "K2_MC1_high", "other"]
+
+
+@pytest.fixture
+def diagnostics():
+    return pd.DataFrame({
+        "global_topic_id": ["K2_MC0", "K2_MC1", "K3_MC2", "K3_MC2"],
+        "k_value": [2, 2, 3, 3],
+        "topic_id": [0, 1, 2, 2],
+        "tokens": [10.0, 20.0, 30.0, 35.0],
+        "coherence": [-1.0, -2.0, -3.0, -3.5],
+        "top_words": [[("a", 0.5)], [("b", 0.4)], [("c", 0.3)], [("d", 0.2)]],
+        "source_file": ["mallet.diagnostics.2.xml"] * 2
+        + ["mallet.diagnostics.3.xml"] * 2,
+    })
+
+
+@pytest.fixture
+def perplexity(tmp_path):
+    path = tmp_path / "metrics.csv"
+    path.write_text(
+        "Num_MCs,Perplexity,Coherence\n"
+        "2,1.5,0.1\n"
+        "3,1.4,0.2\n"
+        "3,1.25,0.3\n"
+        "5,,0.4\n"
+    )
+    return load_perplexity(str(path))
+
+
+def test_topic_keys():
+    keys = topic_keys(TOPIC_IDS)
+
+    assert keys["topic_id"].tolist() == TOPIC_IDS
+    assert keys["k_value"].tolist() == [2, 2, 3, 4, -1, -1]
+    assert keys["topic_index"].tolist() == [0, 1, 2, 0, -1, -1]
+
+
+def test_load_perplexity(perplexity, tmp_path):
+    # Duplicate K rows: the last one wins; rows without a perplexity are dropped
+    assert perplexity["k_value"].tolist() == [2, 3]
+    assert perplexity["perplexity"].tolist() == [1.5, 1.25]
+
+    path = tmp_path / "no_perplexity.csv"
+    path.write_text("Num_MCs,Coherence\n2,0.1\n")
+    with pytest.raises(KeyError, match="Perplexity"):
+        load_perplexity(str(path))
+
+
+def test_join_topic_metrics(diagnostics, perplexity):
+    table = join_topic_metrics(TOPIC_IDS, diagnostics, perplexity)
+
+    assert table["topic_id"].tolist() == TOPIC_IDS
+    assert table["has_diagnostics"].tolist() == [
+        True, True, True, False, False, False,
+    ]
+    assert table["has_perplexity"].tolist() == [
+        True, True, True, False, False, False,
+    ]
+    # Duplicate diagnostics rows: the last one wins
+    assert table["tokens"].tolist()[:3] == [10.0, 20.0, 35.0]
+    assert all(math.isnan(value) for value in table["tokens"].tolist()[3:])
+    assert table["perplexity"].tolist()[:3] == [1.5, 1.5, 1.25]
+    assert "global_topic_id" not in table
+    assert "source_file" not in table
+
+
+def test_join_without_sources():
+    table = join_topic_metrics(["K2_MC0"])
+
+    assert list(table.columns) == ["topic_id", "k_value", "topic_index"]
+
+
+def test_attach_topic_metrics(diagnostics, perplexity):
+    nodes = {topic_id: {} for topic_id in TOPIC_IDS}
+    nodes["K2_MC0"]["model_metrics"] = {"coherence": 0.9}
+    table = join_topic_metrics(TOPIC_IDS, diagnostics, perplexity)
+
+    counts = attach_topic_metrics(nodes, table)
+
+    assert counts == {"mallet_diagnostics": 3, "top_words": 3, "model_metrics": 3}
+    assert nodes["K3_MC2"]["mallet_diagnostics"] == {
+        "tokens": 35.0,
+        "coherence": -3.5,
+    }
+    assert nodes["K3_MC2"]["top_words"] == [("d", 0.2)]
+    # Perplexity is merged into existing model metrics
+    assert nodes["K2_MC0"]["model_metrics"] == {
+        "coherence": 0.9,
+        "perplexity": 1.5,
+        "k_value": 2,
+    }
+    # Unmatched nodes are left alone
+    for topic_id in ("K4_MC0", "K2_MC1_high", "other"):
+        assert nodes[topic_id] == {}
+
+
+def test_attach_perplexity_only(perplexity):
+    nodes = {topic_id: {} for topic_id in TOPIC_IDS}
+    table = join_topic_metrics(TOPIC_IDS, perplexity=perplexity)
+
+    assert attach_topic_metrics(nodes, table) == {"model_metrics": 3}
+    assert "mallet_diagnostics" not in nodes["K2_MC0"]
@@ -0,0 +1,214 @@
+"""
+StripeSankeyDataProcessor against the original notebook implementation
+
+The expected values below are what the notebook's processor produced for
+SWEEP (same thresholds, 0.67 / 0.33). Flow and sample order differ between
+the two implementations, so flows are compared by segment pair and samples
+as sorted lists.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from StripeSankey import StripeSankeyDataProcessor
+from StripeSankey.processor import categorize_topic_matrix
+from StripeSankey.schema import flow_members, node_members
+
+SAMPLES = ["s1", "s2", "s3", "s4", "s5", "s6"]
+
+# {k: topics x samples}; includes values exactly at both thresholds, ties
+# (the first topic wins), and samples below the medium threshold at K=4
+SWEEP = {
+    2: [[0.67, 0.33, 0.5, 0.9, 0.6, 0.669],
+        [0.33, 0.67, 0.5, 0.1, 0.4, 0.331]],
+    3: [[0.7, 0.32, 0.329, 0.3, 0.1, 0.33],
+        [0.2, 0.34, 0.329, 0.3, 0.1, 0.33],
+        [0.1, 0.34, 0.342, 0.4, 0.8, 0.34]],
+    4: [[0.67, 0.25, 0.1, 0.32, 0.05, 0.1],
+        [0.11, 0.25, 0.2, 0.32, 0.05, 0.1],
+        [0.11, 0.25, 0.3, 0.32, 0.2, 0.1],
+        [0.11, 0.25, 0.4, 0.04, 0.7, 0.7]],
+}
+
+# Notebook output: sample -> (assigned_topic, level, probability) per K
+EXPECTED_ASSIGNMENTS = {
+    2: {
+        "s1": ("K2_MC0", "high", 0.67),
+        "s2": ("K2_MC1", "high", 0.67),
+        "s3": ("K2_MC0", "medium", 0.5),
+        "s4": ("K2_MC0", "high", 0.9),
+        "s5": ("K2_MC0", "medium", 0.6),
+        "s6": ("K2_MC0", "medium", 0.669),
+    },
+    3: {
+        "s1": ("K3_MC0", "high", 0.7),
+        "s2": ("K3_MC1", "medium", 0.34),
+        "s3": ("K3_MC2", "medium", 0.342),
+        "s4": ("K3_MC2", "medium", 0.4),
+        "s5": ("K3_MC2", "high", 0.8),
+        "s6": ("K3_MC2", "medium", 0.34),
+    },
+    4: {
+        "s1": ("K4_MC0", "high", 0.67),
+        "s3": ("K4_MC3", "medium", 0.4),
+        "s5": ("K4_MC3", "high", 0.7),
+        "s6": ("K4_MC3", "high", 0.7),
+    },
+}
+
+# Notebook output: node -> (high samples, medium samples, total probability)
+EXPECTED_NODES = {
+    "K2_MC0": (["s1", "s4"], ["s2", "s3", "s5", "s6"], 3.669),
+    "K2_MC1": (["s2"], ["s1", "s3", "s5", "s6"], 2.231),
+    "K3_MC0": (["s1"], ["s6"], 1.03),
+    "K3_MC1": ([], ["s2", "s6"], 0.67),
+    "K3_MC2": (["s5"], ["s2", "s3", "s4", "s6"], 2.222),
+    "K4_MC0": (["s1"], [], 0.67),
+    "K4_MC1": ([], [], 0.0),
+    "K4_MC2": ([], [], 0.0),
+    "K4_MC3": (["s5", "s6"], ["s3"], 1.8),
+}
+
+# Notebook output: (source, target segment) -> (average probability, samples)
+EXPECTED_FLOWS = {
+    ("K2_MC0_high", "K3_MC0_high"): (0.685, ["s1"]),
+    ("K2_MC0_high", "K3_MC2_medium"): (0.65, ["s4"]),
+    ("K2_MC0_medium", "K3_MC2_high"): (0.7, ["s5"]),
+    ("K2_MC0_medium", "K3_MC2_medium"): (0.46275, ["s3", "s6"]),
+    ("K2_MC1_high", "K3_MC1_medium"): (0.505, ["s2"]),
+    ("K3_MC0_high", "K4_MC0_high"): (0.685, ["s1"]),
+    ("K3_MC2_high", "K4_MC3_high"): (0.75, ["s5"]),
+    ("K3_MC2_medium", "K4_MC3_high"): (0.52, ["s6"]),
+    ("K3_MC2_medium", "K4_MC3_medium"): (0.371, ["s3"]),
+}
+
+
+@pytest.fixture
+def processor(tmp_path):
+    for k, rows in SWEEP.items():
+        df = pd.DataFrame(rows, index=[f"MC{i}" for i in range(k)], columns=SAMPLES)
+        df.to_csv(tmp_path / f"DirichletComponentProbabilities_{k}.csv")
+    return StripeSankeyDataProcessor(
+        str(tmp_path), None, k_range=range(2, 5), verbose=False
+    )
+
+
+def sample_probability(k, sample, segment):
+    """A sample's probability for the topic of a segment, e.g. 'K3_MC2_medium'"""
+    topic = int(segment.split("_")[1][2:])
+    return SWEEP[k][topic][SAMPLES.index(sample)]
+
+
+def test_categorize_topic_matrix_thresholds():
+    probabilities = np.array([
+        [0.67, 0.33, 0.6699, 0.3299, 0.5],
+        [0.33, 0.67, 0.3301, 0.3299, 0.5],
+    ])
+    categories = categorize_topic_matrix(probabilities)
+
+    # At the cutoff counts as reaching it
+    assert categories["high"].tolist() == [
+        [True, False, False, False, False],
+        [False, True, False, False, False],
+    ]
+    assert categories["medium"].tolist() == [
+        [False, True, True, False, True],
+        [True, False, True, False, True],
+    ]
+    # Below the medium cutoff everywhere: unassigned; ties go to the first topic
+    assert categories["topic"].tolist() == [0, 1, 0, -1, 0]
+    assert categories["level"].tolist() == [0, 0, 1, -1, 1]
+
+
+def test_sample_assignments(processor):
+    _, categorized = processor.prepare_sankey_data()
+
+    for k, expected in EXPECTED_ASSIGNMENTS.items():
+        assignments = categorized[k]["sample_assignments"]
+        assert sorted(assignments) == sorted(expected)
+        for sample, (topic, level, probability) in expected.items():
+            assert assignments[sample] == {
+                "assigned_topic": topic,
+                "probability": probability,
+                "level": level,
+            }
+
+
+def test_node_membership(processor):
+    sankey_data, _ = processor.prepare_sankey_data()
+
+    assert list(sankey_data["nodes"]) == list(EXPECTED_NODES)
+    for name, (high, medium, total) in EXPECTED_NODES.items():
+        node = sankey_data["nodes"][name]
+        k = int(name[1])
+        assert [sample for sample, _ in node["high_samples"]] == high
+        assert [sample for sample, _ in node["medium_samples"]] == medium
+        assert (node["high_count"], node["medium_count"]) == (len(high), len(medium))
+        assert node["total_probability"] == pytest.approx(total)
+        for sample, probability in node["high_samples"] + node["medium_samples"]:
+            assert probability == sample_probability(k, sample, name)
+
+
+def test_flows(processor):
+    sankey_data, _ = processor.prepare_sankey_data()
+    flows = {
+        (flow["source_segment"], flow["target_segment"]): flow
+        for flow in sankey_data["flows"]
+    }
+
+    assert sorted(flows) == sorted(EXPECTED_FLOWS)
+    for segments, (average, samples) in EXPECTED_FLOWS.items():
+        flow = flows[segments]
+        assert (flow["source_k"], flow["target_k"]) == (
+            int(segments[0][1]),
+            int(segments[1][1]),
+        )
+        assert flow["sample_count"] == len(samples)
+        assert flow["average_probability"] == pytest.approx(average)
+        assert sorted(s["sample"] for s in flow["samples"]) == samples
+        for s in flow["samples"]:
+            assert s["source_prob"] == sample_probability(
+                flow["source_k"], s["sample"], flow["source_segment"]
+            )
+            assert s["target_prob"] == sample_probability(
+                flow["target_k"], s["sample"], flow["target_segment"]
+            )
+
+
+def test_unassigned_samples_leave_the_flows(processor):
+    sankey_data, _ = processor.prepare_sankey_data()
+    flow_samples = {
+        (flow["source_k"], flow["target_k"]): set()
+        for flow in sankey_data["flows"]
+    }
+    for flow in sankey_data["flows"]:
+        flow_samples[flow["source_k"], flow["target_k"]].update(
+            s["sample"] for s in flow["samples"]
+        )
+
+    # s2 and s4 fall below the medium threshold at K=4
+    assert flow_samples[2, 3] == set(SAMPLES)
+    assert flow_samples[3, 4] == {"s1", "s3", "s5", "s6"}
+
+
+def test_indexed_schema_matches(processor):
+    sankey_data, _ = processor.prepare_sankey_data()
+    indexed, _ = processor.prepare_sankey_data(indexed=True)
+    names = indexed["sample_names"]
+
+    assert names == SAMPLES
+    for name, node in sankey_data["nodes"].items():
+        for level in ("high", "medium"):
+            rows, probs = node_members(indexed["nodes"][name], level)
+            assert list(zip([names[row] for row in rows], probs)) == [
+                tuple(entry) for entry in node[f"{level}_samples"]
+            ]
+
+    assert len(indexed["flows"]) == len(sankey_data["flows"])
+    for flow, indexed_flow in zip(sankey_data["flows"], indexed["flows"]):
+        rows, source_probs, target_probs = flow_members(indexed_flow)
+        assert flow_members(flow) == (
+            [names[row] for row in rows],
+            list(source_probs),
+            list(target_probs),
+        )
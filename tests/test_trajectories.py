@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from StripeSankey.schema import index_sankey_data
+from StripeSankey.trajectories import build_trajectory_table
+
+
+def flow(source, target, samples, sample_count=None):
+    """Name-based flow dict; samples are (name, source_prob, target_prob)"""
+    return {
+        "source_segment": source,
+        "target_segment": target,
+        "source_k": int(source[1]),
+        "target_k": int(target[1]),
+        "sample_count": len(samples) if sample_count is None else sample_count,
+        "samples": [
+            {"sample": name, "source_prob": sp, "target_prob": tp}
+            for name, sp, tp in samples
+        ],
+    }
+
+
+@pytest.fixture
+def sankey_data():
+    return {
+        "k_range": [2, 3, 4],
+        "flows": [
+            flow("K2_MC0_high", "K3_MC1_medium", [("a", 0.9, 0.5), ("b", 0.8, 0.4)]),
+            flow("K3_MC1_medium", "K4_MC2_high", [("a", 0.6, 0.7)]),
+            # Overwrites a's K=3 cell set by the flows above
+            flow("K3_MC0_high", "K4_MC0_medium", [("a", 0.95, 0.4)]),
+        ],
+    }
+
+
+def cells(table, sample):
+    """{k: (topic_id, level code, probability)} for a sample's assigned cells"""
+    row = table["sample_names"].index(sample)
+    return {
+        k: (
+            table["node_ids"][table["topic"][row, col]],
+            int(table["level"][row, col]),
+            float(table["probability"][row, col]),
+        )
+        for col, k in enumerate(table["k_values"])
+        if table["topic"][row, col] >= 0
+    }
+
+
+def test_last_flow_wins(sankey_data):
+    table = build_trajectory_table(sankey_data, min_flow_samples=0)
+
+    assert table["sample_names"] == ["a", "b"]
+    assert table["k_values"] == [2, 3, 4]
+    assert cells(table, "a") == {
+        2: ("K2_MC0", 0, pytest.approx(0.9)),
+        3: ("K3_MC0", 0, pytest.approx(0.95)),
+        4: ("K4_MC0", 1, pytest.approx(0.4)),
+    }
+    assert cells(table, "b") == {
+        2: ("K2_MC0", 0, pytest.approx(0.8)),
+        3: ("K3_MC1", 1, pytest.approx(0.4)),
+    }
+    assert table["topic"].dtype == np.int32
+    assert table["level"].dtype == np.int8
+    assert table["probability"].dtype == np.float32
+
+
+def test_small_flows_are_skipped(sankey_data):
+    table = build_trajectory_table(sankey_data, min_flow_samples=2)
+
+    assert table["node_ids"] == ["K2_MC0", "K3_MC1"]
+    assert cells(table, "a") == {
+        2: ("K2_MC0", 0, pytest.approx(0.9)),
+        3: ("K3_MC1", 1, pytest.approx(0.5)),
+    }
+
+
+def test_fixed_orders_are_kept(sankey_data):
+    table = build_trajectory_table(
+        sankey_data,
+        min_flow_samples=0,
+        sample_names=["z", "b", "a"],
+        node_ids=["K4_MC2", "K2_MC0"],
+    )
+
+    # Unseen samples keep their (empty) rows; new topics are appended
+    assert table["sample_names"] == ["z", "b", "a"]
+    assert table["node_ids"] == ["K4_MC2", "K2_MC0", "K3_MC1", "K3_MC0", "K4_MC0"]
+    assert (table["topic"][0] == -1).all()
+    assert (table["level"][0] == -1).all()
+    assert cells(table, "a")[2] == ("K2_MC0", 0, pytest.approx(0.9))
+
+
+def test_indexed_data_matches(sankey_data):
+    named = build_trajectory_table(sankey_data, min_flow_samples=0)
+    indexed = build_trajectory_table(index_sankey_data(sankey_data), min_flow_samples=0)
+
+    assert indexed["sample_names"] == named["sample_names"]
+    assert indexed["node_ids"] == named["node_ids"]
+    for key in ("topic", "level", "probability"):
+        np.testing.assert_array_equal(indexed[key], named[key])
+
+
+def test_missing_sample_count(sankey_data):
+    sankey_data["flows"][0]["sample_count"] = None
+    del sankey_data["flows"][1]["sample_count"]
+
+    # Counted as 0 samples, like the rest of the widget does
+    table = build_trajectory_table(sankey_data, min_flow_samples=1)
+    assert table["sample_names"] == ["a"]
+    assert cells(table, "a") == {
+        3: ("K3_MC0", 0, pytest.approx(0.95)),
+        4: ("K4_MC0", 1, pytest.approx(0.4)),
+    }
+    assert build_trajectory_table(sankey_data, min_flow_samples=0)["sample_names"] == [
+        "a",
+        "b",
+    ]
@@ -0,0 +1,174 @@
+import numpy as np
+import pytest
+
+from StripeSankey import StripeSankeyInline
+from StripeSankey.columnar import encode_flow_samples
+from StripeSankey.schema import index_sankey_data
+from StripeSankey.trajectories import build_trajectory_table
+
+
+def flow(source, target, samples):
+    return {
+        "source_segment": source,
+        "target_segment": target,
+        "source_k": int(source[1]),
+        "target_k": int(target[1]),
+        "sample_count": len(samples),
+        "samples": [
+            {"sample": name, "source_prob": sp, "target_prob": tp}
+            for name, sp, tp in samples
+        ],
+    }
+
+
+def sankey_data():
+    return {
+        "k_range": [2, 3, 4],
+        "nodes": {},
+        "flows": [
+            flow("K2_MC0_high", "K3_MC0_high", [("a", 0.9, 0.8), ("b", 0.8, 0.7)]),
+            flow("K2_MC1_medium", "K3_MC1_medium", [("c", 0.5, 0.4)]),
+            flow("K3_MC0_high", "K4_MC1_medium", [("b", 0.7, 0.5), ("a", 0.8, 0.6)]),
+        ],
+    }
+
+
+def request(index, key, request_id=7):
+    """A flow_samples request as the frontend sends it; key is a flow dict"""
+    return {
+        "type": "flow_samples",
+        "request_id": request_id,
+        "flow": index,
+        "source": key["source_segment"],
+        "target": key["target_segment"],
+        "source_k": key["source_k"],
+        "target_k": key["target_k"],
+    }
+
+
+def selection(key):
+    """widget.selected_flow as the frontend sets it; key is a flow dict"""
+    return {
+        "source": key["source_segment"],
+        "target": key["target_segment"],
+        "sourceK": key["source_k"],
+        "targetK": key["target_k"],
+    }
+
+
+def decode(reply):
+    """Reply buffers as arrays: source/target probs, then samples x K tables"""
+    content, buffers = reply
+    names = content["sample_names"]
+    shape = (len(names), len(content["k_values"]))
+    return {
+        "source_prob": np.frombuffer(buffers[0], "<f4").tolist(),
+        "target_prob": np.frombuffer(buffers[1], "<f4").tolist(),
+        "topic": np.frombuffer(buffers[2], "<i4").reshape(shape),
+        "level": np.frombuffer(buffers[3], "i1").reshape(shape),
+        "probability": np.frombuffer(buffers[4], "<f4").reshape(shape),
+    }
+
+
+@pytest.fixture(params=["named", "indexed"])
+def widget(request):
+    data = sankey_data()
+    if request.param == "indexed":
+        data = index_sankey_data(data)
+    return StripeSankeyInline(sankey_data=data, lazy_samples=True, min_flow_samples=0)
+
+
+def test_reply(widget):
+    key = sankey_data()["flows"][2]
+    content, buffers = widget._flow_samples_reply(request(2, key))
+    arrays = decode((content, buffers))
+
+    assert content["type"] == "flow_samples"
+    assert content["request_id"] == 7
+    assert content["sample_names"] == ["b", "a"]
+    assert content["k_values"] == [2, 3, 4]
+    assert arrays["source_prob"] == pytest.approx([0.7, 0.8])
+    assert arrays["target_prob"] == pytest.approx([0.5, 0.6])
+    # Rows follow the reply's samples: b, then a
+    node_ids = content["node_ids"]
+    assert [node_ids[t] for t in arrays["topic"][0]] == ["K2_MC0", "K3_MC0", "K4_MC1"]
+    assert arrays["level"][1].tolist() == [0, 0, 1]
+    assert arrays["probability"][1].tolist() == pytest.approx([0.9, 0.8, 0.6])
+
+
+def test_stale_index_falls_back_to_key(widget):
+    key = sankey_data()["flows"][1]
+    content, _ = widget._flow_samples_reply(request(0, key))
+    assert content["sample_names"] == ["c"]
+
+    content, _ = widget._flow_samples_reply(request(None, key))
+    assert content["sample_names"] == ["c"]
+
+
+def test_unknown_flow(widget):
+    key = dict(sankey_data()["flows"][0], target_segment="K3_MC9_high")
+    reply = widget._flow_samples_reply(request(0, key, request_id="r1"))
+    content, buffers = reply
+
+    assert content["request_id"] == "r1"
+    assert content["sample_names"] == []
+    assert len(buffers) == 5
+    assert all(memoryview(buffer).nbytes == 0 for buffer in buffers)
+
+
+def test_custom_msg(widget, monkeypatch):
+    sent = []
+    monkeypatch.setattr(widget, "send", lambda content, buffers: sent.append(content))
+    key = sankey_data()["flows"][0]
+
+    widget._handle_custom_msg(widget, request(0, key), [])
+    widget._handle_custom_msg(widget, {"type": "other"}, [])
+
+    assert [content["sample_names"] for content in sent] == [["a", "b"]]
+
+
+def test_pruning_resets_the_lookup(widget):
+    key = sankey_data()["flows"][1]
+    assert widget._flow_samples_reply(request(1, key))[0]["sample_names"] == ["c"]
+
+    widget.min_flow_samples = 2
+    assert widget._flow_samples_reply(request(1, key))[0]["sample_names"] == []
+
+    widget.min_flow_samples = 0
+    widget.top_n_flows = 1
+    assert widget._flow_samples_reply(request(1, key))[0]["sample_names"] == []
+
+    widget.top_n_flows = None
+    assert widget._flow_samples_reply(request(1, key))[0]["sample_names"] == ["c"]
+
+    widget.sankey_data = {**sankey_data(), "flows": sankey_data()["flows"][:1]}
+    assert widget._flow_samples_reply(request(1, key))[0]["sample_names"] == []
+
+
+def test_samples_missing_from_the_table():
+    data = sankey_data()
+    # Built without the single-sample flow, so c has no trajectory row
+    table = build_trajectory_table(data, min_flow_samples=2)
+    rows = {name: row for row, name in enumerate(table["sample_names"])}
+
+    reply = encode_flow_samples(data["flows"][1], table, rows)
+    arrays = decode(reply)
+
+    assert reply[0]["sample_names"] == ["c"]
+    assert arrays["source_prob"] == pytest.approx([0.5])
+    assert arrays["topic"].tolist() == [[-1, -1, -1]]
+    assert arrays["level"].tolist() == [[-1, -1, -1]]
+    assert arrays["probability"].tolist() == [[0.0, 0.0, 0.0]]
+
+
+def test_selected_samples(widget):
+    assert widget.selected_samples() == []
+
+    widget.selected_flow = selection(sankey_data()["flows"][2])
+    assert widget.selected_samples() == ["b", "a"]
+
+    widget.selected_flow = selection(sankey_data()["flows"][1])
+    assert widget.selected_samples() == ["c"]
+    # A flow hidden by pruning has no samples
+    widget.min_flow_samples = 2
+    assert widget.selected_samples() == []